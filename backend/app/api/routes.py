@@ -1,8 +1,24 @@
-from fastapi import APIRouter, HTTPException, Depends
-from app.models import BacktestRequest, BacktestResult
-from app.services.backtest import LeapStrategyBacktester
-from app.database import Strategy, init_db
-from app.schemas import StrategyCreate, StrategyResponse
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from app.models import BacktestRequest, BacktestResult, BacktestBatchRequest, BacktestJobStatus, MonteCarloRequest, MonteCarloResult, MultiAssetRequest, MultiAssetResult, OptimizationRequest, OptimizationResult, OptionChainIngestRequest, WalkForwardRequest, WalkForwardResult
+from app.services.batch import run_batch
+from app.services.checkpoint import refresh_strategies, refresh_strategy
+from app.services.downsample import MIN_POINTS, downsample_result
+from app.services.encoding import ARROW_STREAM, available_types, encode_result, negotiate
+from app.services.jobs import get_job_manager
+from app.services.monte_carlo import run_monte_carlo
+from app.services.multi_asset import run_multi_asset
+from app.services.option_chains import get_option_chains, resolve_ingest_path
+from app.services.optimizer import run_optimization
+from app.services.result_store import get_result_store
+from app.services.streaming import BacktestStream
+from app.services.walk_forward import run_walk_forward
+from app.services.indicators import get_indicator_store
+from app.services.market_data import get_market_data
+from app.database import Strategy, StrategyCheckpoint, init_db
+from app.schemas import StrategyCreate, StrategyRefreshResponse, StrategyResponse
+import asyncio
 import traceback
 import json
 
@@ -11,12 +27,175 @@ router = APIRouter()
 # Ensure DB is initialized
 init_db()
 
+def response_type(http_request: Request) -> str:
+    media_type = negotiate(http_request.headers.get("accept"))
+    if media_type is None:
+        supported = available_types()
+        detail = f"Supported response types: {', '.join(supported)}"
+        if ARROW_STREAM not in supported:
+            detail += f" ({ARROW_STREAM} needs pyarrow installed)"
+        raise HTTPException(status_code=406, detail=detail)
+    return media_type
+
+# Shared by the endpoints that return a history
+MaxPoints = Query(None, ge=MIN_POINTS, description="Downsample history to about this many bars for charting (full resolution if omitted)")
+
 @router.post("/backtest/run", response_model=BacktestResult)
-async def run_backtest(request: BacktestRequest):
+async def run_backtest(request: BacktestRequest, http_request: Request, max_points: Optional[int] = MaxPoints):
+    """
+    Run a backtest, or return the stored result of an identical earlier run
+    (historical mode over unchanged data, or simulation with a seed). The
+    result's backtest_id can be passed to GET /backtest/{backtest_id}.
+
+    The Accept header picks the encoding: JSON by default, or history as
+    column arrays (application/vnd.backtest.columnar+json, or Arrow IPC
+    as application/vnd.apache.arrow.stream when pyarrow is installed).
+    With max_points, the history is downsampled for charting: the shape
+    of total_value and benchmark_value, every trade date and the drawdown
+    peaks are kept.
+    """
+    media_type = response_type(http_request)
+    def run_and_encode():
+        result_json, run = get_result_store().run(request)
+        return encode_result(media_type, result_json, run, max_points)
+
+    try:
+        # Data download and simulation block; keep them off the event loop
+        content = await asyncio.to_thread(run_and_encode)
+        return Response(content=content, media_type=media_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+
+@router.post("/backtest/jobs", response_model=BacktestJobStatus, status_code=202)
+async def submit_backtest_job(request: BacktestRequest):
+    job = get_job_manager().submit(request)
+    return job.to_status(include_result=False)
+
+@router.get("/backtest/jobs/{job_id}", response_model=BacktestJobStatus)
+async def get_backtest_job(job_id: str, max_points: Optional[int] = MaxPoints):
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    # Reads the result back from the result store
+    status = await asyncio.to_thread(job.to_status)
+    if status.result is not None and max_points is not None:
+        status.result = downsample_result(status.result, max_points)
+    return status
+
+@router.post("/backtest/batch")
+async def run_backtest_batch(batch: BacktestBatchRequest):
+    """
+    Run many backtests in parallel. Results stream back as NDJSON, one line
+    per request in completion order, tagged with the request's index.
+    """
+    async def stream():
+        async for index, result_json, error in run_batch(batch.requests):
+            if error is None:
+                yield f'{{"index": {index}, "status": "ok", "result": {result_json}}}\n'
+            else:
+                status_code = 400 if isinstance(error, ValueError) else 500
+                yield json.dumps({"index": index, "status": "error", "status_code": status_code, "detail": str(error)}) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@router.post("/backtest/stream")
+async def stream_backtest(request: BacktestRequest, http_request: Request):
+    """
+    Run a backtest and stream its snapshots and trades as they are produced:
+    Server-Sent Events if the client accepts text/event-stream, NDJSON
+    ({"event": ..., "data": ...} per line) otherwise. Events are "start",
+    then "snapshot" and "trade" in bar order, then "result" (the summary
+    metrics), or "error" if the run fails part way.
+    """
+    if "text/event-stream" in http_request.headers.get("accept", ""):
+        media_type = "text/event-stream"
+        def encode(event, data):
+            return f"event: {event}\ndata: {data}\n\n"
+    else:
+        media_type = "application/x-ndjson"
+        def encode(event, data):
+            return f'{{"event": "{event}", "data": {data}}}\n'
+
+    batches = BacktestStream(request).batches()
+    # Failures before the first bar (bad dates, no data) still get a status code
+    try:
+        first = await anext(batches)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+
+    async def stream():
+        try:
+            yield "".join(encode(event, data) for event, data in first)
+            async for batch in batches:
+                yield "".join(encode(event, data) for event, data in batch)
+        except Exception as e:
+            if not isinstance(e, ValueError):
+                traceback.print_exc()
+            status_code = 400 if isinstance(e, ValueError) else 500
+            yield encode("error", json.dumps({"status_code": status_code, "detail": str(e)}))
+        finally:
+            await batches.aclose()
+
+    return StreamingResponse(stream(), media_type=media_type)
+
+@router.get("/backtest/{backtest_id}", response_model=BacktestResult)
+async def get_backtest_result(backtest_id: str, http_request: Request, max_points: Optional[int] = MaxPoints):
+    media_type = response_type(http_request)
+    result_json = await asyncio.to_thread(get_result_store().get, backtest_id)
+    if result_json is None:
+        raise HTTPException(status_code=404, detail="Backtest result not found")
+    content = await asyncio.to_thread(encode_result, media_type, result_json, None, max_points)
+    return Response(content=content, media_type=media_type)
+
+@router.post("/backtest/monte-carlo", response_model=MonteCarloResult)
+async def run_backtest_monte_carlo(request: MonteCarloRequest):
+    """
+    Backtest the strategy over many simulated paths of its scenario and
+    report the distribution of the summary metrics.
+    """
+    try:
+        return await run_monte_carlo(request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+
+@router.post("/backtest/multi-asset", response_model=MultiAssetResult)
+async def run_backtest_multi_asset(request: MultiAssetRequest):
+    """
+    Run the strategy over a basket of symbols in one pass, each with its
+    weight's share of the capital, and report the portfolio alongside a
+    per-symbol breakdown.
+    """
     try:
-        backtester = LeapStrategyBacktester(request)
-        result = backtester.run()
-        return result
+        return await asyncio.to_thread(run_multi_asset, request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+
+@router.post("/optimizer/run", response_model=OptimizationResult)
+async def run_optimizer(request: OptimizationRequest):
+    try:
+        return await run_optimization(request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+
+@router.post("/optimizer/walk-forward", response_model=WalkForwardResult)
+async def run_walk_forward_optimizer(request: WalkForwardRequest):
+    try:
+        return await run_walk_forward(request)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -57,6 +236,7 @@ async def create_strategy(strategy: StrategyCreate):
 @router.delete("/strategies/{id}")
 async def delete_strategy(id: int):
     try:
+        StrategyCheckpoint.delete().where(StrategyCheckpoint.strategy == id).execute()
         query = Strategy.delete().where(Strategy.id == id)
         rows = query.execute()
         if rows == 0:
@@ -65,6 +245,65 @@ async def delete_strategy(id: int):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+EndDate = Query(None, description="Backtest up to this date (YYYY-MM-DD, exclusive); today if omitted")
+
+@router.post("/strategies/{id}/refresh", response_model=StrategyRefreshResponse)
+async def refresh_saved_strategy(id: int, end_date: Optional[str] = EndDate, include_result: bool = False):
+    """
+    Re-run a saved strategy up to end_date, continuing from the state its
+    last refresh stored, so only the bars since then are simulated.
+    """
+    strategy = Strategy.get_or_none(Strategy.id == id)
+    if strategy is None:
+        raise HTTPException(status_code=404, detail="Strategy not found")
+    try:
+        return await asyncio.to_thread(refresh_strategy, strategy, end_date, include_result)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+
+@router.post("/strategies/refresh")
+async def refresh_all_strategies(end_date: Optional[str] = EndDate):
+    """
+    Refresh every saved strategy (see /strategies/{id}/refresh). Returns one
+    summary per strategy, or {strategy_id, error} for those that failed.
+    """
+    return await asyncio.to_thread(refresh_strategies, end_date)
+
+@router.get("/market-data/cache")
+async def market_data_cache_stats():
+    return get_market_data().stats()
+
+@router.get("/market-data/indicators")
+async def indicator_store_stats():
+    return get_indicator_store().stats()
+
+@router.post("/option-chains/ingest")
+async def ingest_option_chains(request: OptionChainIngestRequest):
+    """
+    Load end-of-day option chain files from the ingest directory into the
+    local chain store used by option_pricing="chain". Returns the rows
+    stored per underlying.
+    """
+    store = get_option_chains()
+    try:
+        paths = [resolve_ingest_path(path) for path in request.paths]
+        stored = {}
+        for path in paths:
+            stored.update(await asyncio.to_thread(store.ingest_file, path, request.underlying))
+        return stored
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+
+@router.get("/option-chains")
+async def option_chain_stats():
+    return get_option_chains().stats()
+
 @router.get("/health")
 async def health_check():
     return {"status": "ok"}
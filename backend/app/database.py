@@ -1,13 +1,22 @@
 from peewee import *
 import datetime
 import json
+import os
 
 db = SqliteDatabase('strategies.db')
 
+# Derived data (stored results, checkpoints) lives in its own untracked file:
+# it can be deleted at any time and is rebuilt on demand
+cache_db = SqliteDatabase(os.environ.get('CACHE_DB_PATH', 'cache.db'))
+
 class BaseModel(Model):
     class Meta:
         database = db
 
+class CacheModel(Model):
+    class Meta:
+        database = cache_db
+
 class Strategy(BaseModel):
     id = AutoField()
     name = CharField()
@@ -15,7 +24,29 @@ class Strategy(BaseModel):
     parameters = TextField() # Store JSON as string
     created_at = DateTimeField(default=datetime.datetime.now)
 
+class StoredResult(CacheModel):
+    # Content-addressed BacktestResult cache (see app.services.result_store)
+    id = CharField(primary_key=True) # sha256 of the canonical request + data stamp
+    payload = BlobField() # zlib-compressed BacktestResult JSON
+    size = IntegerField() # len(payload)
+    hits = IntegerField(default=0)
+    created_at = DateTimeField(default=datetime.datetime.now)
+    accessed_at = DateTimeField(default=datetime.datetime.now, index=True)
+
+class StrategyCheckpoint(CacheModel):
+    # State a saved strategy's backtest can be continued from (see app.services.checkpoint)
+    strategy = IntegerField(primary_key=True) # Strategy.id; a separate database, so no foreign key
+    params = TextField() # canonical request JSON without end_date
+    version = IntegerField() # RESULT_VERSION of the code that computed it
+    last_date = DateField()
+    bars = IntegerField()
+    payload = BlobField() # BacktestCheckpoint.to_bytes()
+    updated_at = DateTimeField(default=datetime.datetime.now)
+
 def init_db():
     db.connect()
     db.create_tables([Strategy])
     db.close()
+    cache_db.connect()
+    cache_db.create_tables([StoredResult, StrategyCheckpoint])
+    cache_db.close()
@@ -1,8 +1,20 @@
-from fastapi import FastAPI
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from app.api.routes import router
+from app.services.batch import shutdown_process_pool
+from app.services.diagnostics import get_metrics_registry
+from app.services.jobs import shutdown_job_manager
 
-app = FastAPI(title="Strategy Optimizer API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    shutdown_job_manager()
+    shutdown_process_pool()
+
+app = FastAPI(title="Strategy Optimizer API", version="1.0.0", lifespan=lifespan)
 
 # CORS Configuration
 origins = [
@@ -18,8 +30,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    # Label by route template (/backtest/jobs/{job_id}, relative to the
+    # router's /api prefix), not raw path, so label cardinality stays bounded
+    route = request.scope.get("route")
+    get_metrics_registry().record_request(
+        request.method, route.path if route else "unmatched", response.status_code, time.perf_counter() - start
+    )
+    return response
+
 app.include_router(router, prefix="/api")
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """
+    Prometheus text exposition of backtest stage timings, pricing counts,
+    request latencies and peak memory.
+    """
+    return PlainTextResponse(get_metrics_registry().render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
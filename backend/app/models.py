@@ -1,7 +1,13 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict
+from typing import Any, List, Optional, Dict, Union
 from datetime import date
 
+class VolatilitySurfaceSpec(BaseModel):
+    moneyness: List[float] = Field(..., min_length=1, description="Increasing strike / spot knots (e.g., 0.8, 1.0, 1.2)")
+    tenors: List[float] = Field(..., min_length=1, description="Increasing times to expiry in years")
+    vols: List[List[float]] = Field(..., min_length=1, description="Implied vols, one row per tenor with one entry per moneyness")
+    relative: bool = Field(False, description="Vols are multiples of the 21-day realized volatility instead of absolute")
+
 class BacktestRequest(BaseModel):
     equity_symbol: str = Field(..., description="Target equity symbol (e.g., QQQ, TSLA)")
     start_date: str = Field(..., description="Start date (YYYY-MM-DD)")
@@ -41,7 +47,20 @@ class BacktestRequest(BaseModel):
     
     # Simulation
     use_simulation: bool = Field(False, description="Use synthetic data instead of historical")
-    simulation_scenario: str = Field("neutral", description="bull, bear, neutral, high_vol")
+    simulation_scenario: str = Field("neutral", description="bull, bear, neutral, high_vol, or bootstrap (block-resampled from the symbol's history before start_date)")
+    simulation_seed: Optional[int] = Field(None, description="Seed for the synthetic path; seeded runs are reproducible and their results cached")
+    simulation_model: str = Field("gbm", description="Path model: gbm, merton (jumps), heston (stochastic vol) or regime_switching")
+    simulation_params: Optional[Dict[str, float]] = Field(None, description="Overrides of the path model's parameters, which default from the scenario's drift and vol; mean_block and history_years for bootstrap")
+
+    # Option Pricing
+    volatility_surface: Optional[VolatilitySurfaceSpec] = Field(None, description="Implied-vol surface to price options on; the 21-day realized volatility if omitted")
+    option_pricing: str = Field("model", description="model (Black-Scholes) or chain (listed contracts marked to ingested option chain quotes)")
+
+    # Instrumentation
+    diagnostics: bool = Field(False, description="Return per-stage timings, pricing call counts and memory usage with the result")
+
+class BacktestBatchRequest(BaseModel):
+    requests: List[BacktestRequest] = Field(..., min_length=1, description="Backtests to run in parallel")
 
 class Trade(BaseModel):
     date: str
@@ -63,6 +82,18 @@ class PortfolioSnapshot(BaseModel):
     drawdown: float
     greeks: Optional[Dict[str, float]] = None
 
+class StageTiming(BaseModel):
+    seconds: float
+    calls: int
+
+class BacktestDiagnostics(BaseModel):
+    stages: Dict[str, StageTiming] # load_data, indicators, event_loop (mark_legs, rules, snapshot), metrics, build_models, serialize
+    pricing_calls: int
+    options_priced: int
+    bars: int
+    history_bytes: Optional[int] = None # this run's history buffer
+    process_peak_rss_bytes: Optional[int] = None # peak resident memory of the process so far, across all its runs
+
 class BacktestResult(BaseModel):
     backtest_id: str
     params: BacktestRequest
@@ -70,5 +101,192 @@ class BacktestResult(BaseModel):
     cagr: float
     max_drawdown: float
     sharpe_ratio: float
+    sortino_ratio: float
+    calmar_ratio: float
+    volatility: float # annualized, %
+    turnover: float # traded value per year / average portfolio value
+    rebalance_count: int
     trades: List[Trade]
     history: List[PortfolioSnapshot]
+    diagnostics: Optional[BacktestDiagnostics] = None
+
+class BacktestSummary(BaseModel):
+    # Closing event of a streamed backtest: the result without the
+    # snapshots and trades already sent
+    backtest_id: str
+    total_return: float
+    cagr: float
+    max_drawdown: float
+    sharpe_ratio: float
+    sortino_ratio: float
+    calmar_ratio: float
+    volatility: float # annualized, %
+    turnover: float # traded value per year / average portfolio value
+    rebalance_count: int
+    diagnostics: Optional[BacktestDiagnostics] = None
+
+class MultiAssetRequest(BaseModel):
+    base: BacktestRequest = Field(..., description="Strategy run on every symbol; equity_symbol is ignored")
+    symbols: List[str] = Field(..., min_length=1, max_length=100, description="Underlyings of the basket (e.g., QQQ, SPY, TSLA)")
+    weights: Optional[List[float]] = Field(None, description="Positive share of the capital per symbol, in the order of `symbols` (normalized); equal if omitted")
+
+class SymbolBreakdown(BaseModel):
+    symbol: str
+    weight: float
+    initial_capital: float
+    final_value: float
+    # None when the sleeve's value went negative (no real CAGR)
+    total_return: Optional[float] = None
+    cagr: Optional[float] = None
+    max_drawdown: Optional[float] = None
+    sharpe_ratio: Optional[float] = None
+    sortino_ratio: Optional[float] = None
+    calmar_ratio: Optional[float] = None
+    volatility: Optional[float] = None
+    turnover: Optional[float] = None
+    rebalance_count: Optional[int] = None
+    trade_count: int
+
+class MultiAssetSnapshot(BaseModel):
+    date: str
+    total_value: float
+    benchmark_value: float
+    drawdown: float
+    values: Dict[str, float] # symbol -> value of its sleeve
+
+class MultiAssetResult(BaseModel):
+    params: MultiAssetRequest
+    total_return: float
+    cagr: float
+    max_drawdown: float
+    sharpe_ratio: float
+    sortino_ratio: float
+    calmar_ratio: float
+    volatility: float # annualized, %
+    turnover: float # traded value per year / average portfolio value
+    rebalance_count: int
+    symbols: List[SymbolBreakdown]
+    history: List[MultiAssetSnapshot]
+
+class BacktestJobStatus(BaseModel):
+    job_id: str
+    status: str # queued, running, completed, failed
+    bars_processed: int = 0
+    total_bars: Optional[int] = None
+    progress: float = Field(0.0, description="Fraction of bars processed (0 to 1)")
+    error: Optional[str] = None
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    result: Optional[BacktestResult] = None
+
+class ParameterRange(BaseModel):
+    values: Optional[List[Union[bool, int, float]]] = Field(None, description="Explicit values to try")
+    min: Optional[float] = Field(None, description="Lower bound (inclusive)")
+    max: Optional[float] = Field(None, description="Upper bound (inclusive)")
+    step: Optional[float] = Field(None, gt=0, description="Grid step; required for grid search over a range")
+
+class OptimizationRequest(BaseModel):
+    base: BacktestRequest = Field(..., description="Backtest used for every field not being swept")
+    parameters: Dict[str, ParameterRange] = Field(..., min_length=1, description="BacktestRequest fields to sweep")
+    method: str = Field("grid", description="grid, random, latin_hypercube")
+    n_samples: int = Field(100, ge=1, le=100000, description="Candidates to draw for random / latin_hypercube")
+    objective: str = Field("sharpe_ratio", description="sharpe_ratio, sortino_ratio, calmar_ratio, cagr, total_return, max_drawdown, volatility")
+    top_n: int = Field(50, ge=1, description="Number of ranked candidates to return")
+    seed: Optional[int] = Field(None, description="Seed for sampling (and the synthetic path in simulation mode)")
+
+class OptimizationCandidate(BaseModel):
+    rank: int
+    parameters: Dict[str, Any]
+    total_return: float
+    cagr: float
+    max_drawdown: float
+    sharpe_ratio: float
+    sortino_ratio: float
+    calmar_ratio: float
+    volatility: float # annualized, %
+    turnover: float # traded value per year / average portfolio value
+    rebalance_count: int
+
+class OptimizationResult(BaseModel):
+    objective: str
+    method: str
+    evaluated: int
+    failed: int
+    candidates: List[OptimizationCandidate]
+
+class WalkForwardRequest(BaseModel):
+    base: BacktestRequest = Field(..., description="Backtest used for every field not being swept; start_date..end_date is split into the windows")
+    parameters: Dict[str, ParameterRange] = Field(..., min_length=1, description="BacktestRequest fields to sweep on each train window")
+    method: str = Field("grid", description="grid, random, latin_hypercube")
+    n_samples: int = Field(100, ge=1, le=100000, description="Candidates to draw for random / latin_hypercube")
+    objective: str = Field("sharpe_ratio", description="sharpe_ratio, sortino_ratio, calmar_ratio, cagr, total_return, max_drawdown, volatility")
+    seed: Optional[int] = Field(None, description="Seed for sampling (and the synthetic path in simulation mode)")
+    train_months: int = Field(36, ge=1, description="Length of each train window")
+    test_months: int = Field(12, ge=1, description="Length of each test window; windows advance by this much, so the test windows tile the period after the first train window")
+    anchored: bool = Field(False, description="Grow each train window from start_date instead of rolling it forward")
+
+class WalkForwardWindow(BaseModel):
+    train_start: str
+    train_end: str # exclusive, = test_start
+    test_start: str
+    test_end: str # exclusive
+    parameters: Dict[str, Any] # best candidate on the train window
+    evaluated: int
+    failed: int
+    in_sample: float # objective on the train window
+    out_of_sample: float # objective on the test window (from the previous window's last bar)
+    total_return: float # test window, %
+    max_drawdown: float # test window, %
+
+class WalkForwardSnapshot(BaseModel):
+    date: str
+    total_value: float
+    benchmark_value: float
+
+class WalkForwardResult(BaseModel):
+    objective: str
+    method: str
+    # Metrics of the stitched out-of-sample curve
+    total_return: float
+    cagr: float
+    max_drawdown: float
+    sharpe_ratio: float
+    sortino_ratio: float
+    calmar_ratio: float
+    volatility: float # annualized, %
+    turnover: float # traded value per year / average portfolio value
+    rebalance_count: int
+    windows: List[WalkForwardWindow]
+    history: List[WalkForwardSnapshot]
+
+class OptionChainIngestRequest(BaseModel):
+    paths: List[str] = Field(..., min_length=1, description="Chain dumps (CSV or Parquet), relative to the server's OPTION_CHAIN_INGEST_DIR")
+    underlying: Optional[str] = Field(None, description="Underlying of files without an underlying/symbol column; filters those with one")
+
+class MonteCarloRequest(BaseModel):
+    base: BacktestRequest = Field(..., description="Strategy to run; simulation_scenario picks the path model")
+    n_paths: int = Field(1000, ge=1, le=100000, description="Number of simulated price paths")
+    seed: Optional[int] = Field(None, description="Seed for the path generator (random if omitted)")
+    percentiles: List[float] = Field([5, 25, 50, 75, 95], min_length=1, description="Percentiles to report (0 to 100)")
+
+class MetricDistribution(BaseModel):
+    mean: float
+    std: float
+    min: float
+    max: float
+    percentiles: Dict[str, float] # "p5" -> value
+
+class MonteCarloResult(BaseModel):
+    n_paths: int
+    failed: int
+    seed: int
+    scenario: str
+    terminal_value: MetricDistribution
+    total_return: MetricDistribution
+    cagr: MetricDistribution
+    max_drawdown: MetricDistribution
+    sharpe_ratio: MetricDistribution
+    sortino_ratio: MetricDistribution
+    calmar_ratio: MetricDistribution
+    volatility: MetricDistribution
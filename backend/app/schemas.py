@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from typing import Dict, Any, Optional
+from app.models import BacktestResult
 
 class StrategyCreate(BaseModel):
     name: str
@@ -12,3 +13,20 @@ class StrategyResponse(BaseModel):
     description: Optional[str]
     parameters: Dict[str, Any]
     created_at: str
+
+class StrategyRefreshResponse(BaseModel):
+    strategy_id: int
+    end_date: str
+    bars: int
+    new_bars: int # bars simulated by this refresh; all of them without a usable checkpoint
+    resumed: bool
+    total_return: float
+    cagr: float
+    max_drawdown: float
+    sharpe_ratio: float
+    sortino_ratio: float
+    calmar_ratio: float
+    volatility: float
+    turnover: float
+    rebalance_count: int
+    result: Optional[BacktestResult] = None
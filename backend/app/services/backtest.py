@@ -1,16 +1,42 @@
+import copy
+import time
 import pandas as pd
 import numpy as np
-import yfinance as yf
 from datetime import datetime, timedelta
-import uuid
-from scipy.stats import norm
-from app.models import BacktestRequest, BacktestResult, Trade, PortfolioSnapshot
-from app.services.option_pricing import black_scholes_call_price, find_strike_for_delta, black_scholes_put_price
+from app.models import BacktestRequest, BacktestResult
+from app.services.diagnostics import Diagnostics, get_metrics_registry
+from app.services.indicators import IndicatorStore, get_indicator_store
+from app.services.ledger import BacktestCheckpoint, BacktestRun, HistoryBuffer, TradeLedger
+from app.services.market_data import PATH_VOL, MarketDataProvider, get_market_data
+from app.services.option_chains import OptionChainStore, get_option_chains
+from app.services.performance import RunningMetrics
+from app.services.option_pricing import black_scholes_greeks, black_scholes_greeks_array, find_strike_for_delta
 from app.services.simulator import MarketSimulator
+from app.services.vol_surface import VolatilitySurface
+
+# Calendar days of history loaded before start_date to warm up the rolling
+# volatility and moving-average windows
+DATA_BUFFER_DAYS = 90
+
+# How often (in bars) simulate() reports progress to its callback
+PROGRESS_INTERVAL = 250
+
+# BacktestRequest.option_pricing modes
+OPTION_PRICING = ('model', 'chain')
 
 class LeapStrategyBacktester:
-    def __init__(self, params: BacktestRequest):
+    def __init__(self, params: BacktestRequest, market_data: MarketDataProvider = None, indicators: IndicatorStore = None,
+                 option_chains: OptionChainStore = None):
         self.params = params
+        # Historical bars come from the shared on-disk cache unless a provider
+        # is injected (e.g. a FrameProvider for offline tests)
+        self.market_data = market_data or get_market_data()
+        self.indicators = indicators or get_indicator_store()
+        self.option_chains = option_chains
+        self.chain = None  # OptionChain of the underlying, for chain pricing
+        # Coarse stage timings and pricing counts are always collected (they
+        # feed /metrics); per-bar stage timings only when params.diagnostics
+        self.diagnostics = Diagnostics(profile=params.diagnostics)
         self.portfolio = {
             'cash': params.initial_capital,
             'equity_qty': 0,
@@ -18,195 +44,379 @@ class LeapStrategyBacktester:
             'wheel_put': None, # {strike, expiry_date, qty, entry_price, current_price}
             'wheel_call': None # {strike, expiry_date, qty, entry_price, current_price}
         }
-        self.trades = []
-        self.history = []
+        self.trades = TradeLedger()
+        self.history = None  # HistoryBuffer, sized once the data is loaded
         self.risk_free_rate = 0.04  # 4% assumption
+        # Options are priced at the bar's realized vol unless a surface is given
+        self.surface = VolatilitySurface.from_spec(params.volatility_surface) if params.volatility_surface else None
         self.last_rebalance_date = None
+        self.last_rebalance_price = None
         self.last_withdrawal_month = None
+        self.running = None  # RunningMetrics, started after the initial allocation
+        self.rebalances = 0
+        self.initial_equity_price = None
+        self.resumed_bars = 0  # bars taken from a checkpoint by the last simulate()
 
     def fetch_data(self):
+        self._load_chain()
+
         # Simulation Mode
         if self.params.use_simulation:
-            data = MarketSimulator.generate_scenario(
-                self.params.equity_symbol, 
-                self.params.start_date, 
-                self.params.end_date, 
-                self.params.simulation_scenario
-            )
-            close_prices = data['Close']
-            data['returns'] = close_prices.pct_change()
-            data['volatility'] = data['returns'].rolling(window=21).std() * np.sqrt(252)
-            
-             # Calculate Moving Averages for Wheel Strategy
-            if self.params.use_wheel_strategy:
-                data['ma_short'] = close_prices.rolling(window=self.params.wheel_ma_short).mean()
-                data['ma_long'] = close_prices.rolling(window=self.params.wheel_ma_long).mean()
-
-            data['volatility'] = data['volatility'].fillna(method='bfill').fillna(0.20)
-            return data
+            with self.diagnostics.stage('load_data'):
+                data = MarketSimulator.generate_scenario(
+                    self.params.equity_symbol, 
+                    self.params.start_date, 
+                    self.params.end_date, 
+                    self.params.simulation_scenario,
+                    seed=self.params.simulation_seed,
+                    model=self.params.simulation_model,
+                    params=self.params.simulation_params,
+                    market_data=self.market_data
+                )
+            # A one-off path: nothing to share with other runs
+            return self._add_indicators(data, cache_key=None)
 
         # Add buffer for volatility calculation
         start_date_obj = datetime.strptime(self.params.start_date, "%Y-%m-%d")
-        buffer_date = start_date_obj - timedelta(days=90) # Increased buffer for MA calculations
-        
-        data = yf.download(self.params.equity_symbol, start=buffer_date.strftime("%Y-%m-%d"), end=self.params.end_date, progress=False)
+        buffer_date = start_date_obj - timedelta(days=DATA_BUFFER_DAYS) # Increased buffer for MA calculations
         
+        with self.diagnostics.stage('load_data'):
+            data = self.market_data.get_history(self.params.equity_symbol, buffer_date.strftime("%Y-%m-%d"), self.params.end_date)
+
         if data.empty:
             raise ValueError(f"No data found for {self.params.equity_symbol}")
-            
-        close_prices = data['Close']
-        if isinstance(close_prices, pd.DataFrame):
-             close_prices = close_prices.iloc[:, 0] # Take the first column if it's a DF
-             
-        data['returns'] = close_prices.pct_change()
-        data['volatility'] = data['returns'].rolling(window=21).std() * np.sqrt(252)
-        
-        # Calculate Moving Averages for Wheel Strategy
-        if self.params.use_wheel_strategy:
-            data['ma_short'] = close_prices.rolling(window=self.params.wheel_ma_short).mean()
-            data['ma_long'] = close_prices.rolling(window=self.params.wheel_ma_long).mean()
-        
-        # Fill NaN volatility with mean or forward fill
-        data['volatility'] = data['volatility'].fillna(method='bfill').fillna(0.20) # Default to 20% if no data
+
+        data = self._add_indicators(data, cache_key=self.params.equity_symbol.upper())
         
         # Filter back to requested start date
         mask = (data.index >= self.params.start_date)
         return data.loc[mask]
 
-    def _calculate_portfolio_greeks(self, date, stock_price, vol):
-        greeks = {'delta': 0.0, 'gamma': 0.0, 'theta': 0.0, 'vega': 0.0}
-        
-        # Helper for Call Greeks
-        def call_greeks(S, K, T, r, sigma):
-            if T <= 0: return 0, 0, 0, 0
-            d1 = (np.log(S/K) + (r + 0.5*sigma**2)*T) / (sigma*np.sqrt(T))
-            d2 = d1 - sigma*np.sqrt(T)
-            delta = norm.cdf(d1)
-            gamma = norm.pdf(d1) / (S * sigma * np.sqrt(T))
-            theta = -(S * norm.pdf(d1) * sigma) / (2 * np.sqrt(T)) - r * K * np.exp(-r*T) * norm.cdf(d2)
-            vega = S * norm.pdf(d1) * np.sqrt(T)
-            return delta, gamma, theta/365, vega/100
-            
-        # Helper for Put Greeks
-        def put_greeks(S, K, T, r, sigma):
-            if T <= 0: return 0, 0, 0, 0
-            d1 = (np.log(S/K) + (r + 0.5*sigma**2)*T) / (sigma*np.sqrt(T))
-            d2 = d1 - sigma*np.sqrt(T)
-            delta = norm.cdf(d1) - 1
-            gamma = norm.pdf(d1) / (S * sigma * np.sqrt(T))
-            theta = -(S * norm.pdf(d1) * sigma) / (2 * np.sqrt(T)) + r * K * np.exp(-r*T) * norm.cdf(-d2)
-            vega = S * norm.pdf(d1) * np.sqrt(T)
-            return delta, gamma, theta/365, vega/100
+    def _load_chain(self):
+        if self.params.option_pricing not in OPTION_PRICING:
+            raise ValueError(f"Unknown option_pricing '{self.params.option_pricing}' (expected one of {', '.join(OPTION_PRICING)})")
+        if self.params.option_pricing != 'chain':
+            return
+        if self.params.use_simulation:
+            raise ValueError("Chain pricing needs historical data, not a simulated path")
+        if self.params.volatility_surface is not None:
+            raise ValueError("volatility_surface only applies to model pricing")
+        chains = self.option_chains or get_option_chains()
+        self.chain = chains.chain(self.params.equity_symbol)
+        if self.chain is None:
+            raise ValueError(f"No option chain data for {self.params.equity_symbol}")
+
+    def _add_indicators(self, data, cache_key):
+        """
+        Add returns, 21-day volatility (default 20% where it can't be
+        computed) and, for the wheel, the moving averages. The series come
+        from the shared IndicatorStore, so repeated runs over the same bars
+        (e.g. a sweep over allocations or MA windows) reuse its prefix sums.
+        A simulated path carries its model vol (PATH_VOL), which options are
+        priced at instead of the realized-vol estimate.
+        """
+        ma_windows = (self.params.wheel_ma_short, self.params.wheel_ma_long) if self.params.use_wheel_strategy else ()
+        with self.diagnostics.stage('indicators'):
+            indicators = self.indicators.compute(cache_key, data.index.values, self._column(data, 'Close'), ma_windows=ma_windows)
+        data['returns'] = indicators['returns']
+        data['volatility'] = data[PATH_VOL] if PATH_VOL in data.columns else indicators['volatility']
+        if self.params.use_wheel_strategy:
+            data['ma_short'] = indicators['ma', self.params.wheel_ma_short]
+            data['ma_long'] = indicators['ma', self.params.wheel_ma_long]
+        return data
 
+    def _calculate_portfolio_greeks(self):
+        # Per-contract Greeks are cached on each leg whenever it is priced
+        # (see _mark_legs), so the snapshot only has to weight them by size.
         # Equity Delta
-        greeks['delta'] += self.portfolio['equity_qty']
-        
-        # LEAP Greeks
-        if self.portfolio['leap']:
-            leap = self.portfolio['leap']
-            days = (leap['expiry_date'] - date).days
-            T = days / 365.0
-            d, g, t, v = call_greeks(stock_price, leap['strike'], T, self.risk_free_rate, vol)
-            qty = leap['qty'] * 100
-            greeks['delta'] += d * qty
-            greeks['gamma'] += g * qty
-            greeks['theta'] += t * qty
-            greeks['vega'] += v * qty
-
-        # Wheel Put Greeks (Short)
-        if self.portfolio['wheel_put']:
-            put = self.portfolio['wheel_put']
-            days = (put['expiry_date'] - date).days
-            T = days / 365.0
-            d, g, t, v = put_greeks(stock_price, put['strike'], T, self.risk_free_rate, vol)
-            qty = put['qty'] * 100
-            # Short position -> flip signs
-            greeks['delta'] -= d * qty
-            greeks['gamma'] -= g * qty
-            greeks['theta'] -= t * qty
-            greeks['vega'] -= v * qty
-
-        # Wheel Call Greeks (Short)
-        if self.portfolio['wheel_call']:
-            call = self.portfolio['wheel_call']
-            days = (call['expiry_date'] - date).days
-            T = days / 365.0
-            d, g, t, v = call_greeks(stock_price, call['strike'], T, self.risk_free_rate, vol)
-            qty = call['qty'] * 100
-            # Short position
-            greeks['delta'] -= d * qty
-            greeks['gamma'] -= g * qty
-            greeks['theta'] -= t * qty
-            greeks['vega'] -= v * qty
-            
-        return greeks
+        delta = self.portfolio['equity_qty']
+        gamma = theta = vega = 0.0
+
+        # LEAP is long, wheel options are short -> flip signs
+        for name, sign in (('leap', 1), ('wheel_put', -1), ('wheel_call', -1)):
+            leg = self.portfolio[name]
+            if not leg:
+                continue
+            d, g, t, v = leg['greeks']
+            qty = sign * leg['qty'] * 100
+            delta += d * qty
+            gamma += g * qty
+            theta += t * qty
+            vega += v * qty
+
+        return delta, gamma, theta, vega
+
+    def _mark_legs(self, date, stock_price, vol, legs=(('leap', True), ('wheel_put', False), ('wheel_call', True))):
+        """
+        Re-price the open option legs named in `legs` with one fused pricing
+        call, storing each leg's price and per-contract Greeks.
+
+        Args:
+            legs: sequence of (portfolio key, is_call) pairs
+        """
+        open_legs = [(self.portfolio[name], is_call) for name, is_call in legs if self.portfolio[name]]
+        if not open_legs:
+            return
+
+        strikes = [leg['strike'] for leg, _ in open_legs]
+        T = [(leg['expiry_date'] - date).days / 365.0 for leg, _ in open_legs]
+        is_call = [is_call for _, is_call in open_legs]
+        if len(open_legs) == 1:
+            # 0-d inputs take NumPy's much cheaper scalar path
+            strikes, T, is_call = strikes[0], T[0], is_call[0]
+
+        if self.chain is not None:
+            self._mark_legs_to_quotes(date, stock_price, vol, open_legs, strikes, T, is_call)
+            return
 
-    def run(self) -> BacktestResult:
+        # Expired legs (T <= 0) come back at intrinsic value
+        self.diagnostics.count_pricing(len(open_legs))
+        vol = self._option_vol(stock_price, strikes, T, vol)
+        greeks = black_scholes_greeks_array(stock_price, strikes, T, self.risk_free_rate, vol, is_call)
+        prices, deltas, gammas, thetas, vegas = (np.atleast_1d(v).tolist() for v in greeks)
+        for (leg, _), price, leg_greeks in zip(open_legs, prices, zip(deltas, gammas, thetas, vegas)):
+            leg['current_price'] = price
+            leg['greeks'] = leg_greeks
+
+    def _mark_legs_to_quotes(self, date, stock_price, vol, open_legs, strikes, T, is_call):
+        """
+        Chain pricing: mark each leg to its mid quote of the day, with Greeks
+        at the quote's implied vol (the bar's realized vol if it has none).
+        A leg without a quote keeps its last mark until it expires, after
+        which it is worth its intrinsic value.
+        """
+        chain = self.chain
+        rows = [chain.quote(date, call, leg['expiry_date'], leg['strike']) for leg, call in open_legs]
+        sigmas = [vol] * len(rows)
+        for n, row in enumerate(rows):
+            if row >= 0:
+                iv = float(chain.iv[row])
+                if iv == iv:
+                    sigmas[n] = iv
+        if len(rows) == 1:
+            sigmas = sigmas[0]
+
+        self.diagnostics.count_pricing(len(open_legs))
+        greeks = black_scholes_greeks_array(stock_price, strikes, T, self.risk_free_rate, sigmas, is_call)
+        prices, deltas, gammas, thetas, vegas = (np.atleast_1d(v).tolist() for v in greeks)
+        days_left = np.atleast_1d(T).tolist()
+        for (leg, _), row, price, left, leg_greeks in zip(open_legs, rows, prices, days_left, zip(deltas, gammas, thetas, vegas)):
+            if row >= 0:
+                leg['current_price'] = float(chain.mid[row])
+            elif left <= 0:
+                leg['current_price'] = price
+            leg['greeks'] = leg_greeks
+
+    def _new_option(self, date, stock_price, vol, is_call, days_to_expiry, strike=None, delta=None):
+        """
+        Contract to open: (strike, expiry_date, OptionGreeks), or None when
+        the option chain lists nothing that day. Model pricing writes the
+        option at `strike`, or at the strike whose delta is `delta`,
+        expiring in exactly days_to_expiry. Chain pricing takes the listed
+        contract nearest to that (see OptionChain.select) at its mid quote.
+        """
+        if self.chain is not None:
+            row = self.chain.select(date, is_call, days_to_expiry, strike=strike, delta=delta, stock_price=stock_price, vol=vol)
+            if row < 0:
+                return None
+            expiry_date, strike = self.chain.contract(row)
+            iv = float(self.chain.iv[row])
+            T = (expiry_date - date).days / 365.0
+            self.diagnostics.count_pricing()
+            greeks = black_scholes_greeks(stock_price, strike, T, self.risk_free_rate, iv if iv == iv else vol, is_call=is_call)
+            return strike, expiry_date, greeks._replace(price=float(self.chain.mid[row]))
+
+        expiry_date = date + timedelta(days=days_to_expiry)
+        T = days_to_expiry / 365.0
+        if delta is not None:
+            # Find Strike
+            self.diagnostics.count_pricing()
+            if self.surface is None:
+                strike = find_strike_for_delta(stock_price, T, self.risk_free_rate, vol, delta)
+            else:
+                strike = self.surface.strike_for_delta(stock_price, T, self.risk_free_rate, delta, vol)
+
+        # Calculate Price (and Greeks for the snapshot)
+        self.diagnostics.count_pricing()
+        greeks = black_scholes_greeks(stock_price, strike, T, self.risk_free_rate, self._option_vol(stock_price, strike, T, vol), is_call=is_call)
+        return strike, expiry_date, greeks
+
+    def _option_vol(self, stock_price, strike, T, vol):
+        """
+        Vol to price an option at: the surface's at (strike / spot, T), or
+        the bar's realized `vol` without a surface.
+        """
+        if self.surface is None:
+            return vol
+        return self.surface.vol(np.divide(strike, stock_price), T, vol)
+
+    @staticmethod
+    def _column(df, name):
+        """
+        Return one column of `df` as a contiguous float64 array, unwrapping the
+        single-ticker DataFrame that yfinance's MultiIndex columns produce.
+        """
+        col = df[name]
+        if isinstance(col, pd.DataFrame):
+            col = col.iloc[:, 0]
+        return np.ascontiguousarray(col.to_numpy(dtype=np.float64))
+
+    def run(self, progress_callback=None) -> BacktestResult:
+        return self.execute(progress_callback).to_result()
+
+    def execute(self, progress_callback=None, resume: BacktestCheckpoint = None) -> BacktestRun:
+        """
+        simulate(), recording the run (or its failure) in the metrics registry.
+        """
+        metrics = get_metrics_registry()
+        try:
+            run = self.simulate(progress_callback, resume)
+        except Exception:
+            metrics.record_backtest_failure()
+            raise
+        metrics.record_backtest(self.diagnostics.summary())
+        return run
+
+    def simulate(self, progress_callback=None, resume: BacktestCheckpoint = None) -> BacktestRun:
+        """
+        Run the event loop, writing snapshots into a preallocated HistoryBuffer
+        and trades into a TradeLedger. Pydantic models are only built when the
+        returned BacktestRun is converted with to_result().
+
+        Args:
+            progress_callback: optional callable(bars_processed, total_bars),
+                invoked once the data is loaded, every PROGRESS_INTERVAL bars
+                and after the last bar
+            resume: optional checkpoint() of an earlier run of the same
+                parameters up to an earlier end_date. Only the bars after it
+                are simulated, giving the same result as a full run; if the
+                bars loaded now don't match its history (e.g. revised data),
+                the run starts over.
+        """
         df = self.fetch_data()
-        
-        # Initial Setup
-        first_row = df.iloc[0]
-        self._initial_allocation(df.index[0], first_row)
-        
-        max_portfolio_value = self.portfolio['cash'] # Initialize
-        
-        for date, row in df.iterrows():
-            current_price = float(row['Close'].iloc[0]) if isinstance(row['Close'], pd.Series) else float(row['Close'])
-            volatility = float(row['volatility'].iloc[0]) if isinstance(row['volatility'], pd.Series) else float(row['volatility'])
-            
-            # 1. Update Portfolio Values
-            self._update_leap_price(date, current_price, volatility)
-            self._update_wheel_prices(date, current_price, volatility)
-            
+
+        # Pull everything the event loop needs out of the frame once, so the
+        # loop below only touches plain Python floats and dates.
+        days = df.index.values.astype('datetime64[D]')
+        dates = days.astype(object)  # datetime.date
+        close_array = self._column(df, 'Close')
+        closes = close_array.tolist()
+        vols = self._column(df, 'volatility').tolist()
+        if self.params.use_wheel_strategy:
+            ma_shorts = self._column(df, 'ma_short').tolist()
+            ma_longs = self._column(df, 'ma_long').tolist()
+
+        first_bar = self._restore(resume, days, close_array) if resume is not None else 0
+        self.resumed_bars = first_bar
+        if first_bar == 0:
+            # Initial Setup
+            self.history = HistoryBuffer(days)
+            self._initial_allocation(dates[0], closes[0], vols[0])
+            self.running = RunningMetrics(peak=self.portfolio['cash'])
+            self.initial_equity_price = closes[0]
+        update_metrics = self.running.update
+        benchmark_qty = self.params.initial_capital / self.initial_equity_price
+
+        total_bars = len(dates)
+        self.diagnostics.bars = total_bars - first_bar
+        if progress_callback:
+            progress_callback(first_bar, total_bars)
+
+        loop_start = time.perf_counter()
+        lap = self.diagnostics.lap  # no-op unless params.diagnostics
+        lap()
+        for i in range(first_bar, total_bars):
+            if progress_callback and i and i % PROGRESS_INTERVAL == 0:
+                progress_callback(i, total_bars)
+            date = dates[i]
+            current_price = closes[i]
+            volatility = vols[i]
+
+            # 1. Update Portfolio Values (all open legs in one pricing call)
+            self._mark_legs(date, current_price, volatility)
+            lap('mark_legs')
+
             # 2. Check Logic
             self._check_monthly_withdrawal(date)
             self._check_leap_exit_conditions(date, current_price, volatility)
             self._check_rebalancing(date, current_price, volatility)
-            
+
             if self.params.use_wheel_strategy:
-                ma_short = float(row['ma_short'].iloc[0]) if isinstance(row['ma_short'], pd.Series) else float(row['ma_short'])
-                ma_long = float(row['ma_long'].iloc[0]) if isinstance(row['ma_long'], pd.Series) else float(row['ma_long'])
-                self._run_wheel_strategy(date, current_price, volatility, ma_short, ma_long)
-            
+                self._run_wheel_strategy(date, current_price, volatility, ma_shorts[i], ma_longs[i])
+            lap('rules')
+
             # 3. Record Snapshot
             equity_val = self.portfolio['equity_qty'] * current_price
             leap_val = (self.portfolio['leap']['qty'] * self.portfolio['leap']['current_price'] * 100) if self.portfolio['leap'] else 0
-            
+
             wheel_put_val = (self.portfolio['wheel_put']['qty'] * self.portfolio['wheel_put']['current_price'] * 100) if self.portfolio['wheel_put'] else 0
             wheel_call_val = (self.portfolio['wheel_call']['qty'] * self.portfolio['wheel_call']['current_price'] * 100) if self.portfolio['wheel_call'] else 0
-            
+
             total_val = self.portfolio['cash'] + equity_val + leap_val - wheel_put_val - wheel_call_val
-            
-            max_portfolio_value = max(max_portfolio_value, total_val)
-            drawdown = (max_portfolio_value - total_val) / max_portfolio_value if max_portfolio_value > 0 else 0
-            
+
+            drawdown = update_metrics(total_val)
+
             # Benchmark (Buy & Hold) Calculation
-            if not hasattr(self, 'initial_equity_price'):
-                self.initial_equity_price = float(df.iloc[0]['Close'].iloc[0]) if isinstance(df.iloc[0]['Close'], pd.Series) else float(df.iloc[0]['Close'])
-            
-            benchmark_val = (self.params.initial_capital / self.initial_equity_price) * current_price
-            
-            # Greeks
-            greeks = self._calculate_portfolio_greeks(date, current_price, volatility)
-
-            self.history.append(PortfolioSnapshot(
-                date=date.strftime("%Y-%m-%d"),
-                equity_value=round(equity_val, 2),
-                leap_value=round(leap_val, 2),
-                cash_value=round(self.portfolio['cash'], 2),
-                total_value=round(total_val, 2),
-                benchmark_value=round(benchmark_val, 2),
-                equity_price=round(current_price, 2),
-                drawdown=round(drawdown, 4),
-                greeks=greeks
-            ))
+            benchmark_val = benchmark_qty * current_price
 
-        return self._generate_result(df)
+            # Greeks
+            delta, gamma, theta, vega = self._calculate_portfolio_greeks()
 
-    def _initial_allocation(self, date, row):
-        price = float(row['Close'].iloc[0]) if isinstance(row['Close'], pd.Series) else float(row['Close'])
-        vol = float(row['volatility'].iloc[0]) if isinstance(row['volatility'], pd.Series) else float(row['volatility'])
-        
+            self.history.append((
+                equity_val, leap_val, self.portfolio['cash'], total_val, benchmark_val,
+                current_price, drawdown, delta, gamma, theta, vega
+            ))
+            lap('snapshot')
+
+        self.diagnostics.add('event_loop', time.perf_counter() - loop_start)
+        if progress_callback:
+            progress_callback(total_bars, total_bars)
+        with self.diagnostics.stage('metrics'):
+            metrics = self._compute_metrics()
+        return BacktestRun(self.params, self.history, self.trades, metrics, self.diagnostics)
+
+    def checkpoint(self) -> BacktestCheckpoint:
+        """
+        State after the last simulated bar, to continue from with
+        simulate(resume=...) once more bars exist.
+        """
+        state = {
+            'portfolio': copy.deepcopy(self.portfolio),
+            'last_rebalance_price': self.last_rebalance_price,
+            'last_withdrawal_month': self.last_withdrawal_month,
+            'metrics': self.running.state(),
+            'rebalances': self.rebalances,
+            'initial_equity_price': self.initial_equity_price,
+        }
+        return BacktestCheckpoint(state, self.history, self.trades)
+
+    def _restore(self, checkpoint: BacktestCheckpoint, days, closes) -> int:
+        """
+        Load `checkpoint` if its history is a prefix of the bars loaded now
+        (same dates and closes). Returns the number of bars restored, 0 if
+        it doesn't match.
+        """
+        saved = checkpoint.history
+        n = len(saved)
+        if (n == 0 or n > len(days) or not np.array_equal(saved.dates[:n], days[:n])
+                or not np.array_equal(saved.rows['equity_price'], closes[:n])):
+            return 0
+        self.history = HistoryBuffer(days)
+        self.history.data[:n] = saved.rows
+        self.history.size = n
+        self.trades.entries = list(checkpoint.trades.entries)
+        self.trades.traded_value = checkpoint.trades.traded_value
+
+        state = checkpoint.state
+        self.portfolio = copy.deepcopy(state['portfolio'])
+        self.last_rebalance_price = state['last_rebalance_price']
+        self.last_withdrawal_month = state['last_withdrawal_month']
+        self.running = RunningMetrics.from_state(state['metrics'])
+        self.rebalances = state['rebalances']
+        self.initial_equity_price = state['initial_equity_price']
+        return n
+
+    def _initial_allocation(self, date, price, vol):
         total_capital = self.portfolio['cash']
         
         target_equity = total_capital * (self.params.equity_allocation / 100)
@@ -217,10 +427,10 @@ class LeapStrategyBacktester:
         cost = qty * price
         self.portfolio['equity_qty'] = qty
         self.portfolio['cash'] -= cost
-        self.trades.append(Trade(
-            date=date.strftime("%Y-%m-%d"), type="BUY", asset="EQUITY", 
+        self.trades.record(
+            date=date, type="BUY", asset="EQUITY", 
             quantity=qty, price=price, value=cost, reason="Initial Allocation"
-        ))
+        )
         
         # Buy LEAP
         self._open_new_leap(date, price, vol, target_leap)
@@ -229,16 +439,13 @@ class LeapStrategyBacktester:
         if target_amount <= 0:
             return
 
-        # Calculate Expiry (approx 12-18 months)
+        # Calculate Expiry (approx 12-18 months) and the strike for the target delta
         days_to_expiry = self.params.leap_expiration_months * 30
-        expiry_date = date + timedelta(days=days_to_expiry)
-        T = days_to_expiry / 365.0
-        
-        # Find Strike
-        strike = find_strike_for_delta(stock_price, T, self.risk_free_rate, vol, self.params.leap_delta)
-        
-        # Calculate Price
-        option_price = black_scholes_call_price(stock_price, strike, T, self.risk_free_rate, vol)
+        contract = self._new_option(date, stock_price, vol, True, days_to_expiry, delta=self.params.leap_delta)
+        if contract is None:
+            return
+        strike, expiry_date, greeks = contract
+        option_price = greeks.price
         
         # Calculate Qty (1 contract = 100 shares)
         # target_amount = qty * 100 * option_price
@@ -260,33 +467,15 @@ class LeapStrategyBacktester:
             'expiry_date': expiry_date,
             'qty': num_contracts,
             'entry_price': option_price,
-            'current_price': option_price
+            'current_price': option_price,
+            'greeks': tuple(greeks[1:])
         }
         
-        self.trades.append(Trade(
-            date=date.strftime("%Y-%m-%d"), type="BUY", asset="LEAP",
+        self.trades.record(
+            date=date, type="BUY", asset="LEAP",
             quantity=num_contracts, price=option_price, value=cost,
             reason=f"Open LEAP {expiry_date.strftime('%Y-%m')} Strike {strike:.2f}"
-        ))
-
-    def _update_leap_price(self, date, stock_price, vol):
-        if not self.portfolio['leap']:
-            return
-            
-        expiry = self.portfolio['leap']['expiry_date']
-        days_to_expiry = (expiry - date).days
-        T = days_to_expiry / 365.0
-        
-        if T <= 0:
-            # Expired
-            price = max(0, stock_price - self.portfolio['leap']['strike'])
-        else:
-            price = black_scholes_call_price(
-                stock_price, self.portfolio['leap']['strike'], T, 
-                self.risk_free_rate, vol
-            )
-            
-        self.portfolio['leap']['current_price'] = price
+        )
 
     def _check_leap_exit_conditions(self, date, stock_price, vol):
         if not self.portfolio['leap']:
@@ -346,11 +535,11 @@ class LeapStrategyBacktester:
         value = leap['qty'] * 100 * leap['current_price']
         self.portfolio['cash'] += value
         
-        self.trades.append(Trade(
-            date=date.strftime("%Y-%m-%d"), type="SELL", asset="LEAP",
+        self.trades.record(
+            date=date, type="SELL", asset="LEAP",
             quantity=leap['qty'], price=leap['current_price'], value=value,
             reason=reason
-        ))
+        )
         self.portfolio['leap'] = None
 
     def _check_rebalancing(self, date, stock_price, vol):
@@ -381,7 +570,7 @@ class LeapStrategyBacktester:
         # This usually means from the last rebalancing point.
         
         # We need a state variable: self.last_rebalance_price
-        if not hasattr(self, 'last_rebalance_price'):
+        if self.last_rebalance_price is None:
             self.last_rebalance_price = stock_price
             
         price_change_pct = (stock_price - self.last_rebalance_price) / self.last_rebalance_price * 100
@@ -392,6 +581,7 @@ class LeapStrategyBacktester:
             self._rebalance_portfolio(date, stock_price, vol, reason=f"Equity Down {price_change_pct:.1f}%")
 
     def _rebalance_portfolio(self, date, stock_price, vol, reason):
+        self.rebalances += 1
         # 1. Close everything (virtual close to calculate total capital easily)
         # Or better: calculate target amounts and adjust.
         
@@ -413,13 +603,13 @@ class LeapStrategyBacktester:
                 if self.portfolio['cash'] >= cost:
                     self.portfolio['equity_qty'] += qty_to_buy
                     self.portfolio['cash'] -= cost
-                    self.trades.append(Trade(date=date.strftime("%Y-%m-%d"), type="BUY", asset="EQUITY", quantity=qty_to_buy, price=stock_price, value=cost, reason=f"Rebalance: {reason}"))
+                    self.trades.record(date=date, type="BUY", asset="EQUITY", quantity=qty_to_buy, price=stock_price, value=cost, reason=f"Rebalance: {reason}")
             else: # Sell
                 qty_to_sell = abs(eq_diff) / stock_price
                 proceeds = qty_to_sell * stock_price
                 self.portfolio['equity_qty'] -= qty_to_sell
                 self.portfolio['cash'] += proceeds
-                self.trades.append(Trade(date=date.strftime("%Y-%m-%d"), type="SELL", asset="EQUITY", quantity=qty_to_sell, price=stock_price, value=proceeds, reason=f"Rebalance: {reason}"))
+                self.trades.record(date=date, type="SELL", asset="EQUITY", quantity=qty_to_sell, price=stock_price, value=proceeds, reason=f"Rebalance: {reason}")
 
         # Adjust LEAP
         # For LEAPs, we don't just "add/remove" contracts usually, we might need to roll if the delta has shifted significantly.
@@ -441,7 +631,7 @@ class LeapStrategyBacktester:
                     if self.portfolio['cash'] >= cost:
                         self.portfolio['leap']['qty'] += num_contracts
                         self.portfolio['cash'] -= cost
-                        self.trades.append(Trade(date=date.strftime("%Y-%m-%d"), type="BUY", asset="LEAP", quantity=num_contracts, price=leap['current_price'], value=cost, reason=f"Rebalance: {reason}"))
+                        self.trades.record(date=date, type="BUY", asset="LEAP", quantity=num_contracts, price=leap['current_price'], value=cost, reason=f"Rebalance: {reason}")
                 else: # Sell some
                     num_contracts = abs(leap_diff) / (100 * leap['current_price'])
                     proceeds = num_contracts * 100 * leap['current_price']
@@ -452,34 +642,13 @@ class LeapStrategyBacktester:
                     
                     self.portfolio['leap']['qty'] -= num_contracts
                     self.portfolio['cash'] += proceeds
-                    self.trades.append(Trade(date=date.strftime("%Y-%m-%d"), type="SELL", asset="LEAP", quantity=num_contracts, price=leap['current_price'], value=proceeds, reason=f"Rebalance: {reason}"))
+                    self.trades.record(date=date, type="SELL", asset="LEAP", quantity=num_contracts, price=leap['current_price'], value=proceeds, reason=f"Rebalance: {reason}")
         else:
             # No leap, open new
             self._open_new_leap(date, stock_price, vol, target_leap_val)
 
         self.last_rebalance_price = stock_price
 
-    def _update_wheel_prices(self, date, stock_price, vol):
-        # Update Put Price
-        if self.portfolio['wheel_put']:
-            put = self.portfolio['wheel_put']
-            days = (put['expiry_date'] - date).days
-            T = days / 365.0
-            if T <= 0:
-                put['current_price'] = max(0, put['strike'] - stock_price)
-            else:
-                put['current_price'] = black_scholes_put_price(stock_price, put['strike'], T, self.risk_free_rate, vol)
-                
-        # Update Call Price
-        if self.portfolio['wheel_call']:
-            call = self.portfolio['wheel_call']
-            days = (call['expiry_date'] - date).days
-            T = days / 365.0
-            if T <= 0:
-                call['current_price'] = max(0, stock_price - call['strike'])
-            else:
-                call['current_price'] = black_scholes_call_price(stock_price, call['strike'], T, self.risk_free_rate, vol)
-
     def _run_wheel_strategy(self, date, stock_price, vol, ma_short, ma_long):
         # 1. Manage Existing Positions
         self._manage_wheel_positions(date, stock_price)
@@ -488,7 +657,7 @@ class LeapStrategyBacktester:
         # Signal: MA Short > MA Long -> Bullish -> Sell Put
         # Signal: MA Short < MA Long -> Bearish -> (If holding stock, Sell Call)
         
-        if pd.isna(ma_short) or pd.isna(ma_long):
+        if np.isnan(ma_short) or np.isnan(ma_long):
             return
             
         is_bullish = ma_short > ma_long
@@ -508,21 +677,17 @@ class LeapStrategyBacktester:
             # Sell Put
             # Strike: ATM or slightly OTM? Let's say 0.30 Delta OTM Put, or just 5% OTM?
             # Simple rule: Strike = 95% of current price
-            strike = stock_price * 0.95
-            
             # Expiry: 30 days
-            days_to_expiry = 30
-            expiry_date = date + timedelta(days=days_to_expiry)
-            T = days_to_expiry / 365.0
-            
-            price = black_scholes_put_price(stock_price, strike, T, self.risk_free_rate, vol)
+            contract = self._new_option(date, stock_price, vol, False, 30, strike=stock_price * 0.95)
             
             # Qty: Covered by wheel_capital
             # Cost to cover = Strike * 100 * Qty
             # Qty = wheel_capital / (Strike * 100)
             
-            num_contracts = int(wheel_capital / (strike * 100))
+            num_contracts = int(wheel_capital / (contract[0] * 100)) if contract else 0
             if num_contracts > 0:
+                strike, expiry_date, greeks = contract
+                price = greeks.price
                 premium = num_contracts * 100 * price
                 self.portfolio['cash'] += premium
                 self.portfolio['wheel_put'] = {
@@ -530,13 +695,14 @@ class LeapStrategyBacktester:
                     'expiry_date': expiry_date,
                     'qty': num_contracts,
                     'entry_price': price,
-                    'current_price': price
+                    'current_price': price,
+                    'greeks': tuple(greeks[1:])
                 }
-                self.trades.append(Trade(
-                    date=date.strftime("%Y-%m-%d"), type="SELL_OPEN", asset="PUT",
+                self.trades.record(
+                    date=date, type="SELL_OPEN", asset="PUT",
                     quantity=num_contracts, price=price, value=premium,
                     reason=f"Wheel: Sell Put (Bullish Signal)"
-                ))
+                )
 
         # Logic for Selling Call (Covered Call)
         # We need to hold the underlying to sell a covered call? 
@@ -547,20 +713,16 @@ class LeapStrategyBacktester:
         if not is_bullish and not self.portfolio['wheel_call'] and self.portfolio['equity_qty'] > 0:
             # Sell Call
             # Strike: 105% of current price
-            strike = stock_price * 1.05
-            
             # Expiry: 30 days
-            days_to_expiry = 30
-            expiry_date = date + timedelta(days=days_to_expiry)
-            T = days_to_expiry / 365.0
-            
-            price = black_scholes_call_price(stock_price, strike, T, self.risk_free_rate, vol)
+            contract = self._new_option(date, stock_price, vol, True, 30, strike=stock_price * 1.05)
             
             # Qty: Covered by equity holdings
             # Max contracts = equity_qty / 100
             max_contracts = int(self.portfolio['equity_qty'] / 100)
             
-            if max_contracts > 0:
+            if contract and max_contracts > 0:
+                strike, expiry_date, greeks = contract
+                price = greeks.price
                 premium = max_contracts * 100 * price
                 self.portfolio['cash'] += premium
                 self.portfolio['wheel_call'] = {
@@ -568,13 +730,14 @@ class LeapStrategyBacktester:
                     'expiry_date': expiry_date,
                     'qty': max_contracts,
                     'entry_price': price,
-                    'current_price': price
+                    'current_price': price,
+                    'greeks': tuple(greeks[1:])
                 }
-                self.trades.append(Trade(
-                    date=date.strftime("%Y-%m-%d"), type="SELL_OPEN", asset="CALL",
+                self.trades.record(
+                    date=date, type="SELL_OPEN", asset="CALL",
                     quantity=max_contracts, price=price, value=premium,
                     reason=f"Wheel: Sell Call (Bearish Signal)"
-                ))
+                )
 
     def _manage_wheel_positions(self, date, stock_price):
         # Manage Put
@@ -591,18 +754,18 @@ class LeapStrategyBacktester:
                     self.portfolio['cash'] -= cost
                     self.portfolio['equity_qty'] += put['qty'] * 100
                     
-                    self.trades.append(Trade(
-                        date=date.strftime("%Y-%m-%d"), type="ASSIGNED", asset="PUT",
+                    self.trades.record(
+                        date=date, type="ASSIGNED", asset="PUT",
                         quantity=put['qty'], price=put['strike'], value=cost,
                         reason="Put Assigned (Wheel)"
-                    ))
+                    )
                 else:
                     # Expired Worthless (Profit kept)
-                    self.trades.append(Trade(
-                        date=date.strftime("%Y-%m-%d"), type="EXPIRED", asset="PUT",
+                    self.trades.record(
+                        date=date, type="EXPIRED", asset="PUT",
                         quantity=put['qty'], price=0, value=0,
                         reason="Put Expired Worthless (Wheel)"
-                    ))
+                    )
                 self.portfolio['wheel_put'] = None
 
         # Manage Call
@@ -618,18 +781,18 @@ class LeapStrategyBacktester:
                     self.portfolio['equity_qty'] -= call['qty'] * 100
                     self.portfolio['cash'] += proceeds
                     
-                    self.trades.append(Trade(
-                        date=date.strftime("%Y-%m-%d"), type="ASSIGNED", asset="CALL",
+                    self.trades.record(
+                        date=date, type="ASSIGNED", asset="CALL",
                         quantity=call['qty'], price=call['strike'], value=proceeds,
                         reason="Call Assigned (Wheel)"
-                    ))
+                    )
                 else:
                     # Expired Worthless
-                    self.trades.append(Trade(
-                        date=date.strftime("%Y-%m-%d"), type="EXPIRED", asset="CALL",
+                    self.trades.record(
+                        date=date, type="EXPIRED", asset="CALL",
                         quantity=call['qty'], price=0, value=0,
                         reason="Call Expired Worthless (Wheel)"
-                    ))
+                    )
                 self.portfolio['wheel_call'] = None
 
     def _check_monthly_withdrawal(self, date):
@@ -642,61 +805,24 @@ class LeapStrategyBacktester:
             amount = self.params.monthly_withdrawal
             if self.portfolio['cash'] >= amount:
                 self.portfolio['cash'] -= amount
-                self.trades.append(Trade(
-                    date=date.strftime("%Y-%m-%d"), type="WITHDRAW", asset="CASH",
+                self.trades.record(
+                    date=date, type="WITHDRAW", asset="CASH",
                     quantity=1, price=amount, value=amount, reason="Monthly Spending"
-                ))
+                )
             else:
                 # Not enough cash? Liquidate?
                 # For P0, let's just go negative cash (margin) or stop withdrawal?
                 # Going negative cash is easiest to track "shortfall" or assume margin.
                 self.portfolio['cash'] -= amount
-                self.trades.append(Trade(
-                    date=date.strftime("%Y-%m-%d"), type="WITHDRAW", asset="CASH",
+                self.trades.record(
+                    date=date, type="WITHDRAW", asset="CASH",
                     quantity=1, price=amount, value=amount, reason="Monthly Spending (Margin)"
-                ))
+                )
             
             self.last_withdrawal_month = current_month
 
-    def _generate_result(self, df) -> BacktestResult:
-        if not self.history:
-            return BacktestResult(
-                backtest_id=str(uuid.uuid4()), params=self.params,
-                total_return=0, cagr=0, max_drawdown=0, sharpe_ratio=0, trades=[], history=[]
-            )
-            
-        start_val = self.params.initial_capital
-        end_val = self.history[-1].total_value
-        
-        total_return = (end_val - start_val) / start_val * 100
-        
-        # CAGR
-        days = (datetime.strptime(self.params.end_date, "%Y-%m-%d") - datetime.strptime(self.params.start_date, "%Y-%m-%d")).days
-        years = days / 365.25
-        if years > 0:
-            cagr = ((end_val / start_val) ** (1 / years) - 1) * 100
-        else:
-            cagr = total_return
-
-        # Max Drawdown
-        max_drawdown = max(h.drawdown for h in self.history) * 100
-        
-        # Sharpe Ratio
-        # Calculate daily returns of portfolio
-        portfolio_values = pd.Series([h.total_value for h in self.history])
-        daily_returns = portfolio_values.pct_change().dropna()
-        if daily_returns.std() > 0:
-            sharpe = (daily_returns.mean() / daily_returns.std()) * np.sqrt(252)
-        else:
-            sharpe = 0
-            
-        return BacktestResult(
-            backtest_id=str(uuid.uuid4()),
-            params=self.params,
-            total_return=round(total_return, 2),
-            cagr=round(cagr, 2),
-            max_drawdown=round(max_drawdown, 2),
-            sharpe_ratio=round(sharpe, 2),
-            trades=self.trades,
-            history=self.history
+    def _compute_metrics(self) -> dict:
+        # Accumulated bar by bar in the event loop; no pass over the history
+        return self.running.summary(
+            self.params, self.params.initial_capital, self.trades.traded_value, self.rebalances
         )
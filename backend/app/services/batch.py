@@ -0,0 +1,117 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from app.models import BacktestRequest
+from app.services.backtest import DATA_BUFFER_DAYS, LeapStrategyBacktester
+from app.services.diagnostics import get_metrics_registry
+from app.services.market_data import FrameProvider, MarketDataProvider, get_market_data
+from app.services.result_store import get_result_store, storable_json
+
+_process_pool = None
+
+def pool_workers() -> int:
+    """
+    Size of the shared backtest pool: the CPU count unless capped with
+    BACKTEST_WORKERS.
+    """
+    return int(os.environ.get('BACKTEST_WORKERS', 0)) or os.cpu_count() or 1
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Shared pool for CPU-bound backtests.
+    """
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=pool_workers())
+    return _process_pool
+
+def shutdown_process_pool():
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(cancel_futures=True)
+        _process_pool = None
+
+def preload_market_data(requests, market_data: MarketDataProvider = None) -> dict:
+    """
+    Load every distinct historical symbol once, over the union of the date
+    ranges (plus warm-up buffer) the requests need.
+
+    Returns:
+        dict: symbol -> FrameProvider holding just that symbol's bars.
+              Symbols that fail to load map to an empty provider, so the
+              affected backtests fail individually with "No data found".
+    """
+    market_data = market_data or get_market_data()
+    ranges = {}
+    for request in requests:
+        if request.use_simulation:
+            continue
+        symbol = request.equity_symbol.upper()
+        start = datetime.strptime(request.start_date, "%Y-%m-%d") - timedelta(days=DATA_BUFFER_DAYS)
+        end = datetime.strptime(request.end_date, "%Y-%m-%d")
+        lo, hi = ranges.get(symbol, (start, end))
+        ranges[symbol] = (min(lo, start), max(hi, end))
+
+    providers = {}
+    for symbol, (start, end) in ranges.items():
+        try:
+            frame = market_data.get_history(symbol, start, end)
+        except Exception:
+            frame = None
+        providers[symbol] = FrameProvider({symbol: frame}) if frame is not None else FrameProvider({})
+    return providers
+
+def run_backtest_json(request: BacktestRequest, market_data: MarketDataProvider, backtest_id=None):
+    """
+    Worker entry point: run one backtest and return the serialized result
+    (a JSON string pickles back to the parent far cheaper than the model),
+    the JSON to keep in the result store (None without a `backtest_id`,
+    i.e. an uncacheable request) and the run's diagnostics summary, so the
+    parent can record it in its metrics registry.
+    """
+    backtester = LeapStrategyBacktester(request, market_data)
+    run = backtester.execute()
+    if backtest_id is not None:
+        run.backtest_id = backtest_id
+    result_json = run.to_json()
+    stored_json = None
+    if backtest_id is not None:
+        stored_json = storable_json(run.to_result()) if request.diagnostics else result_json
+    return result_json, stored_json, backtester.diagnostics.summary()
+
+async def run_batch(requests, market_data: MarketDataProvider = None):
+    """
+    Fan `requests` out over the process pool and yield (index, result_json,
+    error) tuples in completion order.
+
+    Requests go through the result store like single backtests: hits are
+    served without running, and new results are stored (here, not in the
+    workers, which don't share the parent's database connection) so every
+    returned backtest_id can be fetched with GET /backtest/{backtest_id}.
+    """
+    providers = await asyncio.to_thread(preload_market_data, requests, market_data)
+    pool = get_process_pool()
+    loop = asyncio.get_running_loop()
+    empty = FrameProvider({})
+    metrics = get_metrics_registry()
+    store = get_result_store()
+
+    async def run_one(index, request):
+        provider = providers.get(request.equity_symbol.upper(), empty)
+        try:
+            key, provider, cached = await asyncio.to_thread(store.lookup, request, provider)
+            if cached is not None:
+                return index, cached, None
+            result, stored, summary = await loop.run_in_executor(pool, run_backtest_json, request, provider, key)
+        except Exception as e:
+            metrics.record_backtest_failure()
+            return index, None, e
+        metrics.record_backtest(summary)
+        if stored is not None:
+            await asyncio.to_thread(store.put, key, stored)
+        return index, result, None
+
+    for next_done in asyncio.as_completed([run_one(i, r) for i, r in enumerate(requests)]):
+        yield await next_done
@@ -0,0 +1,93 @@
+import datetime
+import json
+
+from app.database import Strategy, StrategyCheckpoint
+from app.models import BacktestRequest
+from app.schemas import StrategyRefreshResponse
+from app.services.backtest import LeapStrategyBacktester
+from app.services.ledger import BacktestCheckpoint
+from app.services.market_data import MarketDataProvider
+from app.services.result_store import RESULT_VERSION
+
+# Incremental refresh of saved strategies.
+#
+# After each refresh the backtester's state is stored in StrategyCheckpoint,
+# so the next refresh (typically one more day of bars) only runs the event
+# loop over the bars past the checkpoint. Data loading and indicators are
+# already incremental (MarketDataCache, IndicatorStore); the history and
+# trades so far come back from the checkpoint and the metrics are recomputed
+# over them, so a resumed run returns exactly what a full run would.
+#
+# A checkpoint is only used for the same parameters (end_date aside) and
+# RESULT_VERSION, and only if its bars still match the data; otherwise the
+# refresh runs from start_date. Simulated strategies always run in full:
+# their synthetic path depends on the length of the range.
+
+def checkpoint_params(request: BacktestRequest) -> str:
+    return json.dumps(
+        request.model_dump(mode='json', exclude={'end_date', 'diagnostics'}), sort_keys=True, separators=(',', ':')
+    )
+
+def load_checkpoint(strategy_id, request: BacktestRequest) -> BacktestCheckpoint:
+    """
+    The strategy's checkpoint if it can be continued to request.end_date, else None.
+    """
+    if request.use_simulation:
+        return None
+    row = StrategyCheckpoint.get_or_none(StrategyCheckpoint.strategy == strategy_id)
+    if (row is None or row.version != RESULT_VERSION or row.params != checkpoint_params(request)
+            or str(row.last_date) >= request.end_date):
+        return None
+    return BacktestCheckpoint.from_bytes(row.payload)
+
+def save_checkpoint(strategy_id, request: BacktestRequest, checkpoint: BacktestCheckpoint):
+    StrategyCheckpoint.replace(
+        strategy=strategy_id,
+        params=checkpoint_params(request),
+        version=RESULT_VERSION,
+        last_date=checkpoint.last_date,
+        bars=len(checkpoint.history),
+        payload=checkpoint.to_bytes(),
+        updated_at=datetime.datetime.now(),
+    ).execute()
+
+def refresh_strategy(strategy: Strategy, end_date=None, include_result=False,
+                     market_data: MarketDataProvider = None) -> StrategyRefreshResponse:
+    """
+    Backtest a saved strategy up to `end_date` (default today, i.e. through
+    the last completed bar), continuing from its checkpoint when possible,
+    and store the new checkpoint.
+    """
+    params = json.loads(strategy.parameters)
+    params['end_date'] = end_date or datetime.date.today().isoformat()
+    params['diagnostics'] = False
+    request = BacktestRequest(**params)
+
+    backtester = LeapStrategyBacktester(request, market_data)
+    run = backtester.execute(resume=load_checkpoint(strategy.id, request))
+    if not request.use_simulation:
+        save_checkpoint(strategy.id, request, backtester.checkpoint())
+
+    return StrategyRefreshResponse(
+        strategy_id=strategy.id,
+        end_date=request.end_date,
+        bars=len(run.history),
+        new_bars=len(run.history) - backtester.resumed_bars,
+        resumed=backtester.resumed_bars > 0,
+        result=run.to_result() if include_result else None,
+        **run.metrics,
+    )
+
+def refresh_strategies(end_date=None, market_data: MarketDataProvider = None) -> list:
+    """
+    refresh_strategy() for every saved strategy. A strategy that fails (e.g.
+    no data for its symbol) is reported with its error instead of stopping
+    the others.
+    """
+    refreshed = []
+    for strategy in Strategy.select().order_by(Strategy.id):
+        try:
+            refreshed.append(refresh_strategy(strategy, end_date, market_data=market_data).model_dump())
+        except Exception as e:
+            refreshed.append({'strategy_id': strategy.id, 'error': str(e)})
+    return refreshed
@@ -0,0 +1,209 @@
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from app.models import BacktestDiagnostics, StageTiming
+
+def peak_rss_bytes():
+    """
+    High-water mark of the process's resident memory since it started, or
+    None where the platform doesn't report it. In a long-running server or
+    pool worker this covers every run the process has made, not just the
+    current one. (tracemalloc would give a per-run Python heap peak, but it
+    slows the event loop ~7x, distorting the timings reported alongside,
+    and is process-wide, so concurrent runs would count each other's
+    allocations.)
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def _noop_lap(stage=None):
+    pass
+
+class Diagnostics:
+    """
+    Timings and counters for one backtest.
+
+    Coarse stages (loading data, indicators, the event loop, building and
+    encoding the response) are always timed; they are cheap and feed
+    the Prometheus metrics. Per-bar stages inside the event loop are only
+    timed when `profile` is set, through lap(): each call charges the time
+    since the previous lap to the named stage.
+    """
+    __slots__ = ('profile', 'stages', 'pricing_calls', 'options_priced', 'bars', '_last_lap')
+
+    def __init__(self, profile=False):
+        self.profile = profile
+        self.stages = {}  # name -> [seconds, calls]
+        self.pricing_calls = 0
+        self.options_priced = 0
+        self.bars = 0
+        self._last_lap = None
+
+    def add(self, stage, seconds, calls=1):
+        entry = self.stages.get(stage)
+        if entry is None:
+            self.stages[stage] = [seconds, calls]
+        else:
+            entry[0] += seconds
+            entry[1] += calls
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    @property
+    def lap(self):
+        """
+        Lap timer for the per-bar stages: a no-op unless profiling. Call
+        lap() to start and lap('stage') after each stage.
+        """
+        return self._lap if self.profile else _noop_lap
+
+    def _lap(self, stage=None):
+        now = time.perf_counter()
+        if stage is not None:
+            entry = self.stages.get(stage)
+            if entry is None:
+                self.stages[stage] = [now - self._last_lap, 1]
+            else:
+                entry[0] += now - self._last_lap
+                entry[1] += 1
+        self._last_lap = now
+
+    def count_pricing(self, options=1):
+        self.pricing_calls += 1
+        self.options_priced += options
+
+    def summary(self) -> dict:
+        """
+        Plain-dict form (picklable, for results coming back from workers).
+        """
+        return {
+            'stages': {name: tuple(entry) for name, entry in self.stages.items()},
+            'pricing_calls': self.pricing_calls,
+            'options_priced': self.options_priced,
+            'bars': self.bars,
+        }
+
+    def to_model(self, history_bytes=None) -> BacktestDiagnostics:
+        return BacktestDiagnostics(
+            stages={name: StageTiming(seconds=round(seconds, 6), calls=calls) for name, (seconds, calls) in self.stages.items()},
+            pricing_calls=self.pricing_calls,
+            options_priced=self.options_priced,
+            bars=self.bars,
+            history_bytes=history_bytes,
+            process_peak_rss_bytes=peak_rss_bytes(),
+        )
+
+class MetricsRegistry:
+    """
+    Process-wide counters rendered in the Prometheus text exposition format.
+    Hand-rolled to avoid a client-library dependency: everything here is a
+    counter or a summary (_sum/_count pair), keyed by a tuple of label values.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.backtests = {}  # (status,) -> count
+        self.stage_seconds = {}  # (stage,) -> [seconds, calls]
+        self.pricing_calls = 0
+        self.options_priced = 0
+        self.bars = 0
+        self.result_cache = {}  # (outcome,) -> count
+        self.requests = {}  # (method, route, status) -> count
+        self.request_seconds = {}  # (method, route) -> [seconds, count]
+
+    def record_backtest(self, summary: dict):
+        with self._lock:
+            self.backtests[('ok',)] = self.backtests.get(('ok',), 0) + 1
+            for stage, (seconds, calls) in summary['stages'].items():
+                entry = self.stage_seconds.setdefault((stage,), [0.0, 0])
+                entry[0] += seconds
+                entry[1] += calls
+            self.pricing_calls += summary['pricing_calls']
+            self.options_priced += summary['options_priced']
+            self.bars += summary['bars']
+
+    def record_stage(self, stage, seconds):
+        """
+        A stage timed after the run was recorded (building the response models).
+        """
+        with self._lock:
+            entry = self.stage_seconds.setdefault((stage,), [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+
+    def record_backtest_failure(self):
+        with self._lock:
+            self.backtests[('error',)] = self.backtests.get(('error',), 0) + 1
+
+    def record_result_cache(self, outcome):
+        """
+        outcome: 'hit', 'miss' or 'uncacheable' (see ResultStore.run)
+        """
+        with self._lock:
+            self.result_cache[(outcome,)] = self.result_cache.get((outcome,), 0) + 1
+
+    def record_request(self, method, route, status, seconds):
+        with self._lock:
+            self.requests[method, route, str(status)] = self.requests.get((method, route, str(status)), 0) + 1
+            entry = self.request_seconds.setdefault((method, route), [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+
+    @staticmethod
+    def _labels(names, values):
+        pairs = ','.join('{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"')) for name, value in zip(names, values))
+        return '{' + pairs + '}' if pairs else ''
+
+    def render(self) -> str:
+        lines = []
+
+        def counter(name, help_text, samples, labels=()):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for values, value in samples:
+                lines.append(f"{name}{self._labels(labels, values)} {value}")
+
+        def summary(name, help_text, samples, labels=()):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} summary")
+            for values, (total, count) in samples:
+                label_str = self._labels(labels, values)
+                lines.append(f"{name}_sum{label_str} {total:.6f}")
+                lines.append(f"{name}_count{label_str} {count}")
+
+        with self._lock:
+            counter('backtest_runs_total', 'Backtests run, by outcome.', sorted(self.backtests.items()), ('status',))
+            summary('backtest_stage_seconds', 'Time spent per backtest stage.', sorted(self.stage_seconds.items()), ('stage',))
+            counter('backtest_pricing_calls_total', 'Black-Scholes pricing calls made by backtests.', [((), self.pricing_calls)])
+            counter('backtest_options_priced_total', 'Option contracts priced by backtests.', [((), self.options_priced)])
+            counter('backtest_bars_total', 'Bars simulated by backtests.', [((), self.bars)])
+            counter('backtest_result_cache_total', 'Result store lookups, by outcome.', sorted(self.result_cache.items()), ('outcome',))
+            counter('http_requests_total', 'HTTP requests, by route and status.', sorted(self.requests.items()), ('method', 'route', 'status'))
+            summary('http_request_duration_seconds', 'HTTP request latency, by route.', sorted(self.request_seconds.items()), ('method', 'route'))
+
+        rss = peak_rss_bytes()
+        if rss is not None:
+            lines.append("# HELP process_peak_resident_memory_bytes Peak resident memory of the API process.")
+            lines.append("# TYPE process_peak_resident_memory_bytes gauge")
+            lines.append(f"process_peak_resident_memory_bytes {rss}")
+        return '\n'.join(lines) + '\n'
+
+_registry = MetricsRegistry()
+
+def get_metrics_registry() -> MetricsRegistry:
+    return _registry
@@ -0,0 +1,112 @@
+import json
+
+import numpy as np
+
+from app.models import BacktestResult
+from app.services.ledger import BacktestRun
+
+# Shape-preserving downsampling of a backtest's history for charting.
+#
+# The bars are split into equal buckets and each bucket contributes up to
+# three bars: the Largest-Triangle-Three-Buckets pick for total_value, the
+# LTTB pick for benchmark_value, and the bar with the deepest drawdown
+# (when there is one). The first and last bars, every bar with a trade and
+# the bar of the maximum drawdown are always kept, so trade markers and the
+# drawdown figure line up with the full-resolution series. With more trade
+# dates than max_points the result is larger than max_points.
+
+MIN_POINTS = 3
+
+def lttb(x, y, n_buckets):
+    """
+    Largest-Triangle-Three-Buckets: one index per bucket of the interior
+    points 1..n-2, chosen to maximize the triangle it forms with the
+    previous pick and the next bucket's centroid.
+    """
+    n = len(y)
+    edges = np.linspace(1, n - 1, n_buckets + 1).astype(np.intp)
+    picks = np.empty(n_buckets, dtype=np.intp)
+    a = 0
+    for i in range(n_buckets):
+        lo, hi = edges[i], max(edges[i + 1], edges[i] + 1)
+        if i + 1 < n_buckets:
+            next_lo, next_hi = edges[i + 1], max(edges[i + 2], edges[i + 1] + 1)
+            cx, cy = x[next_lo:next_hi].mean(), y[next_lo:next_hi].mean()
+        else:
+            cx, cy = x[n - 1], y[n - 1]
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        picks[i] = a
+    return picks
+
+def downsample_indices(days, total_value, benchmark_value, drawdown, trade_days, max_points):
+    """
+    Sorted indices of the bars to keep.
+
+    Args:
+        days: datetime64[D] bar dates
+        total_value, benchmark_value, drawdown: per-bar series
+        trade_days: datetime64[D] dates of the trades
+        max_points: target number of bars
+    """
+    n = len(days)
+    if n <= max_points:
+        return np.arange(n)
+
+    keep = [np.array([0, n - 1, int(np.argmax(drawdown))])]
+    trade_bars = np.searchsorted(days, np.unique(trade_days))
+    keep.append(trade_bars[trade_bars < n])
+    forced = len(np.unique(np.concatenate(keep)))
+
+    n_buckets = max((max_points - forced) // 3, 1)
+    x = (days - days[0]).astype(np.float64)
+    keep.append(lttb(x, np.asarray(total_value, dtype=np.float64), n_buckets))
+    keep.append(lttb(x, np.asarray(benchmark_value, dtype=np.float64), n_buckets))
+
+    edges = np.linspace(1, n - 1, n_buckets + 1).astype(np.intp)
+    drawdown = np.asarray(drawdown, dtype=np.float64)
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        if hi > lo:
+            deepest = lo + int(np.argmax(drawdown[lo:hi]))
+            if drawdown[deepest] > 0:
+                keep.append([deepest])
+    return np.unique(np.concatenate(keep).astype(np.intp))
+
+def downsample_run(run: BacktestRun, max_points) -> BacktestRun:
+    rows = run.history.rows
+    trade_days = np.array([entry[0] for entry in run.trades.entries], dtype='datetime64[D]')
+    # Rounded as in the snapshots, so the same bars are picked as from the JSON
+    indices = downsample_indices(
+        run.history.dates[:run.history.size], np.round(rows['total_value'], 2),
+        np.round(rows['benchmark_value'], 2), np.round(rows['drawdown'], 4), trade_days, max_points
+    )
+    if len(indices) == len(rows):
+        return run
+    downsampled = BacktestRun(run.params, run.history.take(indices), run.trades, run.metrics, run.diagnostics)
+    downsampled.backtest_id = run.backtest_id
+    return downsampled
+
+def _snapshot_indices(snapshots, trades, max_points, get):
+    return downsample_indices(
+        np.array([get(s, 'date') for s in snapshots], dtype='datetime64[D]'),
+        np.array([get(s, 'total_value') for s in snapshots], dtype=np.float64),
+        np.array([get(s, 'benchmark_value') for s in snapshots], dtype=np.float64),
+        np.array([get(s, 'drawdown') for s in snapshots], dtype=np.float64),
+        np.array([get(t, 'date') for t in trades], dtype='datetime64[D]'),
+        max_points,
+    )
+
+def downsample_result(result: BacktestResult, max_points) -> BacktestResult:
+    if len(result.history) <= max_points:
+        return result
+    indices = _snapshot_indices(result.history, result.trades, max_points, getattr)
+    return result.model_copy(update={'history': [result.history[i] for i in indices]})
+
+def downsample_result_json(result_json, max_points) -> str:
+    result = json.loads(result_json)
+    history = result['history']
+    if len(history) <= max_points:
+        return result_json
+    indices = _snapshot_indices(history, result['trades'], max_points, dict.__getitem__)
+    result['history'] = [history[i] for i in indices]
+    return json.dumps(result, separators=(',', ':'))
@@ -0,0 +1,165 @@
+import io
+import json
+import time
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+except ImportError:  # optional: only needed for the Arrow encoding
+    pa = None
+
+from app.services.downsample import downsample_result_json, downsample_run
+from app.services.ledger import GREEK_FIELDS, HISTORY_DTYPE, BacktestRun
+
+# Response encodings of a BacktestResult, chosen from the Accept header.
+#
+# The default JSON repeats every field name (and a greeks object) per bar.
+# The columnar encodings carry history as one array per field instead:
+#
+#   COLUMNAR_JSON  {backtest_id, params, <metrics>, diagnostics,
+#                   history: {date: [...], equity_value: [...], ...},
+#                   trades: {date: [...], type: [...], ...}}
+#   ARROW_STREAM   Arrow IPC stream of the history table (date32 plus one
+#                  float64 column per field); everything else, trades as
+#                  columns included, is JSON under the schema metadata key
+#                  b"backtest"
+#
+# History values are rounded as in the row JSON (2 places, 4 for drawdown;
+# Greeks unrounded), and the greeks are flattened into their own columns.
+JSON = "application/json"
+COLUMNAR_JSON = "application/vnd.backtest.columnar+json"
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+HISTORY_FIELDS = HISTORY_DTYPE.names
+TRADE_FIELDS = ('date', 'type', 'asset', 'quantity', 'price', 'value', 'reason')
+DECIMALS = {name: 4 if name == 'drawdown' else 2 for name in HISTORY_FIELDS if name not in GREEK_FIELDS}
+
+def available_types():
+    return (JSON, COLUMNAR_JSON, ARROW_STREAM) if pa is not None else (JSON, COLUMNAR_JSON)
+
+def negotiate(accept) -> str:
+    """
+    Pick the response type for an Accept header, honouring q-values;
+    JSON when the header is missing or accepts anything.
+
+    Returns:
+        str: media type, or None when nothing acceptable is available
+    """
+    if not accept:
+        return JSON
+    ranges = []
+    for position, part in enumerate(accept.split(',')):
+        media_type, *params = [p.strip() for p in part.split(';')]
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            ranges.append((-q, position, media_type.lower()))
+    for _, _, media_type in sorted(ranges):
+        if media_type in ('*/*', 'application/*'):
+            return JSON
+        if media_type in available_types():
+            return media_type
+    return None
+
+def columns_from_run(run: BacktestRun):
+    """
+    (summary, history columns, trade columns) straight from the run's
+    buffers, without building the snapshot models.
+    """
+    history = run.history
+    rows = history.rows
+    history_columns = {'date': np.datetime_as_string(history.dates[:history.size], unit='D')}
+    for name in HISTORY_FIELDS:
+        history_columns[name] = np.round(rows[name], DECIMALS[name]) if name in DECIMALS else rows[name]
+
+    entries = run.trades.entries
+    trade_columns = {name: [entry[i] for entry in entries] for i, name in enumerate(TRADE_FIELDS)}
+    trade_columns['date'] = [d.strftime("%Y-%m-%d") for d in trade_columns['date']]
+    for name in ('quantity', 'price', 'value'):
+        # Wheel contract counts are ints in the ledger; Trade makes them floats
+        trade_columns[name] = [float(v) for v in trade_columns[name]]
+
+    summary = {'backtest_id': run.backtest_id, 'params': run.params.model_dump(mode='json')}
+    summary.update(run.metrics)
+    summary['diagnostics'] = (
+        run.diagnostics.to_model(history_bytes=history.nbytes).model_dump(mode='json')
+        if run.params.diagnostics else None
+    )
+    return summary, history_columns, trade_columns
+
+def columns_from_json(result_json):
+    """
+    (summary, history columns, trade columns) from a serialized
+    BacktestResult, e.g. one served from the result store.
+    """
+    result = json.loads(result_json)
+    snapshots = result.pop('history')
+    trades = result.pop('trades')
+    history_columns = {'date': np.array([s['date'] for s in snapshots])}
+    for name in HISTORY_FIELDS:
+        if name in GREEK_FIELDS:
+            values = [(s['greeks'] or {}).get(name, np.nan) for s in snapshots]
+        else:
+            values = [s[name] for s in snapshots]
+        history_columns[name] = np.array(values, dtype=np.float64)
+    trade_columns = {name: [t[name] for t in trades] for name in TRADE_FIELDS}
+    return result, history_columns, trade_columns
+
+def encode_columnar_json(summary, history_columns, trade_columns) -> bytes:
+    payload = dict(summary)
+    payload['history'] = {name: values.tolist() for name, values in history_columns.items()}
+    payload['trades'] = trade_columns
+    return json.dumps(payload, separators=(',', ':')).encode()
+
+def encode_arrow(summary, history_columns, trade_columns) -> bytes:
+    arrays = [pa.array(history_columns['date'].astype('datetime64[D]'))]
+    arrays += [pa.array(np.ascontiguousarray(history_columns[name], dtype=np.float64)) for name in HISTORY_FIELDS]
+    metadata = {b'backtest': json.dumps({**summary, 'trades': trade_columns}).encode()}
+    table = pa.Table.from_arrays(arrays, names=['date', *HISTORY_FIELDS], metadata=metadata)
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+def encode_result(media_type, result_json=None, run: BacktestRun = None, max_points=None):
+    """
+    Encode a backtest result as `media_type`, from the run when there is one
+    (cheapest) or else from its JSON, optionally with the history
+    downsampled to about `max_points` bars.
+    """
+    if max_points is not None:
+        if run is not None:
+            downsampled = downsample_run(run, max_points)
+            if downsampled is not run:
+                run, result_json = downsampled, None
+        else:
+            result_json = downsample_result_json(result_json, max_points)
+    if media_type == JSON:
+        return result_json if result_json is not None else run.to_json()
+    if run is None:
+        columns = columns_from_json(result_json)
+        return encode_arrow(*columns) if media_type == ARROW_STREAM else encode_columnar_json(*columns)
+
+    summary, history_columns, trade_columns = columns_from_run(run)
+    start = time.perf_counter()
+    if media_type == ARROW_STREAM:
+        # The report rides in the schema metadata, so it can't include this stage
+        content = encode_arrow(summary, history_columns, trade_columns)
+        run.record_stage('serialize', time.perf_counter() - start)
+        return content
+    # As in BacktestRun.to_json(): encode the report last so it includes the
+    # 'serialize' stage
+    report = summary['diagnostics']
+    summary['diagnostics'] = None
+    content = encode_columnar_json(summary, history_columns, trade_columns)
+    run.record_stage('serialize', time.perf_counter() - start)
+    if report is None:
+        return content
+    return content.replace(b'"diagnostics":null', b'"diagnostics":' + run.diagnostics_json().encode(), 1)
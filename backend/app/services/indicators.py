@@ -0,0 +1,240 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Rolling indicators read from prefix (cumulative) sums.
+#
+# With c[k] = x[0] + ... + x[k-1], the sum of any window x[i-w+1..i] is
+# c[i+1] - c[i+1-w], so once the prefix sums of a series exist, a moving
+# average or rolling volatility of *any* window costs O(1) per bar. The
+# functions below work along the last axis, so the same code serves one
+# symbol's history (1-D) and a Monte Carlo path matrix (2-D).
+#
+# Semantics follow the pandas calls fetch_data used before: windows need
+# `window` valid values (NaN otherwise), returns are pct_change() of the
+# forward-filled closes, volatility is the annualized ddof=1 std of returns,
+# back-filled, with DEFAULT_VOLATILITY where none can be computed.
+
+VOLATILITY_WINDOW = 21
+DEFAULT_VOLATILITY = 0.20
+TRADING_DAYS = 252
+
+def prefix_sums(values, initial=None):
+    """
+    Running sums of `values` along the last axis with a leading 0 (or
+    `initial`, to extend existing sums). NaNs count as 0; pair with
+    nan_counts() to exclude windows that contain them.
+    """
+    return _accumulate(np.where(np.isnan(values), 0.0, values), initial)
+
+def nan_counts(values, initial=None):
+    return _accumulate(np.isnan(values).astype(np.int64), initial)
+
+def _accumulate(values, initial):
+    if initial is None:
+        return np.cumsum(np.concatenate([np.zeros_like(values[..., :1]), values], axis=-1), axis=-1)
+    # np.cumsum adds sequentially, so continuing from the last sum gives the
+    # same floats as one pass over the whole series
+    tail = np.cumsum(np.concatenate([initial[..., -1:], values], axis=-1), axis=-1)[..., 1:]
+    return np.concatenate([initial, tail], axis=-1)
+
+def window_sums(sums, window, lo, hi):
+    """
+    Sums over the trailing `window` values for positions [lo, hi), using
+    only values at or after position lo; earlier positions are NaN.
+    """
+    out = np.full(sums.shape[:-1] + (hi - lo,), np.nan)
+    first = lo + window - 1
+    if first < hi:
+        out[..., first - lo:] = sums[..., first + 1:hi + 1] - sums[..., first + 1 - window:hi + 1 - window]
+    return out
+
+def forward_fill(values):
+    valid = ~np.isnan(values)
+    idx = np.where(valid, np.arange(values.shape[-1]), 0)
+    np.maximum.accumulate(idx, axis=-1, out=idx)
+    return np.take_along_axis(values, idx, axis=-1)
+
+def backward_fill(values):
+    n = values.shape[-1]
+    valid = ~np.isnan(values)
+    idx = np.where(valid, np.arange(n), n - 1)
+    idx = np.minimum.accumulate(idx[..., ::-1], axis=-1)[..., ::-1]
+    return np.take_along_axis(values, idx, axis=-1)
+
+def simple_returns(closes):
+    filled = forward_fill(closes)
+    returns = np.full(closes.shape, np.nan)
+    returns[..., 1:] = filled[..., 1:] / filled[..., :-1] - 1
+    return returns
+
+class PriceSums:
+    """
+    Prefix sums of one price series (or a stack of them): closes, returns
+    and squared returns, plus NaN counts. Bars can be appended without
+    recomputing the existing sums.
+    """
+    __slots__ = ('closes', 'close_sums', 'close_nans', 'returns', 'return_sums', 'square_sums', 'return_nans')
+
+    def __init__(self, closes):
+        closes = np.asarray(closes, dtype=np.float64)
+        self.closes = closes
+        self.close_sums = prefix_sums(closes)
+        self.close_nans = nan_counts(closes)
+        self.returns = simple_returns(closes)
+        self.return_sums = prefix_sums(self.returns)
+        self.square_sums = prefix_sums(self.returns * self.returns)
+        self.return_nans = nan_counts(self.returns)
+
+    def __len__(self):
+        return self.closes.shape[-1]
+
+    def extend(self, closes):
+        closes = np.asarray(closes, dtype=np.float64)
+        if closes.shape[-1] == 0:
+            return
+        joined = np.concatenate([self.closes, closes], axis=-1)
+        # Only the new bars' returns need computing (plus the last old close
+        # to chain from)
+        tail = simple_returns(forward_fill(joined)[..., len(self) - 1:])[..., 1:]
+        self.close_sums = prefix_sums(closes, self.close_sums)
+        self.close_nans = nan_counts(closes, self.close_nans)
+        self.return_sums = prefix_sums(tail, self.return_sums)
+        self.square_sums = prefix_sums(tail * tail, self.square_sums)
+        self.return_nans = nan_counts(tail, self.return_nans)
+        self.returns = np.concatenate([self.returns, tail], axis=-1)
+        self.closes = joined
+
+    def moving_average(self, window, lo=0, hi=None):
+        """
+        Rolling mean of the closes over [lo, hi), computed only from bars
+        at or after lo (as if the series started there).
+        """
+        hi = len(self) if hi is None else hi
+        mean = window_sums(self.close_sums, window, lo, hi) / window
+        mean[window_sums(self.close_nans, window, lo, hi) > 0] = np.nan
+        return mean
+
+    def period_returns(self, lo=0, hi=None):
+        hi = len(self) if hi is None else hi
+        returns = self.returns[..., lo:hi].copy()
+        returns[..., :1] = np.nan  # no previous bar inside the range
+        return returns
+
+    def volatility(self, window=VOLATILITY_WINDOW, lo=0, hi=None):
+        """
+        Annualized rolling std (ddof=1) of returns over [lo, hi), back-filled
+        and defaulting to DEFAULT_VOLATILITY.
+        """
+        hi = len(self) if hi is None else hi
+        if hi <= lo:
+            return np.empty(self.closes.shape[:-1] + (0,))
+        # The return at lo looks back before the range, so windows start at lo + 1
+        s1 = window_sums(self.return_sums, window, lo + 1, hi)
+        s2 = window_sums(self.square_sums, window, lo + 1, hi)
+        variance = np.maximum((s2 - s1 * s1 / window) / (window - 1), 0.0)
+        vol = np.full(s1.shape[:-1] + (hi - lo,), np.nan)
+        vol[..., 1:] = np.sqrt(variance) * np.sqrt(TRADING_DAYS)
+        vol[..., 1:][window_sums(self.return_nans, window, lo + 1, hi) > 0] = np.nan
+        vol = backward_fill(vol)
+        return np.where(np.isnan(vol), DEFAULT_VOLATILITY, vol)
+
+class IndicatorStore:
+    """
+    Process-wide cache of PriceSums per symbol.
+
+    compute() is handed the bars a backtest loaded and returns the series it
+    needs. If the cached history covers those bars (same dates and closes)
+    it is reused; bars past its end are appended incrementally; anything
+    else (a different or earlier history under the same key) rebuilds the
+    entry. The closes are always compared, so frames from different
+    providers under one symbol can't be mixed up.
+    """
+    def __init__(self, max_symbols=64):
+        self.max_symbols = max_symbols
+        self.hits = 0
+        self.extends = 0
+        self.builds = 0
+        self.compute_seconds = 0.0
+        self._entries = OrderedDict()  # key -> (dates, PriceSums)
+        self._lock = threading.Lock()
+
+    def stats(self) -> dict:
+        return {
+            'hits': self.hits,
+            'extends': self.extends,
+            'builds': self.builds,
+            'compute_seconds': round(self.compute_seconds, 6),
+            'symbols': sorted(self._entries),
+        }
+
+    def _sync(self, key, dates, closes):
+        """
+        Return (PriceSums, lo) with the requested bars at [lo, lo + len(dates)).
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            cached_dates, sums = entry
+            lo = int(np.searchsorted(cached_dates, dates[0])) if len(dates) else 0
+            overlap = min(len(cached_dates) - lo, len(dates))
+            if (lo < len(cached_dates) and cached_dates[lo] == dates[0]
+                    and np.array_equal(cached_dates[lo:lo + overlap], dates[:overlap])
+                    and np.array_equal(sums.closes[lo:lo + overlap], closes[:overlap], equal_nan=True)):
+                if overlap == len(dates):
+                    self.hits += 1
+                else:
+                    sums.extend(closes[overlap:])
+                    self._entries[key] = (np.concatenate([cached_dates, dates[overlap:]]), sums)
+                    self.extends += 1
+                self._entries.move_to_end(key)
+                return sums, lo
+
+        self.builds += 1
+        sums = PriceSums(closes)
+        self._entries[key] = (dates, sums)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_symbols:
+            self._entries.popitem(last=False)
+        return sums, 0
+
+    def compute(self, key, dates, closes, ma_windows=(), volatility_window=VOLATILITY_WINDOW) -> dict:
+        """
+        Indicators over the given bars, as if the history started at dates[0].
+
+        Args:
+            key: cache key (the symbol), or None to compute without caching
+                (e.g. for a one-off synthetic path)
+            dates: datetime64 bar dates, ascending
+            closes: close prices aligned with dates
+            ma_windows: moving-average windows to return
+
+        Returns:
+            dict: 'returns', 'volatility' and ('ma', window) -> np.ndarray
+        """
+        start = time.perf_counter()
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        closes = np.asarray(closes, dtype=np.float64)
+        with self._lock:
+            if key is None:
+                sums, lo = PriceSums(closes), 0
+            else:
+                sums, lo = self._sync(key, dates, closes)
+            hi = lo + len(dates)
+            result = {
+                'returns': sums.period_returns(lo, hi),
+                'volatility': sums.volatility(volatility_window, lo, hi),
+            }
+            for window in ma_windows:
+                result['ma', window] = sums.moving_average(window, lo, hi)
+            self.compute_seconds += time.perf_counter() - start
+        return result
+
+_default_store = None
+
+def get_indicator_store() -> IndicatorStore:
+    global _default_store
+    if _default_store is None:
+        _default_store = IndicatorStore()
+    return _default_store
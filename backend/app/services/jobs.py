@@ -0,0 +1,141 @@
+import json
+import os
+import threading
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from app.models import BacktestJobStatus, BacktestRequest, BacktestResult
+from app.services.backtest import LeapStrategyBacktester
+from app.services.result_store import get_result_store
+
+class BacktestJob:
+    __slots__ = (
+        'job_id', 'request', 'status', 'bars_processed', 'total_bars',
+        'error', 'result_key', 'created_at', 'started_at', 'finished_at'
+    )
+
+    def __init__(self, request: BacktestRequest):
+        self.job_id = str(uuid.uuid4())
+        self.request = request
+        self.status = 'queued'
+        self.bars_processed = 0
+        self.total_bars = None
+        self.error = None
+        self.result_key = None  # result store key of the finished result
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+
+    def _update_progress(self, bars_processed, total_bars):
+        self.bars_processed = bars_processed
+        self.total_bars = total_bars
+
+    def to_status(self, include_result=True) -> BacktestJobStatus:
+        progress = self.bars_processed / self.total_bars if self.total_bars else 0.0
+        result, error = None, self.error
+        if include_result and self.result_key is not None:
+            result_json = get_result_store().get(self.result_key)
+            if result_json is not None:
+                result = BacktestResult.model_validate_json(result_json)
+            else:
+                error = "The result has been evicted from the result store; submit the job again"
+        return BacktestJobStatus(
+            job_id=self.job_id,
+            status=self.status,
+            bars_processed=self.bars_processed,
+            total_bars=self.total_bars,
+            progress=round(progress, 4),
+            error=error,
+            created_at=self.created_at.isoformat(),
+            started_at=self.started_at.isoformat() if self.started_at else None,
+            finished_at=self.finished_at.isoformat() if self.finished_at else None,
+            result=result
+        )
+
+class JobManager:
+    """
+    Runs backtests in a bounded thread pool so request handlers return
+    immediately; clients poll job status (bars processed / total) and pick
+    up the result once the job completes.
+
+    Only the most recent `max_jobs` jobs are retained. A job holds just the
+    key of its result in the result store, not the result itself, so
+    retained jobs stay small; a result the store has since evicted is
+    reported as an error.
+    """
+    def __init__(self, max_workers=None, max_jobs=500):
+        max_workers = max_workers or int(os.environ.get('BACKTEST_JOB_WORKERS', 2))
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='backtest-job')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_jobs = max_jobs
+
+    def submit(self, request: BacktestRequest) -> BacktestJob:
+        job = BacktestJob(request)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._evict()
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id) -> BacktestJob:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _evict(self):
+        # Drop the oldest finished jobs once over the limit; queued and
+        # running jobs are never evicted.
+        excess = len(self._jobs) - self.max_jobs
+        if excess <= 0:
+            return
+        for job_id in [j.job_id for j in self._jobs.values() if j.status in ('completed', 'failed')][:excess]:
+            del self._jobs[job_id]
+
+    def _run(self, job: BacktestJob):
+        job.status = 'running'
+        job.started_at = datetime.now()
+        try:
+            store = get_result_store()
+            key, market_data, cached = store.lookup(job.request)
+            if cached is not None:
+                bars = len(json.loads(cached)['history'])
+                job._update_progress(bars, bars)
+            else:
+                run = LeapStrategyBacktester(job.request, market_data).execute(job._update_progress)
+                if key is not None:
+                    store.store_run(key, run)
+                if key is None or job.request.diagnostics:
+                    # Uncacheable, or stored without the diagnostics this job
+                    # returns: keep the job's own copy (the run id of an
+                    # uncacheable run, so GET /backtest/{id} finds it too)
+                    key = run.backtest_id if key is None else job.job_id
+                    store.put(key, run.to_json())
+            job.result_key = key
+            job.status = 'completed'
+        except Exception as e:
+            if not isinstance(e, ValueError):
+                traceback.print_exc()
+            job.error = str(e)
+            job.status = 'failed'
+        finally:
+            job.finished_at = datetime.now()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+_job_manager = None
+
+def get_job_manager() -> JobManager:
+    global _job_manager
+    if _job_manager is None:
+        _job_manager = JobManager()
+    return _job_manager
+
+def shutdown_job_manager():
+    global _job_manager
+    if _job_manager is not None:
+        _job_manager.shutdown()
+        _job_manager = None
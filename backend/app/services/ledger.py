@@ -0,0 +1,262 @@
+import io
+import json
+import time
+import uuid
+from datetime import date
+
+import numpy as np
+
+from app.models import BacktestRequest, BacktestResult, PortfolioSnapshot, Trade
+from app.services.diagnostics import Diagnostics, get_metrics_registry
+
+# Per-bar snapshot columns, in the order LeapStrategyBacktester writes them.
+HISTORY_DTYPE = np.dtype([
+    ('equity_value', 'f8'),
+    ('leap_value', 'f8'),
+    ('cash_value', 'f8'),
+    ('total_value', 'f8'),
+    ('benchmark_value', 'f8'),
+    ('equity_price', 'f8'),
+    ('drawdown', 'f8'),
+    ('delta', 'f8'),
+    ('gamma', 'f8'),
+    ('theta', 'f8'),
+    ('vega', 'f8'),
+])
+
+GREEK_FIELDS = ('delta', 'gamma', 'theta', 'vega')
+
+class HistoryBuffer:
+    """
+    Preallocated structured array holding one row per bar.
+
+    The event loop writes plain tuples into it; PortfolioSnapshot models are
+    only built by to_snapshots() at the API boundary.
+    """
+    __slots__ = ('dates', 'data', 'size')
+
+    def __init__(self, dates):
+        self.dates = np.asarray(dates, dtype='datetime64[D]')
+        self.data = np.zeros(len(self.dates), dtype=HISTORY_DTYPE)
+        self.size = 0
+
+    def append(self, row):
+        self.data[self.size] = row
+        self.size += 1
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def rows(self):
+        return self.data[:self.size]
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes + self.dates.nbytes
+
+    def take(self, indices) -> 'HistoryBuffer':
+        """
+        A new buffer holding only the given rows (e.g. a downsampled history).
+        """
+        indices = np.asarray(indices, dtype=np.intp)
+        subset = HistoryBuffer(self.dates[indices])
+        subset.data[:] = self.data[indices]
+        subset.size = len(indices)
+        return subset
+
+    def to_snapshots(self, lo=0, hi=None):
+        """
+        PortfolioSnapshot models for rows [lo, hi) (default: all written rows).
+        """
+        hi = self.size if hi is None else hi
+        rows = self.data[lo:hi]
+        date_strs = np.datetime_as_string(self.dates[lo:hi], unit='D').tolist()
+        columns = [rows[name].tolist() for name in HISTORY_DTYPE.names]
+        return [
+            PortfolioSnapshot(
+                date=date_str,
+                equity_value=round(equity, 2),
+                leap_value=round(leap, 2),
+                cash_value=round(cash, 2),
+                total_value=round(total, 2),
+                benchmark_value=round(benchmark, 2),
+                equity_price=round(price, 2),
+                drawdown=round(drawdown, 4),
+                greeks={'delta': delta, 'gamma': gamma, 'theta': theta, 'vega': vega}
+            )
+            for date_str, equity, leap, cash, total, benchmark, price, drawdown, delta, gamma, theta, vega
+            in zip(date_strs, *columns)
+        ]
+
+class TradeLedger:
+    """
+    Append-only trade log kept as plain tuples until converted to Trade models,
+    with the running value traded (cash withdrawals excluded) for turnover.
+    """
+    __slots__ = ('entries', 'traded_value')
+
+    def __init__(self):
+        self.entries = []
+        self.traded_value = 0.0
+
+    def record(self, date, type, asset, quantity, price, value, reason):
+        self.entries.append((date, type, asset, quantity, price, value, reason))
+        if asset != "CASH":
+            self.traded_value += abs(value)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def to_trades(self, lo=0, hi=None):
+        return [
+            Trade(
+                date=date.strftime("%Y-%m-%d"), type=type, asset=asset,
+                quantity=quantity, price=price, value=value, reason=reason
+            )
+            for date, type, asset, quantity, price, value, reason in self.entries[lo:hi]
+        ]
+
+class BacktestRun:
+    """
+    Raw output of LeapStrategyBacktester.simulate(): the history buffer, the
+    trade ledger and summary metrics. to_result() builds (and caches) the
+    BacktestResult the API returns, timing that step in `diagnostics` and
+    attaching the diagnostics when the request asked for them; to_json()
+    encodes it, timed as the 'serialize' stage.
+    """
+    __slots__ = ('params', 'history', 'trades', 'metrics', 'diagnostics', 'backtest_id', '_result')
+
+    def __init__(self, params: BacktestRequest, history: HistoryBuffer, trades: TradeLedger, metrics: dict, diagnostics: Diagnostics = None):
+        self.params = params
+        self.history = history
+        self.trades = trades
+        self.metrics = metrics
+        self.diagnostics = diagnostics or Diagnostics()
+        self.backtest_id = str(uuid.uuid4())  # the result store replaces it with the content key
+        self._result = None
+
+    def to_result(self) -> BacktestResult:
+        if self._result is None:
+            start = time.perf_counter()
+            result = BacktestResult(
+                backtest_id=self.backtest_id,
+                params=self.params,
+                trades=self.trades.to_trades(),
+                history=self.history.to_snapshots(),
+                **self.metrics
+            )
+            self.record_stage('build_models', time.perf_counter() - start)
+            if self.params.diagnostics:
+                result.diagnostics = self.diagnostics.to_model(history_bytes=self.history.nbytes)
+            self._result = result
+        return self._result
+
+    def to_json(self) -> str:
+        """
+        to_result() as JSON. The diagnostics report is encoded after the rest
+        of the result, so it includes the 'serialize' stage.
+        """
+        result = self.to_result()
+        start = time.perf_counter()
+        if result.diagnostics is None:
+            result_json = result.model_dump_json()
+            self.record_stage('serialize', time.perf_counter() - start)
+            return result_json
+        # diagnostics is the last field
+        result_json = result.model_dump_json(exclude={'diagnostics'})
+        self.record_stage('serialize', time.perf_counter() - start)
+        return f'{result_json[:-1]},"diagnostics":{self.diagnostics_json()}}}'
+
+    def iter_stored_json(self, chunk_size=1000):
+        """
+        The result as the result store keeps it (to_json() without
+        diagnostics), in pieces. Snapshot and trade models are built
+        `chunk_size` at a time and dropped, so the full result is never held
+        -- for the streaming endpoint, which exists to avoid that.
+        """
+        head = BacktestResult(
+            backtest_id=self.backtest_id,
+            params=self.params.model_copy(update={'diagnostics': False}),
+            trades=[],
+            history=[],
+            **self.metrics
+        ).model_dump_json(exclude={'trades', 'history', 'diagnostics'})
+        # Fields in BacktestResult order: ..., trades, history, diagnostics
+        yield head[:-1] + ',"trades":['
+        for lo in range(0, len(self.trades), chunk_size):
+            yield (',' if lo else '') + ','.join(trade.model_dump_json() for trade in self.trades.to_trades(lo, lo + chunk_size))
+        yield '],"history":['
+        for lo in range(0, len(self.history), chunk_size):
+            yield (',' if lo else '') + ','.join(snapshot.model_dump_json() for snapshot in self.history.to_snapshots(lo, lo + chunk_size))
+        yield '],"diagnostics":null}'
+
+    def diagnostics_json(self) -> str:
+        return self.diagnostics.to_model(history_bytes=self.history.nbytes).model_dump_json()
+
+    def record_stage(self, stage, seconds):
+        """
+        Time a stage run after simulate() (and so after the run was recorded
+        in the metrics registry).
+        """
+        self.diagnostics.add(stage, seconds)
+        get_metrics_registry().record_stage(stage, seconds)
+
+OPTION_LEGS = ('leap', 'wheel_put', 'wheel_call')
+
+class BacktestCheckpoint:
+    """
+    State of a finished run from which LeapStrategyBacktester.simulate()
+    can continue over later bars instead of starting again at start_date:
+    the portfolio and rule state after the last bar (`state`), plus the
+    history and trades so far, which the extended result still reports.
+
+    to_bytes() writes an .npz without pickles: the history rows and dates
+    as arrays, the state and trades as JSON. It is left uncompressed; the
+    float columns shrink by under 10% and zlib would dominate a refresh.
+    """
+    __slots__ = ('state', 'history', 'trades')
+
+    def __init__(self, state: dict, history: HistoryBuffer, trades: TradeLedger):
+        self.state = state
+        self.history = history
+        self.trades = trades
+
+    @property
+    def last_date(self) -> date:
+        return self.history.dates[self.history.size - 1].astype(object)
+
+    def to_bytes(self) -> bytes:
+        portfolio = dict(self.state['portfolio'])
+        for name in OPTION_LEGS:
+            if portfolio[name]:
+                portfolio[name] = dict(portfolio[name], expiry_date=portfolio[name]['expiry_date'].isoformat())
+        meta = {
+            'state': dict(self.state, portfolio=portfolio),
+            'trades': [(d.isoformat(), *rest) for d, *rest in self.trades.entries],
+            'traded_value': self.trades.traded_value,
+        }
+        buffer = io.BytesIO()
+        np.savez(
+            buffer, dates=self.history.dates[:self.history.size], rows=self.history.rows, meta=np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8)
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, payload: bytes) -> 'BacktestCheckpoint':
+        with np.load(io.BytesIO(payload), allow_pickle=False) as archive:
+            history = HistoryBuffer(archive['dates'])
+            history.data[:] = archive['rows']
+            history.size = len(history.dates)
+            meta = json.loads(archive['meta'].tobytes())
+
+        state = meta['state']
+        for name in OPTION_LEGS:
+            leg = state['portfolio'][name]
+            if leg:
+                leg['expiry_date'] = date.fromisoformat(leg['expiry_date'])
+                leg['greeks'] = tuple(leg['greeks'])
+        trades = TradeLedger()
+        trades.entries = [(date.fromisoformat(d), *rest) for d, *rest in meta['trades']]
+        trades.traded_value = meta['traded_value']
+        return cls(state, history, trades)
@@ -0,0 +1,447 @@
+import json
+import os
+import tempfile
+import threading
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+OHLCV_COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume')
+
+# Annualized model vol of a simulated path, kept alongside its bars so the
+# backtester prices options at it
+PATH_VOL = 'PathVol'
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+def normalize_ohlcv(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Bring a downloaded frame into the shape the cache stores: flat OHLCV
+    float64 columns (plus PATH_VOL for a simulated path) on a tz-naive,
+    sorted, de-duplicated daily DatetimeIndex.
+
+    yf.download returns (Price, Ticker) MultiIndex columns even for a single
+    symbol; the ticker level is dropped here.
+    """
+    if data is None or data.empty:
+        return pd.DataFrame(columns=list(OHLCV_COLUMNS), index=pd.DatetimeIndex([], name='Date'), dtype=np.float64)
+
+    if isinstance(data.columns, pd.MultiIndex):
+        data = data.droplevel(list(range(1, data.columns.nlevels)), axis=1)
+    data = data.loc[:, [c for c in OHLCV_COLUMNS + (PATH_VOL,) if c in data.columns]].astype(np.float64)
+
+    index = pd.DatetimeIndex(data.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    data.index = index.normalize().rename('Date')
+    data = data[~data.index.duplicated(keep='last')]
+    return data.sort_index()
+
+class MarketDataProvider:
+    """
+    Source of daily OHLCV bars for a symbol over [start, end) (end exclusive,
+    matching yf.download). Dates may be 'YYYY-MM-DD' strings or date objects.
+    """
+    def get_history(self, symbol, start, end) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def get_histories(self, symbols, start, end) -> dict:
+        """
+        Bars for several symbols over the same range, as {symbol: frame}
+        keyed by the upper-cased symbol. Providers that can fetch a basket
+        in one request override this; the default asks for each in turn.
+        """
+        return {symbol.upper(): self.get_history(symbol, start, end) for symbol in symbols}
+
+class YFinanceProvider(MarketDataProvider):
+    def get_history(self, symbol, start, end) -> pd.DataFrame:
+        data = yf.download(symbol, start=str(_to_date(start)), end=str(_to_date(end)), progress=False)
+        return normalize_ohlcv(data)
+
+    def get_histories(self, symbols, start, end) -> dict:
+        symbols = sorted({symbol.upper() for symbol in symbols})
+        # One download for the whole basket; columns come back as (Price, Ticker)
+        data = yf.download(symbols, start=str(_to_date(start)), end=str(_to_date(end)), progress=False)
+        frames = {}
+        for symbol in symbols:
+            if data is None or data.empty or symbol not in data.columns.get_level_values(-1):
+                frames[symbol] = normalize_ohlcv(None)
+                continue
+            # Rows are the union of all tickers' dates; drop the ones this
+            # ticker didn't trade
+            frames[symbol] = normalize_ohlcv(data.xs(symbol, axis=1, level=-1).dropna(how='all'))
+        return frames
+
+class FrameProvider(MarketDataProvider):
+    """
+    Serves preloaded frames keyed by symbol. Used to run backtests without
+    network access (tests, benchmarks) and to hand already-loaded data to
+    worker processes.
+    """
+    def __init__(self, frames):
+        self.frames = {symbol.upper(): normalize_ohlcv(df) for symbol, df in frames.items()}
+
+    def get_history(self, symbol, start, end) -> pd.DataFrame:
+        data = self.frames.get(symbol.upper())
+        if data is None:
+            return normalize_ohlcv(None)
+        start, end = pd.Timestamp(_to_date(start)), pd.Timestamp(_to_date(end))
+        return data.loc[(data.index >= start) & (data.index < end)]
+
+class MappedFrameProvider(MarketDataProvider):
+    """
+    Serves frames snapshotted to .npy columns under `path` (one directory
+    per symbol), memory-mapped on first use in each process. It pickles as
+    its path alone, so worker processes map the same files rather than
+    receiving a copy of the bars: the pages are shared through the OS page
+    cache and each requested range is a view into them.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._columns = {}  # symbol -> {column: memmap}
+
+    @classmethod
+    def create(cls, path, frames) -> 'MappedFrameProvider':
+        """
+        Write `frames` ({symbol: frame}) under `path` and return a provider
+        over them.
+        """
+        for symbol, frame in frames.items():
+            directory = os.path.join(path, symbol.upper())
+            os.makedirs(directory, exist_ok=True)
+            np.save(os.path.join(directory, 'Date.npy'), frame.index.values.astype('datetime64[D]'))
+            for name in frame.columns:
+                np.save(os.path.join(directory, f"{name}.npy"), frame[name].to_numpy(dtype=np.float64))
+        return cls(path)
+
+    def __getstate__(self):
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'])
+
+    def _load(self, symbol):
+        columns = self._columns.get(symbol)
+        if columns is None:
+            directory = os.path.join(self.path, symbol)
+            if not os.path.isdir(directory):
+                return None
+            columns = {
+                name[:-len('.npy')]: np.load(os.path.join(directory, name), mmap_mode='r')
+                for name in sorted(os.listdir(directory)) if name.endswith('.npy')
+            }
+            self._columns[symbol] = columns
+        return columns
+
+    def get_history(self, symbol, start, end) -> pd.DataFrame:
+        columns = self._load(symbol.upper())
+        if columns is None:
+            return normalize_ohlcv(None)
+        dates = columns['Date']
+        lo = np.searchsorted(dates, np.datetime64(_to_date(start), 'D'), side='left')
+        hi = np.searchsorted(dates, np.datetime64(_to_date(end), 'D'), side='left')
+        index = pd.DatetimeIndex(np.asarray(dates[lo:hi]).astype('datetime64[ns]'), name='Date')
+        names = [name for name in OHLCV_COLUMNS + (PATH_VOL,) if name in columns]
+        return pd.DataFrame({name: columns[name][lo:hi] for name in names}, index=index, copy=False)
+
+class MarketDataCache(MarketDataProvider):
+    """
+    Persistent per-symbol cache in front of another provider.
+
+    Each symbol is stored as one .npy file per column (dates as datetime64[D])
+    plus a meta.json recording the [covered_start, covered_end) range that
+    has been fetched. Reads memory-map the column files, so any sub-range of
+    a cached history is served without touching the network; a request that
+    reaches past the covered range only downloads the missing head/tail,
+    overlapping the cache by one bar. If the provider's close for that bar
+    has changed (a split or dividend re-adjusted the history), the whole
+    symbol is downloaded again instead of stitching two adjustment bases.
+    """
+    def __init__(self, cache_dir, provider: MarketDataProvider = None):
+        self.cache_dir = cache_dir
+        self.provider = provider or YFinanceProvider()
+        self.hits = 0
+        self.misses = 0
+        self.downloads = 0
+        self._entries = {}  # symbol -> (meta, {column: memmap})
+        self._lock = threading.Lock()
+
+    def stats(self) -> dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'downloads': self.downloads,
+            'symbols': sorted(self._entries),
+        }
+
+    def _symbol_dir(self, symbol):
+        return os.path.join(self.cache_dir, symbol.upper())
+
+    def _load(self, symbol):
+        path = self._symbol_dir(symbol)
+        meta_path = os.path.join(path, 'meta.json')
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            meta = json.load(f)
+        columns = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r') for name in ('Date',) + OHLCV_COLUMNS}
+        meta['covered_start'] = _to_date(meta['covered_start'])
+        meta['covered_end'] = _to_date(meta['covered_end'])
+        return meta, columns
+
+    def _store(self, symbol, data: pd.DataFrame, covered_start, covered_end):
+        path = self._symbol_dir(symbol)
+        os.makedirs(path, exist_ok=True)
+        columns = {'Date': data.index.values.astype('datetime64[D]')}
+        for name in OHLCV_COLUMNS:
+            columns[name] = data[name].to_numpy(dtype=np.float64) if name in data else np.full(len(data), np.nan)
+
+        # Write to temp files and swap them in, so concurrent readers (other
+        # processes holding memmaps) never see a half-written column.
+        for name, values in columns.items():
+            fd, tmp = tempfile.mkstemp(dir=path, suffix='.npy')
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, values)
+            os.replace(tmp, os.path.join(path, f"{name}.npy"))
+        fd, tmp = tempfile.mkstemp(dir=path, suffix='.json')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'symbol': symbol.upper(), 'covered_start': str(covered_start), 'covered_end': str(covered_end), 'rows': len(data)}, f)
+        os.replace(tmp, os.path.join(path, 'meta.json'))
+
+    @staticmethod
+    def _frame(columns, start, end) -> pd.DataFrame:
+        dates = columns['Date']
+        lo = np.searchsorted(dates, np.datetime64(start, 'D'), side='left')
+        hi = np.searchsorted(dates, np.datetime64(end, 'D'), side='left')
+        index = pd.DatetimeIndex(np.asarray(dates[lo:hi]).astype('datetime64[ns]'), name='Date')
+        return pd.DataFrame({name: np.array(columns[name][lo:hi]) for name in OHLCV_COLUMNS}, index=index)
+
+    @staticmethod
+    def _missing_ranges(meta, start, end):
+        if meta is None:
+            return [(start, end)]
+        gaps = []
+        if start < meta['covered_start']:
+            gaps.append((start, meta['covered_start']))
+        if end > meta['covered_end']:
+            gaps.append((meta['covered_end'], end))
+        return gaps
+
+    @staticmethod
+    def _covered_bars(entry):
+        """
+        (dates, closes) of the cached bars inside [covered_start, covered_end).
+        Caches written by older code may also hold a bar from covered_end on
+        (a partial bar of that day), which is left out.
+        """
+        meta, columns = entry
+        dates = columns['Date']
+        lo = np.searchsorted(dates, np.datetime64(meta['covered_start'], 'D'), side='left')
+        hi = np.searchsorted(dates, np.datetime64(meta['covered_end'], 'D'), side='left')
+        return dates[lo:hi], columns['Close'][lo:hi]
+
+    @classmethod
+    def _overlapping(cls, entry, gaps):
+        """
+        Widen each gap to also re-fetch the cached bar next to it, so the
+        download overlaps the cache by one bar and _rebased() can compare it.
+        """
+        if entry is None:
+            return gaps
+        dates, _ = cls._covered_bars(entry)
+        if not len(dates):
+            return gaps
+        first, last = dates[0].item(), dates[-1].item()
+        return [(min(gap_start, last), max(gap_end, first + timedelta(days=1))) for gap_start, gap_end in gaps]
+
+    @classmethod
+    def _rebased(cls, entry, fetched) -> bool:
+        """
+        Whether `fetched` disagrees with the cached closes on the bars they
+        share. yfinance closes are split/dividend adjusted as of the download,
+        so after a corporate action the cached bars are on a different basis
+        and stitching new bars onto them would show a fake jump.
+        """
+        if entry is None or fetched is None or fetched.empty:
+            return False
+        dates, closes = cls._covered_bars(entry)
+        if not len(dates):
+            return False
+        fetched = normalize_ohlcv(fetched)
+        fetched_dates = fetched.index.values.astype('datetime64[D]')
+        pos = np.minimum(np.searchsorted(dates, fetched_dates), len(dates) - 1)
+        shared = dates[pos] == fetched_dates
+        cached = np.asarray(closes)[pos[shared]]
+        return not np.allclose(cached, fetched['Close'].to_numpy()[shared], rtol=1e-6, atol=0, equal_nan=True)
+
+    def _lookup(self, symbol, start, end):
+        """
+        (cache entry or None, gaps still to fetch); caller holds the lock.
+        """
+        entry = self._entries.get(symbol)
+        if entry is None or self._missing_ranges(entry[0], start, end):
+            # Another process may have filled the gap since we last looked
+            entry = self._load(symbol)
+        gaps = self._missing_ranges(entry[0] if entry else None, start, end)
+        if not gaps:
+            self.hits += 1
+            self._entries[symbol] = entry
+        return entry, gaps
+
+    def _merge(self, symbol, downloads, start, end, replace=False) -> pd.DataFrame:
+        """
+        Store the bars of `downloads` -- (range_start, range_end, frame) per
+        download -- together with what the cache holds now (another thread
+        or process may have extended it during the download), or in place of
+        it when `replace`, and return the [start, end) slice; caller holds
+        the lock.
+
+        A range is only marked covered if its download returned bars:
+        yfinance reports a failed or rate-limited download as an empty frame
+        rather than raising, and a refresh always overlaps a cached bar, so
+        an empty answer means the download failed. With nothing downloaded
+        the cache is left as it was and whatever it holds is served.
+        """
+        entry = None if replace else self._load(symbol)
+        meta = entry[0] if entry else None
+        # Never mark today or later as covered: the last bar may still change
+        today = date.today()
+        covered = (meta['covered_start'], meta['covered_end']) if meta else None
+        frames = []
+        for range_start, range_end, frame in downloads:
+            frame = normalize_ohlcv(frame)
+            if frame.empty:
+                continue
+            frames.append(frame)
+            range_end = max(min(range_end, today), range_start)
+            covered = (range_start, range_end) if covered is None else (min(covered[0], range_start), max(covered[1], range_end))
+
+        if not frames:
+            entry = entry or self._load(symbol)
+            if entry is None:
+                return normalize_ohlcv(None)
+            self._entries[symbol] = entry
+            return self._frame(entry[1], start, end)
+
+        fetched = normalize_ohlcv(pd.concat(frames))
+        parts = [self._frame(entry[1], meta['covered_start'], meta['covered_end'])] if entry else []
+        merged = normalize_ohlcv(pd.concat(parts + [fetched]))
+        covered_start, covered_end = covered
+        # Only bars inside the covered range are stored; later ones (today's)
+        # are served from this download but fetched again next time
+        merged = merged[(merged.index >= pd.Timestamp(covered_start)) & (merged.index < pd.Timestamp(covered_end))]
+        self._store(symbol, merged, covered_start, covered_end)
+        entry = self._load(symbol)
+        self._entries[symbol] = entry
+        frame = self._frame(entry[1], start, end)
+        recent = fetched[(fetched.index >= pd.Timestamp(max(covered_end, start))) & (fetched.index < pd.Timestamp(end))]
+        return normalize_ohlcv(pd.concat([frame, recent])) if len(recent) else frame
+
+    @staticmethod
+    def _full_range(entry, start, end):
+        meta = entry[0]
+        return min(start, meta['covered_start']), max(end, meta['covered_end'])
+
+    def get_history(self, symbol, start, end) -> pd.DataFrame:
+        start, end = _to_date(start), _to_date(end)
+        symbol = symbol.upper()
+        with self._lock:
+            entry, gaps = self._lookup(symbol, start, end)
+            if not gaps:
+                return self._frame(entry[1], start, end)
+            self.misses += 1
+            self.downloads += len(gaps)
+
+        # Download without the lock so a slow symbol doesn't hold up readers
+        # of cached ones; a concurrent download of the same range just
+        # merges the same bars twice.
+        replace = False
+        try:
+            ranges = self._overlapping(entry, gaps)
+            downloads = [(lo, hi, self.provider.get_history(symbol, lo, hi)) for lo, hi in ranges]
+            if any(self._rebased(entry, frame) for _, _, frame in downloads):
+                # Adjustment basis changed since the cache was filled:
+                # re-download everything it covers
+                with self._lock:
+                    self.downloads += 1
+                lo, hi = self._full_range(entry, start, end)
+                downloads = [(lo, hi, self.provider.get_history(symbol, lo, hi))]
+                replace = True
+        except Exception:
+            # Offline / provider failure: serve whatever is cached
+            if entry is None:
+                raise
+            return self._frame(entry[1], start, end)
+
+        with self._lock:
+            return self._merge(symbol, downloads, start, end, replace=replace)
+
+    def get_histories(self, symbols, start, end) -> dict:
+        """
+        Like get_history for each symbol, but every symbol with a gap is
+        fetched in a single provider.get_histories() call spanning all the
+        gaps, so a basket costs one download rather than one per symbol.
+        """
+        start, end = _to_date(start), _to_date(end)
+        symbols = sorted({symbol.upper() for symbol in symbols})
+        frames = {}
+        with self._lock:
+            missing = {}
+            for symbol in symbols:
+                entry, gaps = self._lookup(symbol, start, end)
+                if gaps:
+                    missing[symbol] = (entry, gaps)
+                else:
+                    frames[symbol] = self._frame(entry[1], start, end)
+            if not missing:
+                return frames
+            self.misses += len(missing)
+            self.downloads += 1
+
+        # Download without the lock, as in get_history
+        ranges = [gap for entry, gaps in missing.values() for gap in self._overlapping(entry, gaps)]
+        fetch_start, fetch_end = min(gap[0] for gap in ranges), max(gap[1] for gap in ranges)
+        rebased = []
+        try:
+            fetched = self.provider.get_histories(list(missing), fetch_start, fetch_end)
+            downloads = {symbol: (fetch_start, fetch_end, fetched.get(symbol)) for symbol in missing}
+            rebased = [symbol for symbol, (entry, _) in missing.items() if self._rebased(entry, fetched.get(symbol))]
+            if rebased:
+                with self._lock:
+                    self.downloads += 1
+                spans = [self._full_range(missing[symbol][0], start, end) for symbol in rebased]
+                lo, hi = min(span[0] for span in spans), max(span[1] for span in spans)
+                refetched = self.provider.get_histories(rebased, lo, hi)
+                downloads.update({symbol: (lo, hi, refetched.get(symbol)) for symbol in rebased})
+        except Exception:
+            # Offline / provider failure: serve whatever is cached
+            if any(entry is None for entry, _ in missing.values()):
+                raise
+            downloads = None
+
+        with self._lock:
+            for symbol, (entry, _) in missing.items():
+                if downloads is None:
+                    frames[symbol] = self._frame(entry[1], start, end)
+                else:
+                    frames[symbol] = self._merge(symbol, [downloads[symbol]], start, end, replace=symbol in rebased)
+        return frames
+
+_default_cache = None
+
+def get_market_data() -> MarketDataCache:
+    """
+    Process-wide cache used when a backtester is not given a provider.
+    The location can be overridden with MARKET_DATA_CACHE_DIR.
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = MarketDataCache(os.environ.get('MARKET_DATA_CACHE_DIR', 'market_data_cache'))
+    return _default_cache
@@ -0,0 +1,137 @@
+from datetime import datetime, timedelta
+from functools import reduce
+
+import numpy as np
+
+from app.models import MultiAssetRequest, MultiAssetResult, MultiAssetSnapshot, SymbolBreakdown
+from app.services.backtest import DATA_BUFFER_DAYS
+from app.services.market_data import MarketDataProvider, get_market_data
+from app.services.simulator import BOOTSTRAP, MarketSimulator, bootstrap_params
+from app.services.performance import METRIC_NAMES, series_metrics
+from app.services.vector_backtest import VectorizedLeapBacktester
+
+# One strategy over a basket of underlyings.
+#
+# Each symbol is a sleeve: its weight's share of the capital (and of the
+# monthly withdrawal and wheel allocation) runs the strategy on that symbol
+# alone, exactly as a separate backtest with the scaled amounts would. The
+# sleeves are the paths of one VectorizedLeapBacktester, so the basket is
+# loaded in one bulk fetch, aligned on the dates every symbol traded, and
+# each bar marks all sleeves' option legs with one array call per leg kind
+# instead of N event loops. Portfolio figures come from the summed sleeve
+# values; the benchmark is buy-and-hold of the basket at the same weights.
+
+def normalized_weights(request: MultiAssetRequest) -> np.ndarray:
+    n = len(request.symbols)
+    if request.weights is None:
+        return np.full(n, 1.0 / n)
+    if len(request.weights) != n:
+        raise ValueError("weights must have one entry per symbol")
+    weights = np.asarray(request.weights, dtype=np.float64)
+    if not (weights > 0).all():
+        raise ValueError("weights must be positive")
+    return weights / weights.sum()
+
+def load_basket(request: MultiAssetRequest, market_data: MarketDataProvider = None):
+    """
+    Closes of every symbol on one shared date index.
+
+    Historical bars are fetched together (with the warm-up buffer the scalar
+    engine loads) and kept only on dates all symbols traded. In simulation
+    mode each symbol gets an independent path of the scenario's model, drawn
+    from simulation_seed when it is set, and its options are priced at the
+    path's model vol; the bootstrap scenario instead resamples the symbols'
+    joint history, the same blocks for all, keeping their correlation.
+
+    Returns:
+        tuple: (DatetimeIndex, (n_symbols, n_bars) closes, warm-up bars
+               before start_date, (n_symbols, n_bars) path vols or None
+               for historical bars)
+    """
+    base = request.base
+    symbols = [symbol.upper() for symbol in request.symbols]
+    if base.use_simulation and base.simulation_scenario == BOOTSTRAP:
+        params = bootstrap_params(base.simulation_model, base.simulation_params)
+        history = MarketSimulator.load_history(symbols, base.start_date, params, market_data or get_market_data())
+        paths = MarketSimulator.generate_paths(
+            base.start_date, base.end_date, BOOTSTRAP, 1, np.random.default_rng(base.simulation_seed),
+            base.simulation_model, base.simulation_params, history=history
+        )
+        return paths.dates, paths.prices[0], 0, None
+    if base.use_simulation:
+        rng = np.random.default_rng(base.simulation_seed)
+        paths = MarketSimulator.generate_paths(
+            base.start_date, base.end_date, base.simulation_scenario, len(symbols), rng,
+            base.simulation_model, base.simulation_params
+        )
+        return paths.dates, paths.prices, 0, paths.vols
+
+    market_data = market_data or get_market_data()
+    buffer_date = datetime.strptime(base.start_date, "%Y-%m-%d") - timedelta(days=DATA_BUFFER_DAYS)
+    frames = market_data.get_histories(symbols, buffer_date.strftime("%Y-%m-%d"), base.end_date)
+    for symbol in symbols:
+        if frames.get(symbol) is None or frames[symbol].empty:
+            raise ValueError(f"No data found for {symbol}")
+
+    index = reduce(lambda a, b: a.intersection(b), (frames[symbol].index for symbol in symbols))
+    closes = np.vstack([frames[symbol]['Close'].reindex(index).to_numpy(dtype=np.float64) for symbol in symbols])
+    warmup = int(np.searchsorted(index.values, np.datetime64(base.start_date, 'ns')))
+    if warmup == len(index):
+        raise ValueError(f"No dates on which all of {', '.join(symbols)} traded")
+    return index, closes, warmup, None
+
+def _optional(value):
+    return None if np.isnan(value) else float(value)
+
+def run_multi_asset(request: MultiAssetRequest, market_data: MarketDataProvider = None) -> MultiAssetResult:
+    symbols = [symbol.upper() for symbol in request.symbols]
+    if len(set(symbols)) != len(symbols):
+        raise ValueError("symbols must be distinct")
+    weights = normalized_weights(request)
+    base = request.base
+
+    dates, closes, warmup, vols = load_basket(request, market_data)
+    run = VectorizedLeapBacktester(base, dates, closes, warmup_bars=warmup, capital_weights=weights, vols=vols).simulate()
+
+    values = run.total_value  # (n_symbols, n_bars)
+    total = values.sum(axis=0)
+    trading = closes[:, warmup:]
+    benchmark = (base.initial_capital * weights / trading[:, 0]) @ trading
+    peak = np.maximum.accumulate(total)
+    with np.errstate(all='ignore'):
+        drawdown = np.where(peak > 0, (peak - total) / peak, 0.0)
+    portfolio = series_metrics(
+        base, total, base.initial_capital, run.traded_value.sum(), int(run.metrics['rebalance_count'].sum())
+    )
+    if np.isnan(portfolio['cagr']):
+        raise ValueError("Portfolio value went negative; CAGR is undefined")
+
+    breakdown = [
+        SymbolBreakdown(
+            symbol=symbol,
+            weight=round(float(weights[i]), 6),
+            initial_capital=round(float(base.initial_capital * weights[i]), 2),
+            final_value=round(float(values[i, -1]), 2),
+            trade_count=int(run.trade_counts[i]),
+            **{name: _optional(run.metrics[name][i]) for name in METRIC_NAMES},
+        )
+        for i, symbol in enumerate(symbols)
+    ]
+
+    day_strings = np.datetime_as_string(dates[warmup:].values, unit='D').tolist()
+    rounded = np.round(values, 2).T.tolist()
+    history = [
+        MultiAssetSnapshot(
+            date=day, total_value=t, benchmark_value=b, drawdown=d, values=dict(zip(symbols, sleeves))
+        )
+        for day, t, b, d, sleeves in zip(
+            day_strings, np.round(total, 2).tolist(), np.round(benchmark, 2).tolist(),
+            np.round(drawdown, 4).tolist(), rounded
+        )
+    ]
+    return MultiAssetResult(
+        params=request,
+        symbols=breakdown,
+        history=history,
+        **portfolio,
+    )
@@ -0,0 +1,165 @@
+import asyncio
+import itertools
+import math
+
+import numpy as np
+from pydantic import ValidationError
+
+from app.models import BacktestRequest, OptimizationCandidate, OptimizationRequest, OptimizationResult
+from app.services.backtest import LeapStrategyBacktester
+from app.services.batch import get_process_pool, pool_workers, preload_market_data
+from app.services.market_data import FrameProvider, MarketDataProvider, get_market_data
+from app.services.simulator import MarketSimulator
+
+# Objective -> True if higher is better
+OBJECTIVES = {
+    'sharpe_ratio': True,
+    'sortino_ratio': True,
+    'calmar_ratio': True,
+    'cagr': True,
+    'total_return': True,
+    'max_drawdown': False,
+    'volatility': False,
+}
+METHODS = ('grid', 'random', 'latin_hypercube')
+
+# Fields that pick the data rather than the strategy; they stay fixed so all
+# candidates are scored on the same series. (diagnostics only changes the
+# response.)
+FIXED_FIELDS = {'equity_symbol', 'start_date', 'end_date', 'use_simulation', 'simulation_scenario', 'simulation_seed', 'simulation_model', 'simulation_params', 'diagnostics'}
+# Only fields of these types can be swept; _cast rounds candidate values onto them
+SWEEPABLE_TYPES = (bool, int, float)
+MAX_CANDIDATES = 100_000
+
+# Candidates are sent to workers in chunks (several per worker, to balance
+# uneven run times) so the price series is pickled once per chunk, not once
+# per candidate.
+CHUNKS_PER_WORKER = 4
+
+def _cast(name, value):
+    annotation = BacktestRequest.model_fields[name].annotation
+    if annotation is bool:
+        return bool(value)
+    if annotation is int:
+        return int(round(value))
+    return float(round(value, 10))
+
+def _grid_values(name, spec):
+    if spec.values is not None:
+        return [_cast(name, v) for v in spec.values]
+    if spec.min is None or spec.max is None or spec.step is None:
+        raise ValueError(f"Parameter '{name}' needs 'values' or 'min'/'max'/'step' for grid search")
+    count = int(math.floor((spec.max - spec.min) / spec.step + 1e-9)) + 1
+    return [_cast(name, spec.min + i * spec.step) for i in range(max(count, 1))]
+
+def _sample_values(name, spec, u):
+    """
+    Map uniform draws u in [0, 1) onto the parameter's values or range.
+    """
+    if spec.values is not None:
+        idx = np.minimum((u * len(spec.values)).astype(int), len(spec.values) - 1)
+        return [_cast(name, spec.values[i]) for i in idx]
+    if spec.min is None or spec.max is None:
+        raise ValueError(f"Parameter '{name}' needs 'values' or 'min'/'max'")
+    x = spec.min + u * (spec.max - spec.min)
+    if spec.step:
+        x = np.minimum(spec.min + np.round((x - spec.min) / spec.step) * spec.step, spec.max)
+    return [_cast(name, v) for v in x]
+
+def generate_candidates(request: OptimizationRequest):
+    """
+    Expand the requested ranges into a list of BacktestRequest updates.
+
+    grid evaluates the Cartesian product; random and latin_hypercube draw
+    n_samples points (the latter stratified so each parameter's range is
+    covered evenly). Duplicate points are dropped.
+    """
+    if request.method not in METHODS:
+        raise ValueError(f"Unknown method '{request.method}' (expected one of {', '.join(METHODS)})")
+    for name in request.parameters:
+        if name not in BacktestRequest.model_fields or name in FIXED_FIELDS:
+            raise ValueError(f"'{name}' is not an optimizable BacktestRequest field")
+        if BacktestRequest.model_fields[name].annotation not in SWEEPABLE_TYPES:
+            raise ValueError(f"'{name}' can't be swept: only numeric and boolean fields can be optimized")
+
+    names = list(request.parameters)
+    if request.method == 'grid':
+        axes = [_grid_values(name, request.parameters[name]) for name in names]
+        total = math.prod(len(axis) for axis in axes)
+        if total > MAX_CANDIDATES:
+            raise ValueError(f"Grid has {total} points (limit {MAX_CANDIDATES}); use random or latin_hypercube sampling")
+        points = itertools.product(*axes)
+    else:
+        rng = np.random.default_rng(request.seed)
+        n = request.n_samples
+        if request.method == 'random':
+            u = rng.random((len(names), n))
+        else:
+            u = (np.array([rng.permutation(n) for _ in names]) + rng.random((len(names), n))) / n
+        columns = [_sample_values(name, request.parameters[name], u[i]) for i, name in enumerate(names)]
+        points = zip(*columns)
+
+    return [dict(zip(names, point)) for point in dict.fromkeys(points)]
+
+def prepare_data(request: OptimizationRequest, market_data: MarketDataProvider = None):
+    """
+    Load (or, in simulation mode, generate) the price series once. The base
+    request is switched to historical mode over that series so every
+    candidate sees the identical path.
+    """
+    base = request.base
+    symbol = base.equity_symbol.upper()
+    if base.use_simulation:
+        frame = MarketSimulator.generate_scenario(
+            symbol, base.start_date, base.end_date, base.simulation_scenario,
+            seed=request.seed if request.seed is not None else base.simulation_seed,
+            model=base.simulation_model, params=base.simulation_params,
+            market_data=market_data or get_market_data()
+        )
+        return base.model_copy(update={'use_simulation': False}), FrameProvider({symbol: frame})
+    return base, preload_market_data([base], market_data)[symbol]
+
+def evaluate_candidates(base: BacktestRequest, candidates, market_data: MarketDataProvider):
+    """
+    Worker entry point: backtest each candidate and return its summary
+    metrics (None for candidates the request validation or the backtester
+    rejects). Any other exception is a bug and propagates.
+    """
+    base_params = base.model_dump()
+    results = []
+    for updates in candidates:
+        try:
+            params = BacktestRequest.model_validate({**base_params, **updates})
+            results.append(LeapStrategyBacktester(params, market_data).simulate().metrics)
+        except (ValidationError, ValueError):
+            # One bad parameter combination shouldn't sink the whole sweep
+            results.append(None)
+    return results
+
+async def run_optimization(request: OptimizationRequest, market_data: MarketDataProvider = None) -> OptimizationResult:
+    if request.objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective '{request.objective}' (expected one of {', '.join(OBJECTIVES)})")
+    candidates = generate_candidates(request)
+    base, provider = await asyncio.to_thread(prepare_data, request, market_data)
+
+    chunk_size = max(1, math.ceil(len(candidates) / (pool_workers() * CHUNKS_PER_WORKER)))
+    chunks = [candidates[i:i + chunk_size] for i in range(0, len(candidates), chunk_size)]
+    loop = asyncio.get_running_loop()
+    pool = get_process_pool()
+    chunk_results = await asyncio.gather(*(
+        loop.run_in_executor(pool, evaluate_candidates, base, chunk, provider) for chunk in chunks
+    ))
+    metrics = [m for chunk in chunk_results for m in chunk]
+
+    scored = [(params, m) for params, m in zip(candidates, metrics) if m is not None]
+    scored.sort(key=lambda item: item[1][request.objective], reverse=OBJECTIVES[request.objective])
+    return OptimizationResult(
+        objective=request.objective,
+        method=request.method,
+        evaluated=len(scored),
+        failed=len(candidates) - len(scored),
+        candidates=[
+            OptimizationCandidate(rank=rank, parameters=params, **m)
+            for rank, (params, m) in enumerate(scored[:request.top_n], start=1)
+        ]
+    )
@@ -0,0 +1,418 @@
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from urllib.parse import urlparse
+
+import numpy as np
+import pandas as pd
+
+from app.services.option_pricing import black_scholes_greeks_array, implied_volatility_array
+
+# Local store of end-of-day option chains, one directory per underlying.
+#
+# Each underlying is stored like MarketDataCache's symbols: one .npy file per
+# column plus a meta.json, and reads memory-map the columns. Rows are sorted
+# by a packed uint64 contract key
+#
+#     quote date (17 bits) | is_call (1) | expiry (17) | strike in 1/1000 (29)
+#
+# (dates as days since 1970-01-01), so the quote of one contract on one day
+# is a single binary search, and the rows quoted on one day -- everything
+# the backtester chooses a new contract from -- are one contiguous slice.
+#
+# Ingestion accepts CSV or Parquet chain dumps with the usual column names
+# (see COLUMN_ALIASES). The API only reads files under the ingest directory
+# (OPTION_CHAIN_INGEST_DIR, see resolve_ingest_path); files elsewhere are
+# ingested from the command line:
+#
+#     python -m app.services.option_chains [--underlying SPY] FILE...
+# Quotes are kept at their mid ((bid + ask) / 2, or the
+# last price when the market is one-sided); implied vol and delta are filled
+# in from the mid where the file doesn't carry them and the underlying price
+# is known.
+
+COLUMN_ALIASES = {
+    'underlying': ('underlying', 'underlying_symbol', 'root', 'symbol', 'ticker'),
+    'date': ('date', 'quote_date', 'trade_date', 'data_date'),
+    'expiry': ('expiry', 'expiration', 'expiration_date', 'expiry_date', 'expirdate'),
+    'strike': ('strike', 'strike_price'),
+    'right': ('right', 'type', 'option_type', 'call_put', 'put_call', 'cp_flag'),
+    'bid': ('bid',),
+    'ask': ('ask',),
+    'last': ('last', 'last_price', 'mark', 'close'),
+    'underlying_price': ('underlying_price', 'underlying_last', 'spot'),
+    'iv': ('iv', 'implied_volatility', 'impl_vol'),
+    'delta': ('delta',),
+}
+REQUIRED_COLUMNS = ('date', 'expiry', 'strike', 'right')
+STORED_COLUMNS = ('key', 'date', 'expiry', 'strike', 'is_call', 'bid', 'ask', 'mid', 'iv', 'delta')
+
+# Rate the implied vols and deltas are backed out at (the backtester's)
+RISK_FREE_RATE = 0.04
+
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+_DATE_SHIFT, _CALL_SHIFT, _EXPIRY_SHIFT = 47, 46, 29
+_MAX_DAY = 2 ** 17
+_MAX_STRIKE = (2 ** 29 - 1) / 1000
+
+def contract_key(day, is_call, expiry, strike) -> int:
+    """
+    Packed key of one contract's quote on one day; `day` and `expiry` are
+    datetime.date.
+    """
+    return (((day.toordinal() - EPOCH_ORDINAL) << _DATE_SHIFT) | (int(is_call) << _CALL_SHIFT)
+            | ((expiry.toordinal() - EPOCH_ORDINAL) << _EXPIRY_SHIFT) | int(round(strike * 1000)))
+
+def _day_key(day) -> int:
+    # First key of a quote date
+    return (day.toordinal() - EPOCH_ORDINAL) << _DATE_SHIFT
+
+def contract_keys(dates, is_call, expiries, strikes) -> np.ndarray:
+    """
+    contract_key over arrays (dates and expiries as datetime64[D]).
+    """
+    day = dates.astype('datetime64[D]').astype(np.int64)
+    expiry = expiries.astype('datetime64[D]').astype(np.int64)
+    strike = np.round(strikes * 1000).astype(np.int64)
+    if day.min() < 0 or expiry.min() < 0 or max(day.max(), expiry.max()) >= _MAX_DAY:
+        raise ValueError("Option chain dates must fall between 1970 and 2328")
+    if strike.min() <= 0 or strikes.max() > _MAX_STRIKE:
+        raise ValueError(f"Option strikes must be positive and at most {_MAX_STRIKE:.0f}")
+    return ((day.astype(np.uint64) << np.uint64(_DATE_SHIFT)) | (is_call.astype(np.uint64) << np.uint64(_CALL_SHIFT))
+            | (expiry.astype(np.uint64) << np.uint64(_EXPIRY_SHIFT)) | strike.astype(np.uint64))
+
+def _pick_column(frame, name):
+    columns = {str(c).strip().lower(): c for c in frame.columns}
+    for alias in COLUMN_ALIASES[name]:
+        if alias in columns:
+            return frame[columns[alias]]
+    return None
+
+def _is_call(right) -> np.ndarray:
+    flags = right.astype(str).str.strip().str.upper().str[0]
+    if not flags.isin(('C', 'P')).all():
+        raise ValueError("Option type must be call/put (C/P)")
+    return (flags == 'C').to_numpy()
+
+def normalize_chain(frame: pd.DataFrame) -> dict:
+    """
+    Columns to store (see STORED_COLUMNS) from a raw chain dump, sorted by
+    contract key with duplicate quotes dropped (the last one wins). Rows with
+    no usable price are skipped.
+
+    Raises:
+        ValueError: a required column is missing or holds invalid values
+    """
+    raw = {name: _pick_column(frame, name) for name in COLUMN_ALIASES}
+    missing = [name for name in REQUIRED_COLUMNS if raw[name] is None]
+    if missing:
+        raise ValueError(f"Option chain is missing column(s): {', '.join(missing)}")
+    if raw['bid'] is None and raw['ask'] is None and raw['last'] is None:
+        raise ValueError("Option chain needs bid/ask or last prices")
+
+    def floats(name):
+        column = raw[name]
+        return np.full(len(frame), np.nan) if column is None else pd.to_numeric(column, errors='coerce').to_numpy(dtype=np.float64)
+
+    dates = pd.to_datetime(raw['date']).to_numpy().astype('datetime64[D]')
+    expiries = pd.to_datetime(raw['expiry']).to_numpy().astype('datetime64[D]')
+    strikes = floats('strike')
+    is_call = _is_call(raw['right'])
+    bid, ask, last = floats('bid'), floats('ask'), floats('last')
+    two_sided = (bid > 0) & (ask >= bid)
+    mid = np.where(two_sided, (bid + ask) / 2, last)
+
+    keep = (mid > 0) & (strikes > 0) & (expiries >= dates)
+    columns = {
+        'date': dates, 'expiry': expiries, 'strike': strikes, 'is_call': is_call,
+        'bid': bid, 'ask': ask, 'mid': mid, 'iv': floats('iv'), 'delta': floats('delta'),
+    }
+    spot = floats('underlying_price')
+    columns = {name: values[keep] for name, values in columns.items()}
+    spot = spot[keep]
+    if len(spot) == 0:
+        raise ValueError("Option chain has no quotes with a price")
+
+    # Vendors quote IV in % or as a fraction
+    iv = columns['iv']
+    if np.nanmax(iv, initial=0) > 5:
+        iv /= 100
+    T = (columns['expiry'] - columns['date']).astype(np.float64) / 365.0
+    solve = np.isnan(iv) & (spot > 0)
+    if solve.any():
+        iv[solve] = implied_volatility_array(
+            columns['mid'][solve], spot[solve], columns['strike'][solve], T[solve], RISK_FREE_RATE, columns['is_call'][solve]
+        )
+    fill = np.isnan(columns['delta']) & ~np.isnan(iv) & (spot > 0)
+    if fill.any():
+        columns['delta'][fill] = black_scholes_greeks_array(
+            spot[fill], columns['strike'][fill], T[fill], RISK_FREE_RATE, iv[fill], columns['is_call'][fill]
+        ).delta
+
+    columns['key'] = contract_keys(columns['date'], columns['is_call'], columns['expiry'], columns['strike'])
+    return _sorted_unique(columns)
+
+def _sorted_unique(columns) -> dict:
+    # Stable sort, then keep the last row of each key
+    order = np.argsort(columns['key'], kind='stable')
+    keys = columns['key'][order]
+    last = np.append(keys[1:] != keys[:-1], True)
+    return {name: np.asarray(values)[order][last] for name, values in columns.items()}
+
+def get_ingest_dir() -> str:
+    """
+    Directory the ingest endpoint may read chain dumps from; set with
+    OPTION_CHAIN_INGEST_DIR.
+    """
+    return os.environ.get('OPTION_CHAIN_INGEST_DIR', 'option_chain_imports')
+
+def resolve_ingest_path(path, ingest_dir=None) -> str:
+    """
+    Absolute path of a chain dump named relative to the ingest directory.
+    URLs and anything resolving outside the directory (absolute paths, '..',
+    symlinks out of it) are rejected without touching the file, so the
+    endpoint can't be used to probe or read other files.
+
+    Raises:
+        ValueError: the path is a URL, outside the ingest directory or not
+            a file in it
+    """
+    if len(urlparse(str(path)).scheme) > 1:
+        raise ValueError(f"'{path}' is a URL; option chains are read from files in the ingest directory")
+    root = os.path.realpath(ingest_dir or get_ingest_dir())
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise ValueError(f"'{path}' is outside the option chain ingest directory")
+    if not os.path.isfile(resolved):
+        raise ValueError(f"No option chain file '{path}' in the ingest directory")
+    return resolved
+
+def read_chain_file(path) -> pd.DataFrame:
+    """
+    A chain dump as a DataFrame: Parquet (.parquet/.pq, needs pyarrow or
+    fastparquet) or CSV (optionally compressed).
+    """
+    if str(path).lower().endswith(('.parquet', '.pq')):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+class OptionChain:
+    """
+    Read view of one underlying's stored chain (memory-mapped columns).
+    """
+    def __init__(self, symbol, columns, meta):
+        self.symbol = symbol
+        self.columns = columns
+        self.meta = meta
+        self.keys = columns['key']
+        self.mid = columns['mid']
+        self.iv = columns['iv']
+
+    def __len__(self):
+        return len(self.keys)
+
+    def quote(self, day, is_call, expiry, strike) -> int:
+        """
+        Row of the contract's quote on `day`, or -1 if it wasn't quoted.
+        """
+        # A uint64 needle: a Python int would make NumPy cast the whole column
+        key = contract_key(day, is_call, expiry, strike)
+        row = int(self.keys.searchsorted(np.uint64(key)))
+        if row < len(self.keys) and int(self.keys[row]) == key:
+            return row
+        return -1
+
+    def day_rows(self, day) -> slice:
+        """
+        Rows quoted on `day` (datetime.date).
+        """
+        lo = int(self.keys.searchsorted(np.uint64(_day_key(day))))
+        hi = int(self.keys.searchsorted(np.uint64(_day_key(day) + (1 << _DATE_SHIFT))))
+        return slice(lo, hi)
+
+    def select(self, day, is_call, days_to_expiry, strike=None, delta=None, stock_price=None, vol=None) -> int:
+        """
+        Listed contract to open on `day`: of the expiries quoted that day for
+        the given right, the one nearest `days_to_expiry` (the later one on a
+        tie); within it, the strike nearest `strike`, or the delta nearest
+        `delta`. Rows without a delta are given the Black-Scholes delta at
+        their implied vol (or `vol`) and `stock_price`.
+
+        Returns:
+            int: row, or -1 if nothing is listed
+        """
+        rows = self.day_rows(day)
+        if rows.start == rows.stop:
+            return -1
+        right = np.asarray(self.columns['is_call'][rows]) == bool(is_call)
+        if not right.any():
+            return -1
+        candidates = np.flatnonzero(right) + rows.start
+        expiries = np.asarray(self.columns['expiry'][candidates])
+        offsets = (expiries - np.datetime64(day, 'D')).astype(np.int64)
+        distance = np.abs(offsets - days_to_expiry)
+        # Nearest expiry, the later one on a tie
+        best = np.flatnonzero(distance == distance.min())
+        candidates = candidates[expiries == expiries[best].max()]
+
+        strikes = np.asarray(self.columns['strike'][candidates])
+        if delta is None:
+            return int(candidates[np.argmin(np.abs(strikes - strike))])
+        deltas = np.asarray(self.columns['delta'][candidates])
+        unknown = np.isnan(deltas)
+        if unknown.any():
+            sigma = np.asarray(self.iv[candidates[unknown]])
+            sigma = np.where(np.isnan(sigma), vol, sigma)
+            T = (np.asarray(self.columns['expiry'][candidates[unknown]]) - np.datetime64(day, 'D')).astype(np.float64) / 365.0
+            deltas[unknown] = black_scholes_greeks_array(stock_price, strikes[unknown], T, RISK_FREE_RATE, sigma, is_call).delta
+        return int(candidates[np.argmin(np.abs(deltas - delta))])
+
+    def contract(self, row):
+        """
+        (expiry as datetime.date, strike) of a row.
+        """
+        return self.columns['expiry'][row].astype(object), float(self.columns['strike'][row])
+
+class OptionChainStore:
+    """
+    Persistent option chains, one directory of memory-mapped columns per
+    underlying (see the module comment). Ingesting more quotes for an
+    underlying merges them into what is stored; a quote for a contract and
+    day already stored replaces it.
+    """
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        self._chains = {}  # symbol -> (meta.json mtime, OptionChain)
+        self._lock = threading.Lock()
+
+    def _symbol_dir(self, symbol):
+        return os.path.join(self.store_dir, symbol.upper())
+
+    def chain(self, symbol) -> OptionChain:
+        """
+        The stored chain of `symbol`, or None if nothing was ingested for it.
+        Re-opened when another process has ingested into it since.
+        """
+        symbol = symbol.upper()
+        path = self._symbol_dir(symbol)
+        meta_path = os.path.join(path, 'meta.json')
+        try:
+            modified = os.stat(meta_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        cached = self._chains.get(symbol)
+        if cached is not None and cached[0] == modified:
+            return cached[1]
+        with open(meta_path) as f:
+            meta = json.load(f)
+        columns = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r') for name in STORED_COLUMNS}
+        chain = OptionChain(symbol, columns, meta)
+        self._chains[symbol] = (modified, chain)
+        return chain
+
+    def stamp(self, symbol) -> str:
+        """
+        Fingerprint of the stored quotes of `symbol` ('' if there are none),
+        so cached results priced from them are dropped when they change.
+        """
+        chain = self.chain(symbol)
+        return chain.meta['stamp'] if chain is not None else ''
+
+    def stats(self) -> dict:
+        symbols = sorted(os.listdir(self.store_dir)) if os.path.isdir(self.store_dir) else []
+        summaries = []
+        for symbol in symbols:
+            chain = self.chain(symbol)
+            if chain is not None:
+                summaries.append({k: chain.meta[k] for k in ('symbol', 'rows', 'first_date', 'last_date')})
+        return {'store_dir': self.store_dir, 'underlyings': summaries}
+
+    def ingest(self, frame: pd.DataFrame, underlying=None) -> dict:
+        """
+        Add a chain dump to the store. Files holding several underlyings
+        need an underlying/symbol/root column; otherwise pass `underlying`.
+
+        Returns:
+            dict: symbol -> rows stored for it after the merge
+
+        Raises:
+            ValueError: the underlying can't be told, or the chain is invalid
+        """
+        column = _pick_column(frame, 'underlying')
+        if column is None:
+            if not underlying:
+                raise ValueError("Option chain has no underlying column; pass the underlying symbol")
+            groups = [(underlying, frame)]
+        else:
+            groups = [(symbol, group) for symbol, group in frame.groupby(column.astype(str).str.strip().str.upper())]
+            if underlying:
+                groups = [(s, g) for s, g in groups if s == underlying.upper()]
+        with self._lock:
+            return {symbol.upper(): self._merge(symbol.upper(), normalize_chain(group)) for symbol, group in groups}
+
+    def ingest_file(self, path, underlying=None) -> dict:
+        return self.ingest(read_chain_file(path), underlying)
+
+    def _merge(self, symbol, columns) -> int:
+        stored = self.chain(symbol)
+        if stored is not None:
+            columns = _sorted_unique({
+                name: np.concatenate([np.asarray(stored.columns[name]), values]) for name, values in columns.items()
+            })
+        self._store(symbol, columns)
+        return len(columns['key'])
+
+    def _store(self, symbol, columns):
+        path = self._symbol_dir(symbol)
+        os.makedirs(path, exist_ok=True)
+        digest = hashlib.sha256()
+        for name in ('key', 'mid'):
+            digest.update(np.ascontiguousarray(columns[name]).tobytes())
+
+        # Temp files swapped in, as in MarketDataCache, so readers holding
+        # memmaps of the old columns are unaffected
+        for name in STORED_COLUMNS:
+            fd, tmp = tempfile.mkstemp(dir=path, suffix='.npy')
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, columns[name])
+            os.replace(tmp, os.path.join(path, f"{name}.npy"))
+        meta = {
+            'symbol': symbol,
+            'rows': len(columns['key']),
+            'first_date': str(columns['date'][0]),
+            'last_date': str(columns['date'].max()),
+            'stamp': digest.hexdigest(),
+        }
+        fd, tmp = tempfile.mkstemp(dir=path, suffix='.json')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(path, 'meta.json'))
+        self._chains.pop(symbol, None)
+
+_default_store = None
+
+def get_option_chains() -> OptionChainStore:
+    """
+    Process-wide store. The location can be set with OPTION_CHAIN_DIR.
+    """
+    global _default_store
+    if _default_store is None:
+        _default_store = OptionChainStore(os.environ.get('OPTION_CHAIN_DIR', 'option_chains'))
+    return _default_store
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest option chain dumps (CSV or Parquet) into the chain store.")
+    parser.add_argument('paths', nargs='+', help="chain dump files")
+    parser.add_argument('--underlying', help="underlying of files without an underlying/symbol column; filters those with one")
+    args = parser.parse_args(argv)
+    store = get_option_chains()
+    for path in args.paths:
+        for symbol, rows in store.ingest_file(path, args.underlying).items():
+            print(f"{path}: {symbol} now holds {rows} rows")
+
+if __name__ == "__main__":
+    main()
@@ -1,109 +1,356 @@
+from typing import NamedTuple
+
 import numpy as np
-from scipy.stats import norm
+from scipy.special import ndtr, ndtri
+
+# Array-native Black-Scholes kernels.
+#
+# All *_array functions accept scalars or NumPy arrays (broadcast against each
+# other) and return float64 arrays. Expired (T <= 0) and zero-vol (sigma <= 0)
+# elements are handled with masks instead of Python branches, so a whole book
+# of options can be priced in one call. ndtr/ndtri are the ufunc versions of
+# norm.cdf/norm.ppf without the rv_continuous dispatch overhead.
+
+def _as_float_arrays(*args):
+    # No explicit broadcast: the ufuncs below broadcast on their own, and
+    # np.broadcast_arrays costs more than the pricing itself for tiny inputs.
+    return [np.asarray(a, dtype=np.float64) for a in args]
+
+def _unwrap(value):
+    """
+    Return a Python float for 0-d results so the scalar API keeps its types.
+    """
+    if np.ndim(value) == 0:
+        return float(value)
+    return value
+
+def _select(live, all_live, live_value, dead_value):
+    """
+    np.where(live, live_value, dead_value), skipped when every element is
+    live (the common case in the backtester, where it saves most of the cost
+    of pricing a handful of legs).
+    """
+    if all_live:
+        return live_value
+    return np.where(live, live_value, dead_value)
+
+def _d1_d2_array(S, K, T, r, sigma):
+    """
+    Compute d1/d2 for the live (T > 0 and sigma > 0) elements.
+
+    Returns:
+        tuple: (d1, d2, live, all_live) where d1/d2 are 0 wherever live is False
+    """
+    live = (T > 0) & (sigma > 0)
+    all_live = bool(live.all())
+    T_live = _select(live, all_live, T, 1.0)
+    sigma_live = _select(live, all_live, sigma, 1.0)
+    vol_sqrt_T = sigma_live * np.sqrt(T_live)
+    d1 = (np.log(S / K) + (r + 0.5 * sigma_live ** 2) * T_live) / vol_sqrt_T
+    d2 = d1 - vol_sqrt_T
+    d1 = _select(live, all_live, d1, 0.0)
+    d2 = _select(live, all_live, d2, 0.0)
+    return d1, d2, live, all_live
+
+def black_scholes_call_price_array(S, K, T, r, sigma):
+    """
+    Vectorized Black-Scholes call price.
+
+    Expired options are worth their intrinsic value max(S - K, 0); zero-vol
+    options are worth the discounted forward intrinsic max(S - K*exp(-rT), 0).
+
+    Args:
+        S (array-like): Current stock price(s)
+        K (array-like): Strike price(s)
+        T (array-like): Time(s) to expiration in years
+        r (array-like): Risk-free interest rate(s) (annual)
+        sigma (array-like): Volatility(ies) (annual)
+
+    Returns:
+        np.ndarray: Call option prices
+    """
+    S, K, T, r, sigma = _as_float_arrays(S, K, T, r, sigma)
+    d1, d2, live, all_live = _d1_d2_array(S, K, T, r, sigma)
+    discount = np.exp(-r * np.maximum(T, 0.0))
+    price = S * ndtr(d1) - K * discount * ndtr(d2)
+    if all_live:
+        return price
+    return np.where(live, price, np.maximum(S - K * discount, 0.0))
+
+def black_scholes_put_price_array(S, K, T, r, sigma):
+    """
+    Vectorized Black-Scholes put price. See black_scholes_call_price_array.
+    """
+    S, K, T, r, sigma = _as_float_arrays(S, K, T, r, sigma)
+    d1, d2, live, all_live = _d1_d2_array(S, K, T, r, sigma)
+    discount = np.exp(-r * np.maximum(T, 0.0))
+    price = K * discount * ndtr(-d2) - S * ndtr(-d1)
+    if all_live:
+        return price
+    return np.where(live, price, np.maximum(K * discount - S, 0.0))
+
+def calculate_delta_array(S, K, T, r, sigma):
+    """
+    Vectorized call Delta. Expired and zero-vol options have a 0/1 delta
+    depending on whether they finish in the money.
+    """
+    S, K, T, r, sigma = _as_float_arrays(S, K, T, r, sigma)
+    d1, _, live, all_live = _d1_d2_array(S, K, T, r, sigma)
+    if all_live:
+        return ndtr(d1)
+    discount = np.exp(-r * np.maximum(T, 0.0))
+    in_the_money = (S > K * discount).astype(np.float64)
+    return np.where(live, ndtr(d1), in_the_money)
+
+def find_strike_for_delta_array(S, T, r, sigma, target_delta):
+    """
+    Vectorized inverse of calculate_delta_array: the strike giving target_delta.
+    Elements with an invalid delta, T <= 0 or sigma <= 0 fall back to S.
+    """
+    S, T, r, sigma, target_delta = _as_float_arrays(S, T, r, sigma, target_delta)
+    valid = (target_delta > 0) & (target_delta < 1) & (T > 0) & (sigma > 0)
+    d1 = ndtri(np.where(valid, target_delta, 0.5))
+    T_valid = np.where(valid, T, 0.0)
+    exponent = d1 * sigma * np.sqrt(T_valid) - (r + 0.5 * sigma ** 2) * T_valid
+    return np.where(valid, S / np.exp(exponent), S)
+
+class OptionGreeks(NamedTuple):
+    price: np.ndarray
+    delta: np.ndarray
+    gamma: np.ndarray
+    theta: np.ndarray  # per calendar day
+    vega: np.ndarray  # per 1 vol point (0.01)
+
+_INV_SQRT_2PI = 1.0 / np.sqrt(2.0 * np.pi)
+
+def black_scholes_greeks_array(S, K, T, r, sigma, is_call=True):
+    """
+    Price and first-order Greeks of calls and/or puts from one d1/d2 evaluation.
+
+    Calls and puts share every intermediate through the sign trick
+    price = sgn * (S*N(sgn*d1) - K*exp(-rT)*N(sgn*d2)) with sgn = +1 for calls
+    and -1 for puts, so a mixed book is priced in a single pass.
+
+    Args:
+        S (array-like): Current stock price(s)
+        K (array-like): Strike price(s)
+        T (array-like): Time(s) to expiration in years
+        r (array-like): Risk-free interest rate(s) (annual)
+        sigma (array-like): Volatility(ies) (annual)
+        is_call (array-like of bool): True for calls, False for puts
+
+    Returns:
+        OptionGreeks: price, delta, gamma, theta (per day) and vega (per 1%)
+    """
+    S, K, T, r, sigma, is_call = _as_float_arrays(S, K, T, r, sigma, is_call)
+    d1, d2, live, all_live = _d1_d2_array(S, K, T, r, sigma)
+    sgn = 2.0 * is_call - 1.0
+    discount = np.exp(-r * np.maximum(T, 0.0))
+    K_disc = K * discount
+    T_live = _select(live, all_live, T, 1.0)
+    sigma_live = _select(live, all_live, sigma, 1.0)
+    sqrt_T = np.sqrt(T_live)
+
+    n_d1 = ndtr(sgn * d1)
+    n_d2 = ndtr(sgn * d2)
+    pdf_d1 = _INV_SQRT_2PI * np.exp(-0.5 * d1 * d1)
+    S_pdf_d1 = S * pdf_d1
+
+    price = sgn * (S * n_d1 - K_disc * n_d2)
+    delta = sgn * n_d1
+    gamma = pdf_d1 / (S * sigma_live * sqrt_T)
+    theta = (-(S_pdf_d1 * sigma_live) / (2 * sqrt_T) - sgn * r * K_disc * n_d2) / 365
+    vega = S_pdf_d1 * sqrt_T / 100
+    if all_live:
+        return OptionGreeks(price, delta, gamma, theta, vega)
+
+    # Expired / zero-vol: intrinsic value of the (discounted) forward, 0/1 delta
+    in_the_money = (sgn * (S - K_disc) > 0).astype(np.float64)
+    dead_theta = np.where(T > 0, -sgn * r * K_disc * in_the_money, 0.0) / 365
+    return OptionGreeks(
+        price=np.where(live, price, np.maximum(sgn * (S - K_disc), 0.0)),
+        delta=np.where(live, delta, sgn * in_the_money),
+        gamma=np.where(live, gamma, 0.0),
+        theta=np.where(live, theta, dead_theta),
+        vega=np.where(live, vega, 0.0),
+    )
+
+# Search bracket of the implied-volatility solver (annual vol)
+IV_MIN = 1e-4
+IV_MAX = 5.0
+
+def implied_volatility_array(price, S, K, T, r, is_call=True, tol=1e-8, max_iter=50):
+    """
+    Vectorized Black-Scholes implied volatility: the sigma at which each
+    option's model price equals `price`.
+
+    Every iteration prices the unconverged options with one fused pass
+    (price, vega and volga share d1/d2) and takes a Halley step. Each option
+    keeps a bracket [lo, hi] that the sign of its pricing error narrows (the
+    price rises with sigma); a step that leaves the bracket is replaced by
+    bisection, so every option converges. Options drop out of the working
+    set once their step is below `tol`, so thousands of strikes cost a few
+    passes over a shrinking array.
+
+    Args:
+        price (array-like): Observed option price(s)
+        S, K, T, r (array-like): As for black_scholes_greeks_array
+        is_call (array-like of bool): True for calls, False for puts
+        tol (float): Convergence tolerance on sigma
+        max_iter (int): Iteration cap
+
+    Returns:
+        np.ndarray: Implied vols; NaN where T <= 0, the price is outside the
+            no-arbitrage bounds, or no vol in [IV_MIN, IV_MAX] matches it
+    """
+    price, S, K, T, r, is_call = _as_float_arrays(price, S, K, T, r, is_call)
+    price, S, K, T, r, is_call = np.broadcast_arrays(price, S, K, T, r, is_call)
+    shape = price.shape
+    price, S, K, T, r = (a.ravel() for a in (price, S, K, T, r))
+    sgn = 2.0 * is_call.ravel() - 1.0
+    K_disc = K * np.exp(-r * np.maximum(T, 0.0))
+    lower = np.maximum(sgn * (S - K_disc), 0.0)
+    upper = np.where(sgn > 0, S, K_disc)
+    result = np.full(price.shape, np.nan)
+
+    active = np.flatnonzero((T > 0) & (price > lower) & (price < upper))
+    price, S, K, T, r, sgn, K_disc = (a[active] for a in (price, S, K, T, r, sgn, K_disc))
+    sqrt_T = np.sqrt(T)
+    log_moneyness = np.log(S / K_disc)
+    # Manaster-Koehler start: the vol where vega peaks
+    sigma = np.clip(np.sqrt(2.0 * np.abs(log_moneyness) / T), 0.05, 1.0)
+    lo = np.full(sigma.shape, IV_MIN)
+    hi = np.full(sigma.shape, IV_MAX)
+
+    for _ in range(max_iter):
+        if active.size == 0:
+            break
+        vol_sqrt_T = sigma * sqrt_T
+        d1 = log_moneyness / vol_sqrt_T + 0.5 * vol_sqrt_T
+        d2 = d1 - vol_sqrt_T
+        diff = sgn * (S * ndtr(sgn * d1) - K_disc * ndtr(sgn * d2)) - price
+        vega = S * _INV_SQRT_2PI * np.exp(-0.5 * d1 * d1) * sqrt_T
+        volga = vega * d1 * d2 / sigma
+
+        hi = np.where(diff > 0, sigma, hi)
+        lo = np.where(diff > 0, lo, sigma)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            newton = diff / vega
+            step = newton / (1.0 - 0.5 * newton * volga / vega)
+            step = np.where(np.isfinite(step), step, newton)
+        candidate = sigma - step
+        inside = (candidate > lo) & (candidate < hi)
+        candidate = np.where(inside, candidate, 0.5 * (lo + hi))
+
+        done = (np.abs(candidate - sigma) < tol) | (hi - lo < tol)
+        result[active[done]] = candidate[done]
+        keep = ~done
+        active = active[keep]
+        price, S, K_disc, T, sqrt_T, sgn, log_moneyness = (
+            a[keep] for a in (price, S, K_disc, T, sqrt_T, sgn, log_moneyness)
+        )
+        sigma, lo, hi = candidate[keep], lo[keep], hi[keep]
+
+    # A solution pinned to the edge of the bracket is a price no vol in it matches
+    result[(result <= IV_MIN * (1 + 1e-6)) | (result >= IV_MAX * (1 - 1e-6))] = np.nan
+    return result.reshape(shape)
+
+def black_scholes_greeks(S, K, T, r, sigma, is_call=True):
+    """
+    Scalar wrapper around black_scholes_greeks_array.
+
+    Returns:
+        OptionGreeks: price, delta, gamma, theta and vega as floats
+    """
+    return OptionGreeks(*(_unwrap(v) for v in black_scholes_greeks_array(S, K, T, r, sigma, is_call)))
 
 def calculate_d1(S, K, T, r, sigma):
     """
     Calculate d1 for Black-Scholes model
     """
-    if T <= 0 or sigma <= 0:
-        return 0
-    return (np.log(S / K) + (r + 0.5 * sigma ** 2) * T) / (sigma * np.sqrt(T))
+    S, K, T, r, sigma = _as_float_arrays(S, K, T, r, sigma)
+    d1 = _d1_d2_array(S, K, T, r, sigma)[0]
+    return _unwrap(d1)
 
 def calculate_d2(d1, T, sigma):
     """
     Calculate d2 for Black-Scholes model
     """
-    if T <= 0 or sigma <= 0:
-        return 0
-    return d1 - sigma * np.sqrt(T)
+    d1, T, sigma = _as_float_arrays(d1, T, sigma)
+    live = (T > 0) & (sigma > 0)
+    d2 = d1 - sigma * np.sqrt(np.where(live, T, 0.0))
+    return _unwrap(np.where(live, d2, 0.0))
 
 def black_scholes_call_price(S, K, T, r, sigma):
     """
     Calculate Black-Scholes price for a call option.
-    
+
     Args:
         S (float): Current stock price
         K (float): Strike price
         T (float): Time to expiration in years
         r (float): Risk-free interest rate (annual)
         sigma (float): Volatility (annual)
-        
+
     Returns:
         float: Call option price
     """
-    if T <= 0:
-        return max(0, S - K)
-        
-    d1 = calculate_d1(S, K, T, r, sigma)
-    d2 = calculate_d2(d1, T, sigma)
-    
-    call_price = S * norm.cdf(d1) - K * np.exp(-r * T) * norm.cdf(d2)
-    return call_price
+    return _unwrap(black_scholes_call_price_array(S, K, T, r, sigma))
 
 def black_scholes_put_price(S, K, T, r, sigma):
     """
     Calculate Black-Scholes price for a put option.
     """
-    if T <= 0:
-        return max(0, K - S)
-        
-    d1 = calculate_d1(S, K, T, r, sigma)
-    d2 = calculate_d2(d1, T, sigma)
-    
-    put_price = K * np.exp(-r * T) * norm.cdf(-d2) - S * norm.cdf(-d1)
-    return put_price
+    return _unwrap(black_scholes_put_price_array(S, K, T, r, sigma))
 
 def calculate_delta(S, K, T, r, sigma):
     """
     Calculate Delta for a call option.
-    
+
     Args:
         S (float): Current stock price
         K (float): Strike price
         T (float): Time to expiration in years
         r (float): Risk-free interest rate (annual)
         sigma (float): Volatility (annual)
-        
+
     Returns:
         float: Delta value (0 to 1)
     """
-    if T <= 0:
-        return 1.0 if S > K else 0.0
-        
-    d1 = calculate_d1(S, K, T, r, sigma)
-    return norm.cdf(d1)
+    return _unwrap(calculate_delta_array(S, K, T, r, sigma))
 
 def find_strike_for_delta(S, T, r, sigma, target_delta):
     """
     Find the strike price that gives a specific target delta.
-    
+
     Since Delta = N(d1), d1 = N^(-1)(Delta)
     d1 = (ln(S/K) + (r + sigma^2/2)T) / (sigma * sqrt(T))
-    
+
     We can solve for K.
-    
+
+    Rearranging d1 formula to solve for K:
+    d1 * sigma * sqrt(T) = ln(S/K) + (r + sigma^2/2)T
+    ln(S/K) = d1 * sigma * sqrt(T) - (r + sigma^2/2)T
+    S/K = exp(d1 * sigma * sqrt(T) - (r + sigma^2/2)T)
+    K = S / exp(...)
+
     Args:
         S (float): Current stock price
         T (float): Time to expiration in years
         r (float): Risk-free interest rate (annual)
         sigma (float): Volatility (annual)
         target_delta (float): Target delta (0 to 1)
-        
+
     Returns:
-        float: Strike price
-    """
-    if target_delta <= 0 or target_delta >= 1 or T <= 0 or sigma <= 0:
-        return S # Fallback
-        
-    d1 = norm.ppf(target_delta)
-    
-    # Rearranging d1 formula to solve for K:
-    # d1 * sigma * sqrt(T) = ln(S/K) + (r + sigma^2/2)T
-    # ln(S/K) = d1 * sigma * sqrt(T) - (r + sigma^2/2)T
-    # S/K = exp(d1 * sigma * sqrt(T) - (r + sigma^2/2)T)
-    # K = S / exp(...)
-    
-    exponent = d1 * sigma * np.sqrt(T) - (r + 0.5 * sigma ** 2) * T
-    K = S / np.exp(exponent)
-    
-    return K
+        float: Strike price (S if the inputs are out of range)
+    """
+    return _unwrap(find_strike_for_delta_array(S, T, r, sigma, target_delta))
+
+def implied_volatility(price, S, K, T, r, is_call=True):
+    """
+    Scalar wrapper around implied_volatility_array.
+
+    Returns:
+        float: Implied vol, or NaN if none matches the price
+    """
+    return _unwrap(implied_volatility_array(price, S, K, T, r, is_call))
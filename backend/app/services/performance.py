@@ -0,0 +1,240 @@
+from datetime import datetime
+
+import numpy as np
+
+# Performance metrics maintained online, one bar at a time.
+#
+# The engines feed each bar's portfolio value to a running accumulator
+# instead of keeping the value series around for a final pass: the running
+# peak and maximum drawdown, Welford's mean and M2 of the daily returns, the
+# sum of squared negative returns (for Sortino) and the sum of values (for
+# turnover). summarize() turns the accumulators into the reported metrics,
+# so results need O(1) memory per path however long the run is.
+#
+# Daily returns are value / previous value - 1; a return that is NaN, or
+# follows a zero value, is skipped. RunningMetrics works on Python floats
+# for the scalar engine; RunningPathMetrics does the same arithmetic on
+# (n_paths,) arrays for the vectorized one, so a single path gives the same
+# numbers in both.
+
+TRADING_DAYS = 252
+
+METRIC_NAMES = (
+    'total_return', 'cagr', 'max_drawdown', 'sharpe_ratio', 'sortino_ratio', 'calmar_ratio',
+    'volatility', 'turnover', 'rebalance_count',
+)
+
+class RunningMetrics:
+    """
+    Accumulators for one portfolio. `peak` starts at the value the drawdown
+    is first measured against (the engines use the cash left after the
+    initial allocation, as before).
+    """
+    __slots__ = ('peak', 'max_drawdown', 'last_value', 'bars', 'value_sum', 'returns', 'mean', 'm2', 'downside')
+
+    def __init__(self, peak):
+        self.peak = peak
+        self.max_drawdown = 0.0
+        self.last_value = None
+        self.bars = 0
+        self.value_sum = 0.0
+        self.returns = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.downside = 0.0
+
+    def update(self, value) -> float:
+        """
+        Add one bar's portfolio value; returns its drawdown from the peak.
+        """
+        if value > self.peak:
+            self.peak = value
+        drawdown = (self.peak - value) / self.peak if self.peak > 0 else 0
+        if drawdown > self.max_drawdown:
+            self.max_drawdown = drawdown
+
+        last = self.last_value
+        if last:
+            r = value / last - 1
+            if r == r:
+                self.returns += 1
+                delta = r - self.mean
+                self.mean += delta / self.returns
+                self.m2 += delta * (r - self.mean)
+                if r < 0:
+                    self.downside += r * r
+        self.last_value = value
+        self.value_sum += value
+        self.bars += 1
+        return drawdown
+
+    def state(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_state(cls, state: dict) -> 'RunningMetrics':
+        metrics = cls(state['peak'])
+        for name in cls.__slots__:
+            setattr(metrics, name, state[name])
+        return metrics
+
+    def summary(self, params, start_value, traded_value, rebalances) -> dict:
+        """
+        Metrics dict of plain floats (rebalance_count an int).
+
+        Raises:
+            ValueError: the portfolio ended below zero, so CAGR is undefined
+        """
+        if self.bars == 0:
+            return {name: 0 for name in METRIC_NAMES}
+        arrays = summarize(
+            params, start_value=start_value, end_value=self.last_value, max_drawdown=self.max_drawdown,
+            returns=self.returns, mean=self.mean, m2=self.m2, downside=self.downside,
+            value_sum=self.value_sum, bars=self.bars, traded_value=traded_value, rebalances=rebalances,
+        )
+        if np.isnan(arrays['cagr'][0]):
+            raise ValueError("Portfolio value went negative; CAGR is undefined")
+        metrics = {name: float(values[0]) for name, values in arrays.items()}
+        metrics['rebalance_count'] = int(metrics['rebalance_count'])
+        return metrics
+
+class RunningPathMetrics:
+    """
+    RunningMetrics over (n_paths,) arrays of values, one update per bar.
+    """
+    __slots__ = ('peak', 'max_drawdown', 'last_value', 'bars', 'value_sum', 'returns', 'mean', 'm2', 'downside')
+
+    def __init__(self, peak):
+        n = len(peak)
+        self.peak = np.array(peak, dtype=np.float64)
+        self.max_drawdown = np.zeros(n)
+        self.last_value = None
+        self.bars = 0
+        self.value_sum = np.zeros(n)
+        self.returns = np.zeros(n)
+        self.mean = np.zeros(n)
+        self.m2 = np.zeros(n)
+        self.downside = np.zeros(n)
+
+    def update(self, value):
+        """
+        Add one bar's values (callers silence floating-point warnings).
+        """
+        np.maximum(self.peak, value, out=self.peak)
+        drawdown = np.where(self.peak > 0, (self.peak - value) / self.peak, 0.0)
+        np.maximum(self.max_drawdown, drawdown, out=self.max_drawdown)
+
+        last = self.last_value
+        if last is not None:
+            r = value / last - 1
+            valid = (last != 0) & ~np.isnan(r)
+            self.returns += valid
+            delta = np.where(valid, r - self.mean, 0.0)
+            self.mean += np.where(valid, delta / np.where(valid, self.returns, 1.0), 0.0)
+            self.m2 += np.where(valid, delta * (r - self.mean), 0.0)
+            self.downside += np.where(valid & (r < 0), r * r, 0.0)
+        self.last_value = value.copy()
+        self.value_sum += value
+        self.bars += 1
+
+    def summary(self, params, start_value, traded_value, rebalances) -> dict:
+        """
+        Metrics dict of (n_paths,) arrays; NaN for every metric of a path
+        that ended below zero.
+        """
+        return summarize(
+            params, start_value=start_value, end_value=self.last_value, max_drawdown=self.max_drawdown,
+            returns=self.returns, mean=self.mean, m2=self.m2, downside=self.downside,
+            value_sum=self.value_sum, bars=self.bars, traded_value=traded_value, rebalances=rebalances,
+        )
+
+def series_metrics(params, values, start_value, traded_value=0.0, rebalances=0) -> dict:
+    """
+    The same metrics for a value series that is already in memory (e.g. a
+    multi-asset portfolio's summed sleeves), with the accumulators computed
+    in one vectorized pass. Drawdown is measured from the series' own
+    running peak.
+
+    Returns:
+        dict of floats; NaN for every metric if the series ended below zero
+    """
+    values = np.asarray(values, dtype=np.float64)
+    with np.errstate(all='ignore'):
+        peak = np.maximum.accumulate(values)
+        drawdown = np.where(peak > 0, (peak - values) / peak, 0.0)
+        last = values[:-1]
+        returns = values[1:] / last - 1
+        returns = returns[(last != 0) & ~np.isnan(returns)]
+    n = len(returns)
+    mean = returns.mean() if n else 0.0
+    arrays = summarize(
+        params, start_value=np.array([start_value]), end_value=values[-1:], max_drawdown=drawdown.max(keepdims=True),
+        returns=np.array([n]), mean=np.array([mean]), m2=np.array([((returns - mean) ** 2).sum()]),
+        downside=np.array([(returns[returns < 0] ** 2).sum()]), value_sum=np.array([values.sum()]),
+        bars=len(values), traded_value=np.array([traded_value]), rebalances=np.array([rebalances]),
+    )
+    return {name: float(v[0]) for name, v in arrays.items()}
+
+def _round(values, digits=2):
+    # Python's round() (not np.round) so both engines round identically
+    return np.array([round(v, digits) if v == v else v for v in values.tolist()])
+
+def summarize(params, start_value, end_value, max_drawdown, returns, mean, m2, downside,
+              value_sum, bars, traded_value, rebalances) -> dict:
+    """
+    Reported metrics from the accumulators, per path (array arguments, or
+    scalars broadcast against them):
+
+        total_return, cagr   % over the run, % per year
+        max_drawdown         % from the running peak
+        sharpe_ratio         annualized mean / std of daily returns (ddof=1)
+        sortino_ratio        annualized mean / downside deviation (target 0)
+        calmar_ratio         cagr / max_drawdown
+        volatility           annualized std of daily returns, %
+        turnover             traded value per year / average portfolio value
+        rebalance_count      rebalances performed
+
+    Paths that end below zero have no real CAGR; all their metrics are NaN.
+    """
+    start_value = np.asarray(start_value, dtype=np.float64)
+    end_val = _round(np.atleast_1d(np.asarray(end_value, dtype=np.float64)))
+    returns = np.asarray(returns, dtype=np.float64)
+    n_paths = len(end_val)
+
+    with np.errstate(all='ignore'):
+        total_return = (end_val - start_value) / start_value * 100
+        days = (datetime.strptime(params.end_date, "%Y-%m-%d") - datetime.strptime(params.start_date, "%Y-%m-%d")).days
+        years = days / 365.25
+        if years > 0:
+            cagr = np.where(end_val / start_value < 0, np.nan, ((end_val / start_value) ** (1 / years) - 1) * 100)
+        else:
+            cagr = total_return
+        max_drawdown_pct = np.array([round(round(v, 4) * 100, 2) for v in np.atleast_1d(max_drawdown).tolist()])
+
+        std = np.where(returns > 1, np.sqrt(np.maximum(m2, 0.0) / (returns - 1)), 0.0)
+        sharpe = np.where(std > 0, (mean / std) * np.sqrt(TRADING_DAYS), 0.0)
+        downside_dev = np.where(returns > 0, np.sqrt(downside / returns), 0.0)
+        sortino = np.where(downside_dev > 0, (mean / downside_dev) * np.sqrt(TRADING_DAYS), 0.0)
+        calmar = np.where(max_drawdown_pct > 0, cagr / max_drawdown_pct, 0.0)
+        volatility = std * np.sqrt(TRADING_DAYS) * 100
+
+        average_value = np.asarray(value_sum) / bars
+        turnover = np.where(average_value > 0, np.asarray(traded_value) / average_value, 0.0)
+        if years > 0:
+            turnover = turnover / years
+
+    metrics = dict(
+        total_return=_round(total_return),
+        cagr=_round(cagr),
+        max_drawdown=max_drawdown_pct,
+        sharpe_ratio=_round(np.broadcast_to(sharpe, (n_paths,))),
+        sortino_ratio=_round(np.broadcast_to(sortino, (n_paths,))),
+        calmar_ratio=_round(np.broadcast_to(calmar, (n_paths,))),
+        volatility=_round(np.broadcast_to(volatility, (n_paths,))),
+        turnover=_round(np.broadcast_to(turnover, (n_paths,))),
+        rebalance_count=np.broadcast_to(np.asarray(rebalances, dtype=np.float64), (n_paths,)).copy(),
+    )
+    failed = np.isnan(cagr)
+    for values in metrics.values():
+        values[failed] = np.nan
+    return metrics
@@ -0,0 +1,241 @@
+import datetime
+import hashlib
+import json
+import os
+import threading
+import zlib
+from datetime import timedelta
+
+import numpy as np
+from peewee import fn
+
+from app.database import StoredResult, cache_db
+from app.models import BacktestRequest, BacktestResult
+from app.services.backtest import DATA_BUFFER_DAYS, LeapStrategyBacktester
+from app.services.diagnostics import get_metrics_registry
+from app.services.ledger import BacktestRun
+from app.services.market_data import FrameProvider, MarketDataProvider, get_market_data
+from app.services.option_chains import get_option_chains
+from app.services.simulator import BOOTSTRAP, MarketSimulator, bootstrap_params
+
+# Part of every key: bump it when a change to the backtester, simulator or
+# pricing alters results, so entries computed by older code stop matching.
+RESULT_VERSION = 3
+
+def canonical_request(request: BacktestRequest) -> str:
+    """
+    The request as compact, key-sorted JSON. `diagnostics` is left out: it
+    changes what is attached to the response, not the result.
+    """
+    return json.dumps(request.model_dump(mode='json', exclude={'diagnostics'}), sort_keys=True, separators=(',', ':'))
+
+def data_stamp(frame) -> str:
+    """
+    Fingerprint of the bars a historical backtest reads (dates and closes),
+    so a result is only reused while the data behind it is unchanged.
+    """
+    digest = hashlib.sha256()
+    digest.update(frame.index.values.astype('datetime64[D]').tobytes())
+    digest.update(np.ascontiguousarray(frame['Close'].to_numpy(dtype=np.float64)).tobytes())
+    return digest.hexdigest()
+
+def result_key(request: BacktestRequest, stamp: str) -> str:
+    return hashlib.sha256(f"v{RESULT_VERSION}\n{canonical_request(request)}\n{stamp}".encode()).hexdigest()
+
+def cache_key(request: BacktestRequest, market_data: MarketDataProvider = None):
+    """
+    Content address of a request's result, or None if it can't be cached
+    (an unseeded simulation draws a new path every run).
+
+    Historical requests are keyed by their bars, which are loaded here; the
+    returned provider serves those same bars to the backtest, so a miss
+    doesn't load them twice.
+
+    Returns:
+        tuple: (key or None, MarketDataProvider to run the backtest with)
+    """
+    if request.use_simulation:
+        if request.simulation_seed is None:
+            return None, market_data
+        if request.simulation_scenario != BOOTSTRAP:
+            return result_key(request, 'simulation'), market_data
+        # A bootstrap path also depends on the history it resamples
+        market_data = market_data or get_market_data()
+        params = bootstrap_params(request.simulation_model, request.simulation_params)
+        history = MarketSimulator.load_history([request.equity_symbol], request.start_date, params, market_data)
+        return result_key(request, 'simulation' + hashlib.sha256(history.tobytes()).hexdigest()), market_data
+
+    market_data = market_data or get_market_data()
+    symbol = request.equity_symbol.upper()
+    start = datetime.datetime.strptime(request.start_date, "%Y-%m-%d") - timedelta(days=DATA_BUFFER_DAYS)
+    frame = market_data.get_history(symbol, start.strftime("%Y-%m-%d"), request.end_date)
+    if frame.empty:
+        # fetch_data reports "No data found"
+        return None, market_data
+    stamp = data_stamp(frame)
+    if request.option_pricing == 'chain':
+        # Chain-priced results also depend on the stored quotes
+        stamp += get_option_chains().stamp(symbol)
+    return result_key(request, stamp), FrameProvider({symbol: frame})
+
+class ResultStore:
+    """
+    Persistent BacktestResult cache in the StoredResult table, keyed by
+    cache_key(). Payloads are stored as zlib-compressed JSON, so a hit is
+    served without rebuilding any models. The least recently read entries
+    are evicted once the table holds more than `max_entries` results or
+    `max_bytes` of compressed payload.
+    """
+    def __init__(self, max_entries=1000, max_bytes=256 * 2**20):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()  # SQLite takes one writer at a time anyway
+
+    def stats(self) -> dict:
+        entries, size = StoredResult.select(fn.COUNT(StoredResult.id), fn.SUM(StoredResult.size)).scalar(as_tuple=True)
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': entries,
+            'bytes': size or 0,
+        }
+
+    def get(self, key) -> str:
+        """
+        Stored result JSON for `key`, or None. Marks the entry as recently used.
+        """
+        row = StoredResult.get_or_none(StoredResult.id == key)
+        if row is None:
+            return None
+        (StoredResult
+            .update(hits=StoredResult.hits + 1, accessed_at=datetime.datetime.now())
+            .where(StoredResult.id == key)
+            .execute())
+        return zlib.decompress(row.payload).decode()
+
+    def put(self, key, result_json: str):
+        self._put_payload(key, zlib.compress(result_json.encode(), 1))
+
+    def put_chunks(self, key, chunks):
+        """
+        put() for a result JSON given as an iterable of string pieces, which
+        are compressed as they come, so only the compressed payload is held.
+        """
+        compressor = zlib.compressobj(1)
+        payload = b''.join(compressor.compress(chunk.encode()) for chunk in chunks) + compressor.flush()
+        self._put_payload(key, payload)
+
+    def _put_payload(self, key, payload: bytes):
+        with self._lock, cache_db.atomic():
+            StoredResult.replace(id=key, payload=payload, size=len(payload)).execute()
+            self._evict()
+
+    def _evict(self):
+        entries, size = StoredResult.select(fn.COUNT(StoredResult.id), fn.SUM(StoredResult.size)).scalar(as_tuple=True)
+        if entries <= self.max_entries and size <= self.max_bytes:
+            return
+        stale = []
+        oldest_first = StoredResult.select(StoredResult.id, StoredResult.size).order_by(StoredResult.accessed_at).tuples()
+        for key, entry_size in oldest_first:
+            if entries <= self.max_entries and size <= self.max_bytes:
+                break
+            stale.append(key)
+            entries -= 1
+            size -= entry_size
+        StoredResult.delete().where(StoredResult.id.in_(stale)).execute()
+        self.evictions += len(stale)
+
+    def lookup(self, request: BacktestRequest, market_data: MarketDataProvider = None):
+        """
+        Key `request` and look it up, counting the hit or miss. Runs that ask
+        for diagnostics always miss: their timings describe that run.
+
+        Returns:
+            tuple: (key or None if uncacheable, MarketDataProvider to run
+                   the backtest with, stored result JSON or None)
+        """
+        key, market_data = cache_key(request, market_data)
+        metrics = get_metrics_registry()
+        if key is None:
+            metrics.record_result_cache('uncacheable')
+            return None, market_data, None
+
+        if not request.diagnostics:
+            cached = self.get(key)
+            if cached is not None:
+                self.hits += 1
+                metrics.record_result_cache('hit')
+                return key, market_data, cached
+
+        self.misses += 1
+        metrics.record_result_cache('miss')
+        return key, market_data, None
+
+    def store_run(self, key, run: BacktestRun):
+        """
+        Store a finished run under `key`, which becomes its backtest_id.
+
+        Returns:
+            str: the result JSON, or None for a diagnostics run (what is
+                 stored leaves its diagnostics out)
+        """
+        run.backtest_id = key
+        if run.params.diagnostics:
+            self.put(key, storable_json(run.to_result()))
+            return None
+        result_json = run.to_json()
+        self.put(key, result_json)
+        return result_json
+
+    def run(self, request: BacktestRequest, progress_callback=None, market_data: MarketDataProvider = None):
+        """
+        Serve `request` from the store, or run it and store the result.
+        Runs that ask for diagnostics always execute but are stored without
+        them.
+
+        Returns:
+            tuple: (result JSON, BacktestRun). A hit returns the stored JSON
+                   and no run; otherwise the run is returned, with the JSON
+                   only if it was already serialized for storage (None for
+                   uncacheable and diagnostics runs), so callers that encode
+                   the result differently needn't pay for it.
+        """
+        key, market_data, cached = self.lookup(request, market_data)
+        if cached is not None:
+            return cached, None
+        run = LeapStrategyBacktester(request, market_data).execute(progress_callback)
+        if key is None:
+            return None, run
+        return self.store_run(key, run), run
+
+def storable_json(result: BacktestResult) -> str:
+    """
+    A result as it is stored: a stored result is served to every request
+    with the same key, so the diagnostics of the run that computed it are
+    left out.
+    """
+    if result.diagnostics is None:
+        return result.model_dump_json()
+    return result.model_copy(update={
+        'params': result.params.model_copy(update={'diagnostics': False}),
+        'diagnostics': None,
+    }).model_dump_json()
+
+_default_store = None
+
+def get_result_store() -> ResultStore:
+    """
+    Process-wide store. Its bounds can be set with RESULT_STORE_MAX_ENTRIES
+    and RESULT_STORE_MAX_BYTES.
+    """
+    global _default_store
+    if _default_store is None:
+        _default_store = ResultStore(
+            max_entries=int(os.environ.get('RESULT_STORE_MAX_ENTRIES', 1000)),
+            max_bytes=int(os.environ.get('RESULT_STORE_MAX_BYTES', 256 * 2**20)),
+        )
+    return _default_store
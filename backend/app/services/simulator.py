@@ -1,72 +1,407 @@
+from typing import NamedTuple, Optional
+
 import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 
+from app.services.market_data import PATH_VOL
+
+# Scenario -> (annual drift, annual volatility)
+SCENARIOS = {
+    'neutral': (0.08, 0.20),
+    'bull': (0.20, 0.15),
+    'bear': (-0.15, 0.30),
+    'high_vol': (0.0, 0.50),
+}
+
+# Synthetic paths step one business day at a time, dt = 1/252 years, so the
+# annualized drift and vol of a scenario are what the rolling indicators and
+# the metrics (which annualize by 252) measure back.
+TRADING_DAYS = 252
+DT = 1.0 / TRADING_DAYS
+
+# Path model -> its parameters. Defaults come from the scenario's (mu, sigma):
+#
+#   gbm               constant drift and vol
+#   merton            GBM plus Poisson jumps in the log price (jump_intensity
+#                     per year, jumps ~ N(jump_mean, jump_std^2)); sigma is
+#                     the total vol, the diffusion takes what the jumps leave
+#   heston            stochastic variance v (mean-reverting at kappa to theta,
+#                     vol of vol xi, correlation rho with the price), full-
+#                     truncation Euler
+#   regime_switching  two-state Markov chain (calm / stress) switching the
+#                     drift and vol, with daily transition probabilities; the
+#                     defaults average back to the scenario's mu and sigma
+MODEL_PARAMS = {
+    'gbm': ('mu', 'sigma'),
+    'merton': ('mu', 'sigma', 'jump_intensity', 'jump_mean', 'jump_std'),
+    'heston': ('mu', 'v0', 'kappa', 'theta', 'xi', 'rho'),
+    'regime_switching': ('mu_calm', 'sigma_calm', 'mu_stress', 'sigma_stress', 'p_calm_to_stress', 'p_stress_to_calm'),
+}
+
+# simulation_scenario that resamples the symbol's own history instead of a
+# preset drift and vol: a stationary block bootstrap (Politis & Romano)
+# of its daily log returns. Blocks of consecutive returns, of geometric
+# length with mean `mean_block` bars, are drawn from random points in the
+# history (wrapping around its end), so fat tails and volatility clustering
+# carry over into the paths. The history is the `history_years` before
+# start_date, keeping the backtested period itself out of the sample.
+BOOTSTRAP = 'bootstrap'
+BOOTSTRAP_PARAMS = {'mean_block': 20.0, 'history_years': 20.0}
+MIN_BOOTSTRAP_RETURNS = 252
+
+# Steps generated per block. A block's draws, (STEP_BLOCK, n_paths), are the
+# largest temporaries besides the output, and the block size is fixed so a
+# seed gives the same paths however they are consumed.
+STEP_BLOCK = 256
+
+class SimulatedPaths(NamedTuple):
+    dates: pd.DatetimeIndex
+    prices: np.ndarray  # (n_paths, n_steps), (n_paths, n_series, n_steps) for a multi-series bootstrap
+    vols: Optional[np.ndarray]  # like prices: annualized model vol of each path at each step; None for a bootstrap
+
+def model_params(model, scenario, overrides=None) -> dict:
+    """
+    Parameters of `model` for a scenario (unknown scenarios fall back to
+    neutral), with `overrides` applied.
+
+    Raises:
+        ValueError: unknown model or parameter name
+    """
+    if model not in MODEL_PARAMS:
+        raise ValueError(f"Unknown simulation_model '{model}' (expected one of {', '.join(MODEL_PARAMS)})")
+    mu, sigma = SCENARIOS.get(scenario, SCENARIOS['neutral'])
+    if model == 'gbm':
+        params = dict(mu=mu, sigma=sigma)
+    elif model == 'merton':
+        params = dict(mu=mu, sigma=sigma, jump_intensity=1.0, jump_mean=-0.05, jump_std=0.10)
+    elif model == 'heston':
+        params = dict(mu=mu, v0=sigma ** 2, kappa=2.0, theta=sigma ** 2, xi=0.4, rho=-0.7)
+    else:
+        # One stress spell a year lasting a quarter on average: 20% of the
+        # time at twice the vol, so the calm vol is half the scenario's
+        params = dict(
+            mu_calm=mu + 0.05, sigma_calm=0.5 * sigma, mu_stress=mu - 0.20, sigma_stress=2.0 * sigma,
+            p_calm_to_stress=1 / 252, p_stress_to_calm=1 / 63,
+        )
+    unknown = sorted(set(overrides or {}) - set(params))
+    if unknown:
+        raise ValueError(f"Unknown {model} parameter(s): {', '.join(unknown)} (expected {', '.join(params)})")
+    params.update(overrides or {})
+    return params
+
+def bootstrap_params(model, overrides=None) -> dict:
+    """
+    Parameters of the bootstrap scenario with `overrides` applied.
+
+    Raises:
+        ValueError: a path model other than gbm (the default), or an unknown
+            parameter name
+    """
+    if model != 'gbm':
+        raise ValueError(f"simulation_model '{model}' does not apply to the {BOOTSTRAP} scenario")
+    unknown = sorted(set(overrides or {}) - set(BOOTSTRAP_PARAMS))
+    if unknown:
+        raise ValueError(f"Unknown {BOOTSTRAP} parameter(s): {', '.join(unknown)} (expected {', '.join(BOOTSTRAP_PARAMS)})")
+    params = {**BOOTSTRAP_PARAMS, **(overrides or {})}
+    if params['mean_block'] < 1:
+        raise ValueError("mean_block must be at least 1")
+    if params['history_years'] <= 0:
+        raise ValueError("history_years must be positive")
+    return params
+
+def history_window(start_date_str, years):
+    """
+    [start, end) of the history a bootstrap resamples: the `years` before
+    start_date, as 'YYYY-MM-DD' strings.
+    """
+    end = datetime.strptime(start_date_str, "%Y-%m-%d")
+    start = end - timedelta(days=round(years * 365.25))
+    return start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
+
+def _blocks(n_steps):
+    # Step ranges [lo, hi) after the initial price
+    for lo in range(1, n_steps, STEP_BLOCK):
+        yield lo, min(lo + STEP_BLOCK, n_steps)
+
+def _gbm(p, rng, log_s, prices, vols):
+    drift = (p['mu'] - 0.5 * p['sigma'] ** 2) * DT
+    scale = p['sigma'] * np.sqrt(DT)
+    for lo, hi in _blocks(prices.shape[1]):
+        steps = rng.standard_normal((hi - lo, len(log_s)))
+        steps *= scale
+        steps += drift
+        np.cumsum(steps, axis=0, out=steps)
+        steps += log_s
+        log_s = steps[-1].copy()
+        prices[:, lo:hi] = np.exp(steps).T
+    vols[:] = p['sigma']
+
+def _merton(p, rng, log_s, prices, vols):
+    lam, m, s = p['jump_intensity'], p['jump_mean'], p['jump_std']
+    if lam < 0 or s < 0:
+        raise ValueError("jump_intensity and jump_std must not be negative")
+    diffusion_var = p['sigma'] ** 2 - lam * (m * m + s * s)
+    if diffusion_var <= 0:
+        raise ValueError("Merton jumps carry more variance than sigma allows")
+    sigma = np.sqrt(diffusion_var)
+    # Compensated so the expected return stays mu
+    k = np.exp(m + 0.5 * s * s) - 1
+    drift = (p['mu'] - 0.5 * diffusion_var - lam * k) * DT
+    scale = sigma * np.sqrt(DT)
+    for lo, hi in _blocks(prices.shape[1]):
+        shape = (hi - lo, len(log_s))
+        steps = rng.standard_normal(shape)
+        steps *= scale
+        steps += drift
+        jumps = rng.poisson(lam * DT, shape)
+        steps += jumps * m + np.sqrt(jumps) * s * rng.standard_normal(shape)
+        np.cumsum(steps, axis=0, out=steps)
+        steps += log_s
+        log_s = steps[-1].copy()
+        prices[:, lo:hi] = np.exp(steps).T
+    vols[:] = p['sigma']
+
+def _heston(p, rng, log_s, prices, vols):
+    mu, kappa, theta, xi, rho = p['mu'], p['kappa'], p['theta'], p['xi'], p['rho']
+    if p['v0'] < 0 or theta < 0 or kappa < 0 or xi < 0 or not -1 <= rho <= 1:
+        raise ValueError("Heston needs v0, theta, kappa, xi >= 0 and rho in [-1, 1]")
+    rho_bar = np.sqrt(1 - rho * rho)
+    v = np.full(len(log_s), float(p['v0']))
+    vols[:, 0] = np.sqrt(v)
+    for lo, hi in _blocks(prices.shape[1]):
+        shape = (hi - lo, len(log_s))
+        z_price = rng.standard_normal(shape)
+        z_var = rng.standard_normal(shape)
+        block_s = np.empty(shape)
+        block_v = np.empty(shape)
+        for k in range(hi - lo):
+            v_pos = np.maximum(v, 0.0)
+            sd = np.sqrt(v_pos * DT)
+            log_s = log_s + (mu - 0.5 * v_pos) * DT + sd * z_price[k]
+            v = v + kappa * (theta - v_pos) * DT + xi * sd * (rho * z_price[k] + rho_bar * z_var[k])
+            block_s[k] = log_s
+            block_v[k] = v
+        prices[:, lo:hi] = np.exp(block_s).T
+        vols[:, lo:hi] = np.sqrt(np.maximum(block_v, 0.0)).T
+
+def _regime_switching(p, rng, log_s, prices, vols):
+    to_stress, to_calm = p['p_calm_to_stress'], p['p_stress_to_calm']
+    if not (0 <= to_stress <= 1 and 0 <= to_calm <= 1):
+        raise ValueError("Regime transition probabilities must be in [0, 1]")
+    mu = np.array([p['mu_calm'], p['mu_stress']])
+    sigma = np.array([p['sigma_calm'], p['sigma_stress']])
+    drift = (mu - 0.5 * sigma ** 2) * DT
+    scale = sigma * np.sqrt(DT)
+    stressed = np.zeros(len(log_s), dtype=np.intp)  # every path starts calm
+    vols[:, 0] = sigma[0]
+    for lo, hi in _blocks(prices.shape[1]):
+        shape = (hi - lo, len(log_s))
+        u = rng.random(shape)
+        regimes = np.empty(shape, dtype=np.intp)
+        for k in range(hi - lo):
+            switch = np.where(stressed == 1, u[k] < to_calm, u[k] < to_stress)
+            stressed = stressed ^ switch
+            regimes[k] = stressed
+        steps = rng.standard_normal(shape)
+        steps *= scale[regimes]
+        steps += drift[regimes]
+        np.cumsum(steps, axis=0, out=steps)
+        steps += log_s
+        log_s = steps[-1].copy()
+        prices[:, lo:hi] = np.exp(steps).T
+        vols[:, lo:hi] = sigma[regimes].T
+
+_GENERATORS = {'gbm': _gbm, 'merton': _merton, 'heston': _heston, 'regime_switching': _regime_switching}
+
+def _bootstrap(returns, mean_block, rng, log_s, prices):
+    # Row k of a step block continues the block that started at the last
+    # row j <= k with new[j] (at position starts[j] + k - j), or, with no new
+    # block in this step block yet, the one carried over from the last.
+    # Both cases are one gather after a running max over the start rows.
+    n_hist = returns.shape[1]
+    n_paths = prices.shape[0]
+    carry = None
+    for lo, hi in _blocks(prices.shape[-1]):
+        m = hi - lo
+        rows = np.arange(m)[:, None]
+        new = rng.random((m, n_paths)) < 1.0 / mean_block
+        if carry is None:
+            new[0] = True  # the first step starts a block
+            carry = np.zeros(n_paths, dtype=np.int64)
+        starts = rng.integers(n_hist, size=(m, n_paths))
+        last = np.where(new, rows, -1)
+        np.maximum.accumulate(last, axis=0, out=last)
+        positions = np.where(
+            last >= 0,
+            np.take_along_axis(starts, np.maximum(last, 0), axis=0) + (rows - last),
+            carry + rows + 1,
+        )
+        positions %= n_hist
+        carry = positions[-1]
+        # (n_series, m, n_paths) log returns, summed onto each series' level
+        steps = returns[:, positions]
+        np.cumsum(steps, axis=1, out=steps)
+        steps += log_s[:, None, :]
+        log_s = steps[:, -1].copy()
+        prices[..., lo:hi] = np.exp(steps).transpose(2, 0, 1)
+
 class MarketSimulator:
     @staticmethod
-    def geometric_brownian_motion(S0, mu, sigma, T, dt, steps):
+    def simulate(model, params, n_paths, n_steps, rng, S0=100.0, dtype=np.float64):
         """
-        Generate a GBM path.
-        S0: Initial stock price
-        mu: Drift (annualized return)
-        sigma: Volatility (annualized)
-        T: Time horizon in years
-        dt: Time step in years
-        steps: Number of steps
+        Simulate n_paths price paths of n_steps business days (the first
+        step is S0) and the annualized vol of each path at each step --
+        constant for gbm and merton, sqrt(v) for heston, the current
+        regime's for regime_switching.
+
+        Args:
+            model: one of MODEL_PARAMS
+            params: model_params() of the model
+            rng: numpy Generator
+            dtype: float64, or float32 to halve the output's memory (the
+                paths are still accumulated in float64)
+
+        Returns:
+            tuple: ((n_paths, n_steps) prices, (n_paths, n_steps) vols)
         """
-        t = np.linspace(0, T, steps)
-        W = np.random.standard_normal(size=steps) 
-        W = np.cumsum(W)*np.sqrt(dt) ### standard brownian motion ###
-        X = (mu-0.5*sigma**2)*t + sigma*W 
-        S = S0*np.exp(X) ### geometric brownian motion ###
-        return S
+        prices = np.empty((n_paths, n_steps), dtype=dtype)
+        vols = np.empty((n_paths, n_steps), dtype=dtype)
+        if n_steps == 0:
+            return prices, vols
+        prices[:, 0] = S0
+        log_s = np.full(n_paths, np.log(S0))
+        _GENERATORS[model](params, rng, log_s, prices, vols)
+        return prices, vols
 
     @staticmethod
-    def generate_scenario(symbol, start_date_str, end_date_str, scenario_type="neutral"):
+    def bootstrap(closes, n_paths, n_steps, rng, mean_block=BOOTSTRAP_PARAMS['mean_block'], dtype=np.float64):
+        """
+        Stationary block bootstrap of historical closes: n_paths paths of
+        n_steps bars, each starting at the last close.
+
+        Args:
+            closes: (n_hist,) closes of one symbol, or (n_series, n_hist)
+                closes of several on shared dates, which are resampled
+                together (the same blocks for every series) so their
+                cross-correlation carries over
+            mean_block: mean block length in bars
+
+        Returns:
+            np.ndarray: (n_paths, n_steps), or (n_paths, n_series, n_steps)
+                for 2-D closes
+
+        Raises:
+            ValueError: fewer than MIN_BOOTSTRAP_RETURNS usable returns
         """
-        Generate synthetic OHLC data.
+        closes = np.asarray(closes, dtype=np.float64)
+        series = np.atleast_2d(closes)
+        series = series[:, np.all(np.isfinite(series) & (series > 0), axis=0)]
+        returns = np.diff(np.log(series), axis=1)
+        if returns.shape[1] < MIN_BOOTSTRAP_RETURNS:
+            raise ValueError(f"The {BOOTSTRAP} scenario needs at least {MIN_BOOTSTRAP_RETURNS} daily returns of history, got {returns.shape[1]}")
+
+        prices = np.empty((n_paths, len(series), n_steps), dtype=dtype)
+        if n_steps:
+            prices[..., 0] = series[:, -1]
+            log_s = np.repeat(np.log(series[:, -1:]), n_paths, axis=1)
+            _bootstrap(returns, mean_block, rng, log_s, prices)
+        return prices[:, 0] if closes.ndim == 1 else prices
+
+    @staticmethod
+    def scenario_dates(start_date_str, end_date_str):
+        """
+        Business-day index covering [start_date, end_date), as used by the
+        synthetic scenarios.
+        """
+        start_date = datetime.strptime(start_date_str, "%Y-%m-%d")
+        end_date = datetime.strptime(end_date_str, "%Y-%m-%d")
+        if end_date <= start_date:
+            raise ValueError("End date must be after start date")
+        # Weekdays of the daily range; pd.bdate_range builds the same index
+        # one date at a time
+        dates = pd.date_range(start=start_date, end=end_date - timedelta(days=1), freq='D')
+        dates = dates[dates.dayofweek < 5]
+        if len(dates) == 0:
+            raise ValueError("No business days between start and end date")
+        return dates
+
+    @staticmethod
+    def generate_paths(start_date_str, end_date_str, scenario_type="neutral", n_paths=1, rng=None,
+                       model="gbm", params=None, dtype=np.float64, history=None) -> SimulatedPaths:
+        """
+        Generate n_paths synthetic paths of a scenario under `model`, with
+        `params` overriding the model's defaults. The bootstrap scenario
+        resamples `history` (closes, see bootstrap()) instead; its paths
+        carry no model vol.
+        """
+        dates = MarketSimulator.scenario_dates(start_date_str, end_date_str)
+        rng = rng if rng is not None else np.random.default_rng()
+        if scenario_type == BOOTSTRAP:
+            resolved = bootstrap_params(model, params)
+            if history is None:
+                raise ValueError(f"The {BOOTSTRAP} scenario needs the symbol's price history")
+            prices = MarketSimulator.bootstrap(history, n_paths, len(dates), rng, resolved['mean_block'], dtype)
+            return SimulatedPaths(dates, prices, None)
+        resolved = model_params(model, scenario_type, params)
+        prices, vols = MarketSimulator.simulate(model, resolved, n_paths, len(dates), rng, dtype=dtype)
+        return SimulatedPaths(dates, prices, vols)
+
+    @staticmethod
+    def load_history(symbols, start_date_str, params, market_data):
+        """
+        Closes the bootstrap scenario resamples for `symbols`: the
+        history_years before start_date, on the dates all of them traded.
+
+        Returns:
+            np.ndarray: (n_symbols, n_bars) closes
+
+        Raises:
+            ValueError: a symbol has no data in the window
+        """
+        start, end = history_window(start_date_str, params['history_years'])
+        frames = market_data.get_histories(symbols, start, end)
+        index = None
+        for symbol in symbols:
+            frame = frames.get(symbol.upper())
+            if frame is None or frame.empty:
+                raise ValueError(f"No history for {symbol} between {start} and {end} to bootstrap from")
+            index = frame.index if index is None else index.intersection(frame.index)
+        return np.vstack([frames[symbol.upper()]['Close'].reindex(index).to_numpy(dtype=np.float64) for symbol in symbols])
+
+    @staticmethod
+    def generate_scenario(symbol, start_date_str, end_date_str, scenario_type="neutral", seed=None,
+                          model="gbm", params=None, market_data=None):
+        """
+        Generate synthetic OHLC data, with the path's model vol as PATH_VOL.
+        Pass `seed` for a reproducible path.
         Scenario Types:
         - neutral: 8% return, 20% vol
         - bull: 20% return, 15% vol
         - bear: -15% return, 30% vol
         - high_vol: 0% return, 50% vol
+        - bootstrap: block-resampled from the symbol's history in
+          `market_data`, starting at its last close before start_date
         """
-        start_date = datetime.strptime(start_date_str, "%Y-%m-%d")
-        end_date = datetime.strptime(end_date_str, "%Y-%m-%d")
-        days = (end_date - start_date).days
-        
-        if days <= 0:
-            raise ValueError("End date must be after start date")
+        rng = np.random.default_rng(seed)
+        history = None
+        if scenario_type == BOOTSTRAP:
+            history = MarketSimulator.load_history([symbol], start_date_str, bootstrap_params(model, params), market_data)[0]
+        paths = MarketSimulator.generate_paths(
+            start_date_str, end_date_str, scenario_type, 1, rng, model, params, history=history
+        )
+        S0 = paths.prices[0, 0] # Base price
+        steps = len(paths.dates)
 
-        # Parameters based on scenario
-        S0 = 100.0 # Base price
-        if scenario_type == "bull":
-            mu = 0.20
-            sigma = 0.15
-        elif scenario_type == "bear":
-            mu = -0.15
-            sigma = 0.30
-        elif scenario_type == "high_vol":
-            mu = 0.0
-            sigma = 0.50
-        else: # Neutral
-            mu = 0.08
-            sigma = 0.20
-            
-        dt = 1/252
-        steps = days
-        T = days/365.0
-        
-        prices = MarketSimulator.geometric_brownian_motion(S0, mu, sigma, T, dt, steps)
-        
         # Create DataFrame
-        date_range = pd.date_range(start=start_date, periods=steps, freq='D')
-        df = pd.DataFrame(index=date_range)
-        df['Close'] = prices
+        df = pd.DataFrame(index=paths.dates)
+        df['Close'] = paths.prices[0]
         # Add synthetic OHLC (simple approximation)
         df['Open'] = df['Close'].shift(1).fillna(S0)
-        df['High'] = df[['Open', 'Close']].max(axis=1) * (1 + np.random.rand(steps) * 0.01)
-        df['Low'] = df[['Open', 'Close']].min(axis=1) * (1 - np.random.rand(steps) * 0.01)
+        df['High'] = df[['Open', 'Close']].max(axis=1) * (1 + rng.random(steps) * 0.01)
+        df['Low'] = df[['Open', 'Close']].min(axis=1) * (1 - rng.random(steps) * 0.01)
         df['Volume'] = 1000000
-        
+        if paths.vols is not None:
+            df[PATH_VOL] = paths.vols[0]
+
         return df
@@ -0,0 +1,125 @@
+import asyncio
+import json
+import queue
+import threading
+
+from app.models import BacktestRequest, BacktestSummary
+from app.services.backtest import LeapStrategyBacktester
+from app.services.market_data import MarketDataProvider
+from app.services.result_store import cache_key, get_result_store
+
+# Batches (one per PROGRESS_INTERVAL bars) held between the backtest thread
+# and a slow client; once full, the backtest waits for the client to catch
+# up, so memory stays bounded by this rather than by the history length.
+STREAM_BUFFER_BATCHES = 8
+
+# How often blocked queue operations re-check whether the other side has gone
+POLL_SECONDS = 0.1
+
+class _StreamClosed(Exception):
+    """
+    Raised in the backtest thread to abandon the run once the client is gone.
+    """
+
+class BacktestStream:
+    """
+    Runs one backtest in a worker thread and hands its output to the
+    asyncio side in batches, as the backtest's event loop produces it:
+
+        ('start', {total_bars, params})
+        ('snapshot', PortfolioSnapshot) and ('trade', Trade) for each
+            PROGRESS_INTERVAL bars, in bar order
+        ('result', BacktestSummary)
+
+    Event data is already serialized to JSON. Snapshot and trade models are
+    built per batch and dropped once sent, so the full BacktestResult is
+    never materialized. The run always executes (the progress is the point
+    of streaming), but before the summary is sent the result is written to
+    the result store under its content key, a chunk at a time
+    (BacktestRun.iter_stored_json), so the summary's backtest_id can be
+    fetched with GET /backtest/{id}.
+    """
+    def __init__(self, request: BacktestRequest, market_data: MarketDataProvider = None):
+        self.request = request
+        self.market_data = market_data
+        self.backtester = None
+        self._queue = queue.Queue(maxsize=STREAM_BUFFER_BATCHES)
+        self._closed = threading.Event()
+        self._bars_sent = 0
+        self._trades_sent = 0
+
+    def _put(self, item):
+        while not self._closed.is_set():
+            try:
+                self._queue.put(item, timeout=POLL_SECONDS)
+                return
+            except queue.Full:
+                pass
+        raise _StreamClosed()
+
+    def _get(self):
+        while True:
+            try:
+                return self._queue.get(timeout=POLL_SECONDS)
+            except queue.Empty:
+                if self._closed.is_set():
+                    return None
+
+    def _on_progress(self, bars_processed, total_bars):
+        # Rows [0, bars_processed) and every trade recorded so far are final
+        batch = []
+        if bars_processed == 0:
+            start = {'total_bars': total_bars, 'params': self.request.model_dump(mode='json')}
+            batch.append(('start', json.dumps(start)))
+        history, trades = self.backtester.history, self.backtester.trades
+        for snapshot in history.to_snapshots(self._bars_sent, bars_processed):
+            batch.append(('snapshot', snapshot.model_dump_json()))
+        n_trades = len(trades)
+        for trade in trades.to_trades(self._trades_sent, n_trades):
+            batch.append(('trade', trade.model_dump_json()))
+        self._bars_sent, self._trades_sent = bars_processed, n_trades
+        if batch:
+            self._put(batch)
+
+    def _produce(self):
+        try:
+            key, market_data = cache_key(self.request, self.market_data)
+            self.backtester = LeapStrategyBacktester(self.request, market_data)
+            run = self.backtester.execute(self._on_progress)
+            if key is not None:
+                # Before the summary goes out, so its id is fetchable at once
+                run.backtest_id = key
+                get_result_store().put_chunks(key, run.iter_stored_json())
+            summary = BacktestSummary(backtest_id=run.backtest_id, **run.metrics)
+            if self.request.diagnostics:
+                summary.diagnostics = run.diagnostics.to_model(history_bytes=run.history.nbytes)
+            self._put([('result', summary.model_dump_json())])
+            self._put(None)
+        except _StreamClosed:
+            pass
+        except Exception as e:
+            try:
+                # Re-raised in the consumer
+                self._put(e)
+            except _StreamClosed:
+                pass
+
+    async def batches(self):
+        """
+        Yield lists of (event, data JSON) as the backtest progresses. An
+        exception raised by the backtest is re-raised here. Closing the
+        generator (e.g. on client disconnect) stops the backtest.
+        """
+        loop = asyncio.get_running_loop()
+        worker = loop.run_in_executor(None, self._produce)
+        try:
+            while True:
+                batch = await asyncio.to_thread(self._get)
+                if batch is None:
+                    break
+                if isinstance(batch, Exception):
+                    raise batch
+                yield batch
+        finally:
+            self._closed.set()
+            await worker
@@ -0,0 +1,455 @@
+import numpy as np
+import pandas as pd
+
+from app.models import BacktestRequest
+from app.services.indicators import PriceSums
+from app.services.performance import RunningPathMetrics
+from app.services.option_pricing import (
+    black_scholes_call_price_array, black_scholes_put_price_array, find_strike_for_delta_array
+)
+from app.services.vol_surface import VolatilitySurface
+
+# Path-vectorized twin of LeapStrategyBacktester.
+#
+# Portfolio state lives in (n_paths,) arrays and every path advances one bar
+# at a time in lockstep. Each rule of the scalar engine becomes a boolean mask
+# over paths; the (usually rare) events a mask selects -- rolls, rebalances,
+# wheel entries and assignments -- only touch the selected paths. The
+# arithmetic mirrors LeapStrategyBacktester operation for operation, so a
+# single path reproduces the scalar engine's portfolio values.
+#
+# The engine keeps no trade log or Greeks; it is meant for runs that only
+# need each path's value series and summary metrics: Monte Carlo paths, or
+# the symbols of a multi-asset basket (one path per symbol, each with its
+# share of the capital).
+
+class OptionBook:
+    """
+    One option leg (LEAP, wheel put or wheel call) across all paths. Closed
+    legs have qty = price = 0, so their value drops out of the totals
+    without masking.
+    """
+    __slots__ = ('open', 'strike', 'expiry', 'qty', 'entry', 'price')
+
+    def __init__(self, n_paths):
+        self.open = np.zeros(n_paths, dtype=bool)
+        self.strike = np.zeros(n_paths)
+        self.expiry = np.zeros(n_paths, dtype=np.int64)  # days since epoch
+        self.qty = np.zeros(n_paths)
+        self.entry = np.zeros(n_paths)
+        self.price = np.zeros(n_paths)
+
+    def set(self, idx, strike, expiry, qty, price):
+        self.open[idx] = True
+        self.strike[idx] = strike
+        self.expiry[idx] = expiry
+        self.qty[idx] = qty
+        self.entry[idx] = price
+        self.price[idx] = price
+
+    def close(self, mask):
+        self.open[mask] = False
+        self.qty[mask] = 0.0
+        self.price[mask] = 0.0
+
+class VectorRun:
+    """
+    Output of VectorizedLeapBacktester.simulate().
+
+    Attributes:
+        total_value: (n_paths, n_bars) portfolio value per bar, or None
+            unless the engine was asked to keep it
+        terminal_value: (n_paths,) portfolio value after the last bar
+        drawdown: (n_paths,) maximum drawdown from the running peak
+        trade_counts: (n_paths,) number of trades each path made
+        traded_value: (n_paths,) value traded, cash withdrawals excluded
+        metrics: dict of (n_paths,) arrays (see performance.summarize)
+            rounded like the scalar engine; NaN where the scalar engine
+            would fail (negative terminal value)
+    """
+    __slots__ = ('total_value', 'terminal_value', 'drawdown', 'trade_counts', 'traded_value', 'metrics')
+
+    def __init__(self, total_value, terminal_value, drawdown, trade_counts, traded_value, metrics):
+        self.total_value = total_value
+        self.terminal_value = terminal_value
+        self.drawdown = drawdown
+        self.trade_counts = trade_counts
+        self.traded_value = traded_value
+        self.metrics = metrics
+
+class VectorizedLeapBacktester:
+    def __init__(self, params: BacktestRequest, dates, closes, warmup_bars=0, capital_weights=None, keep_values=True, vols=None):
+        """
+        Args:
+            params: strategy parameters (the data fields are ignored except
+                start_date/end_date, which set the CAGR horizon)
+            dates: DatetimeIndex of the bars, shared by all paths
+            closes: (n_paths, len(dates)) close prices
+            warmup_bars: leading bars that only warm up the indicators
+                (the scalar engine's DATA_BUFFER_DAYS); trading starts after
+            capital_weights: (n_paths,) share of the dollar amounts --
+                initial_capital, monthly_withdrawal, wheel_allocation -- each
+                path trades with; 1 for every path if omitted
+            keep_values: keep the (n_paths, n_bars) value series; without
+                it memory is O(n_paths), as the metrics are accumulated
+                bar by bar
+            vols: (n_paths, len(dates)) annualized vols to price options
+                at (a simulated path's model vol); the 21-day realized vol
+                of the closes if omitted
+        """
+        if params.option_pricing != 'model':
+            raise ValueError("Chain pricing is only supported for single-symbol historical backtests")
+        self.params = params
+        all_dates = pd.DatetimeIndex(dates)
+        self.closes = np.atleast_2d(np.asarray(closes, dtype=np.float64))
+        self.n_paths = self.closes.shape[0]
+        if self.closes.shape[1] != len(all_dates):
+            raise ValueError("closes must have one column per date")
+        self.vols = None if vols is None else np.atleast_2d(np.asarray(vols, dtype=np.float64))
+        if self.vols is not None and self.vols.shape != self.closes.shape:
+            raise ValueError("vols must have the shape of closes")
+        if not 0 <= warmup_bars < len(all_dates):
+            raise ValueError("warmup_bars must leave at least one bar to trade")
+        self.warmup_bars = warmup_bars
+        self.dates = all_dates[warmup_bars:]
+        self.n_bars = len(self.dates)
+        self.capital_weights = (
+            np.ones(self.n_paths) if capital_weights is None else np.asarray(capital_weights, dtype=np.float64)
+        )
+        self.keep_values = keep_values
+        self.risk_free_rate = 0.04  # 4% assumption
+        self.surface = VolatilitySurface.from_spec(params.volatility_surface) if params.volatility_surface else None
+
+    def _option_vol(self, stock_price, strike, T, vol):
+        # As LeapStrategyBacktester._option_vol
+        if self.surface is None:
+            return vol
+        return self.surface.vol(strike / stock_price, T, vol)
+
+    def _indicators(self):
+        """
+        Volatility and moving averages from the same prefix-sum code the
+        scalar engine's IndicatorStore uses, one row per path, over the
+        warm-up bars too; given path vols replace the realized vol. Returned bar-major (n_bars, n_paths) for the
+        trading bars only, so each bar reads a contiguous row.
+        """
+        sums = PriceSums(self.closes)
+        w = self.warmup_bars
+        vols = sums.volatility() if self.vols is None else self.vols
+        indicators = {'close': np.ascontiguousarray(self.closes[:, w:].T), 'vol': np.ascontiguousarray(vols[:, w:].T)}
+        if self.params.use_wheel_strategy:
+            indicators['ma_short'] = np.ascontiguousarray(sums.moving_average(self.params.wheel_ma_short)[:, w:].T)
+            indicators['ma_long'] = np.ascontiguousarray(sums.moving_average(self.params.wheel_ma_long)[:, w:].T)
+        return indicators
+
+    def _withdrawal_bars(self):
+        # Same month-change rule as _check_monthly_withdrawal
+        flags = np.zeros(self.n_bars, dtype=bool)
+        if self.params.monthly_withdrawal <= 0:
+            return flags
+        last_month = None
+        for i, month in enumerate(self.dates.month):
+            if month != last_month:
+                flags[i] = True
+                last_month = month
+        return flags
+
+    def simulate(self) -> VectorRun:
+        p = self.params
+        n = self.n_paths
+        ind = self._indicators()
+        days = self.dates.values.astype('datetime64[D]').astype(np.int64)
+        withdrawals = self._withdrawal_bars()
+
+        self.cash = float(p.initial_capital) * self.capital_weights
+        self.equity_qty = np.zeros(n)
+        self.leap = OptionBook(n)
+        self.wheel_put = OptionBook(n)
+        self.wheel_call = OptionBook(n)
+        self.last_rebalance_price = np.full(n, np.nan)  # NaN = not set yet
+        self.trade_counts = np.zeros(n, dtype=np.int64)
+        self.traded_value = np.zeros(n)
+        self.rebalance_counts = np.zeros(n, dtype=np.int64)
+
+        total_value = np.empty((self.n_bars, n)) if self.keep_values else None
+
+        with np.errstate(all='ignore'):
+            self._initial_allocation(days[0], ind['close'][0], ind['vol'][0])
+            running = RunningPathMetrics(peak=self.cash)
+
+            for i in range(self.n_bars):
+                day = days[i]
+                price = ind['close'][i]
+                vol = ind['vol'][i]
+
+                self._mark_legs(day, price, vol)
+
+                if withdrawals[i]:
+                    self.cash -= p.monthly_withdrawal * self.capital_weights
+                    self.trade_counts += 1
+                self._check_leap_exit_conditions(day, price, vol)
+                self._check_rebalancing(day, price, vol)
+
+                if p.use_wheel_strategy:
+                    self._run_wheel_strategy(day, price, vol, ind['ma_short'][i], ind['ma_long'][i])
+
+                equity_val = self.equity_qty * price
+                leap_val = self.leap.qty * self.leap.price * 100
+                wheel_put_val = self.wheel_put.qty * self.wheel_put.price * 100
+                wheel_call_val = self.wheel_call.qty * self.wheel_call.price * 100
+                total = self.cash + equity_val + leap_val - wheel_put_val - wheel_call_val
+
+                running.update(total)
+                if total_value is not None:
+                    total_value[i] = total
+
+            metrics = running.summary(
+                p, p.initial_capital * self.capital_weights, self.traded_value, self.rebalance_counts
+            )
+        if total_value is not None:
+            total_value = np.ascontiguousarray(total_value.T)
+        return VectorRun(
+            total_value, running.last_value, running.max_drawdown, self.trade_counts, self.traded_value, metrics
+        )
+
+    def _initial_allocation(self, day, price, vol):
+        target_equity = self.cash * (self.params.equity_allocation / 100)
+        target_leap = self.cash * (self.params.leap_allocation / 100)
+
+        qty = target_equity / price
+        cost = qty * price
+        self.equity_qty = qty
+        self.cash = self.cash - cost
+        self.trade_counts += 1
+        self.traded_value += np.abs(cost)
+
+        self._open_new_leap(np.arange(self.n_paths), day, price, vol, target_leap)
+
+    def _mark_legs(self, day, price, vol):
+        r = self.risk_free_rate
+        for book, pricer in ((self.leap, black_scholes_call_price_array),
+                             (self.wheel_put, black_scholes_put_price_array),
+                             (self.wheel_call, black_scholes_call_price_array)):
+            # Expired legs (T <= 0) come back at intrinsic value
+            if book.open.all():
+                # Usual case for the LEAP: no gather/scatter needed
+                T = (book.expiry - day) / 365.0
+                book.price = pricer(price, book.strike, T, r, self._option_vol(price, book.strike, T, vol))
+                continue
+            idx = np.flatnonzero(book.open)
+            if idx.size == 0:
+                continue
+            T = (book.expiry[idx] - day) / 365.0
+            strike = book.strike[idx]
+            book.price[idx] = pricer(price[idx], strike, T, r, self._option_vol(price[idx], strike, T, vol[idx]))
+
+    def _open_new_leap(self, idx, day, stock_price, vol, target_amount):
+        """
+        Open a LEAP on the paths in `idx`; stock_price, vol and target_amount
+        are full (n_paths,) arrays.
+        """
+        idx = idx[target_amount[idx] > 0]
+        if idx.size == 0:
+            return
+        S = stock_price[idx]
+        sigma = vol[idx]
+        target = target_amount[idx]
+
+        days_to_expiry = self.params.leap_expiration_months * 30
+        T = days_to_expiry / 365.0
+        if self.surface is None:
+            strike = find_strike_for_delta_array(S, T, self.risk_free_rate, sigma, self.params.leap_delta)
+        else:
+            strike = self.surface.strike_for_delta(S, T, self.risk_free_rate, self.params.leap_delta, sigma)
+            sigma = self._option_vol(S, strike, T, sigma)
+        option_price = black_scholes_call_price_array(S, strike, T, self.risk_free_rate, sigma)
+
+        num_contracts = target / (100 * option_price)
+        ok = ~(num_contracts < 0.01)  # Too small to buy
+        idx, S, strike, option_price, num_contracts = idx[ok], S[ok], strike[ok], option_price[ok], num_contracts[ok]
+        if idx.size == 0:
+            return
+
+        cash = self.cash[idx]
+        cost = num_contracts * 100 * option_price
+        short = cash < cost
+        cost = np.where(short, cash, cost)
+        num_contracts = np.where(short, cost / (100 * option_price), num_contracts)
+
+        self.cash[idx] = cash - cost
+        self.leap.set(idx, strike, day + days_to_expiry, num_contracts, option_price)
+        self.trade_counts[idx] += 1
+        self.traded_value[idx] += np.abs(cost)
+
+    def _close_leap(self, mask):
+        leap = self.leap
+        value = leap.qty[mask] * 100 * leap.price[mask]
+        self.cash[mask] += value
+        self.trade_counts[mask] += 1
+        self.traded_value[mask] += np.abs(value)
+        leap.close(mask)
+
+    def _check_leap_exit_conditions(self, day, stock_price, vol):
+        leap = self.leap
+        if not leap.open.any():
+            return
+        p = self.params
+        days_to_expiry = leap.expiry - day
+        expiring = leap.open & (days_to_expiry <= 5)
+
+        pnl_pct = (leap.price - leap.entry) / leap.entry * 100
+        over_6m = days_to_expiry > 180
+        over_3m = days_to_expiry > 90
+        profit_limit = np.where(over_6m, p.profit_limit_6m, np.where(over_3m, p.profit_limit_3m, p.profit_limit_0m))
+        loss_limit = np.where(over_6m, p.loss_limit_6m, np.where(over_3m, p.loss_limit_3m, p.loss_limit_0m))
+        hit = leap.open & ~expiring & ((pnl_pct >= profit_limit) | (pnl_pct <= -loss_limit))
+
+        close = expiring | hit
+        if close.any():
+            self._close_leap(close)
+            self._rebalance_portfolio(np.flatnonzero(close), day, stock_price, vol)
+
+    def _check_rebalancing(self, day, stock_price, vol):
+        p = self.params
+        equity_val = self.equity_qty * stock_price
+        leap_val = self.leap.qty * self.leap.price * 100
+        total_val = equity_val + leap_val + self.cash
+        valid = total_val != 0
+
+        eq_drift = np.abs((equity_val / total_val) * 100 - p.equity_allocation)
+        leap_drift = np.abs((leap_val / total_val) * 100 - p.leap_allocation)
+        drift = valid & ((eq_drift > p.rebalance_delta) | (leap_drift > p.rebalance_delta))
+
+        # Price trigger, measured from the last rebalance
+        rest = valid & ~drift
+        unset = rest & np.isnan(self.last_rebalance_price)
+        self.last_rebalance_price[unset] = stock_price[unset]
+        last = self.last_rebalance_price
+        price_change_pct = (stock_price - last) / last * 100
+        moved = rest & ((price_change_pct >= p.equity_up_trigger) | (price_change_pct <= -p.equity_down_trigger))
+
+        trigger = drift | moved
+        if trigger.any():
+            self._rebalance_portfolio(np.flatnonzero(trigger), day, stock_price, vol)
+
+    def _rebalance_portfolio(self, idx, day, stock_price, vol):
+        p = self.params
+        leap = self.leap
+        S = stock_price[idx]
+        cash = self.cash[idx]
+        equity_qty = self.equity_qty[idx]
+        leap_qty = leap.qty[idx]
+        leap_price = leap.price[idx]
+
+        equity_val = equity_qty * S
+        total_val = equity_val + leap_qty * leap_price * 100 + cash
+        target_equity_val = total_val * (p.equity_allocation / 100)
+        target_leap_val = total_val * (p.leap_allocation / 100)
+
+        # Adjust Equity (threshold of $100 to avoid tiny trades)
+        eq_diff = target_equity_val - equity_val
+        qty_to_buy = eq_diff / S
+        cost = qty_to_buy * S
+        buy = (eq_diff > 100) & (cash >= cost)
+        qty_to_sell = np.abs(eq_diff) / S
+        proceeds = qty_to_sell * S
+        sell = eq_diff < -100
+        equity_qty = np.where(buy, equity_qty + qty_to_buy, np.where(sell, equity_qty - qty_to_sell, equity_qty))
+        cash = np.where(buy, cash - cost, np.where(sell, cash + proceeds, cash))
+        trades = (buy | sell).astype(np.int64)
+        traded = self.traded_value[idx] + np.where(buy, np.abs(cost), np.where(sell, np.abs(proceeds), 0.0))
+
+        # Adjust LEAP quantity (threshold of $500)
+        has_leap = leap.open[idx]
+        leap_diff = target_leap_val - leap_qty * 100 * leap_price
+        contracts_to_buy = leap_diff / (100 * leap_price)
+        cost = contracts_to_buy * 100 * leap_price
+        buy = has_leap & (leap_diff > 500) & (cash >= cost)
+        contracts_to_sell = np.minimum(np.abs(leap_diff) / (100 * leap_price), leap_qty)
+        proceeds = contracts_to_sell * 100 * leap_price
+        sell = has_leap & (leap_diff < -500)
+        leap.qty[idx] = np.where(buy, leap_qty + contracts_to_buy, np.where(sell, leap_qty - contracts_to_sell, leap_qty))
+        cash = np.where(buy, cash - cost, np.where(sell, cash + proceeds, cash))
+        trades += buy | sell
+        traded += np.where(buy, np.abs(cost), np.where(sell, np.abs(proceeds), 0.0))
+
+        self.cash[idx] = cash
+        self.equity_qty[idx] = equity_qty
+        self.trade_counts[idx] += trades
+        self.traded_value[idx] = traded
+        self.rebalance_counts[idx] += 1
+
+        # No LEAP: open a new one
+        if not has_leap.all():
+            target = np.zeros(self.n_paths)
+            target[idx] = target_leap_val
+            self._open_new_leap(idx[~has_leap], day, stock_price, vol, target)
+
+        self.last_rebalance_price[idx] = S
+
+    def _run_wheel_strategy(self, day, stock_price, vol, ma_short, ma_long):
+        self._manage_wheel_positions(day, stock_price)
+
+        if self.params.wheel_allocation <= 0:
+            return
+        wheel_capital = self.params.wheel_allocation * self.capital_weights
+        signal = ~(np.isnan(ma_short) | np.isnan(ma_long))
+        is_bullish = ma_short > ma_long
+        days_to_expiry = 30
+        T = days_to_expiry / 365.0
+        r = self.risk_free_rate
+
+        # Sell a cash-secured put 5% OTM on a bullish signal
+        idx = np.flatnonzero(signal & is_bullish & ~self.wheel_put.open)
+        if idx.size:
+            S = stock_price[idx]
+            strike = S * 0.95
+            price = black_scholes_put_price_array(S, strike, T, r, self._option_vol(S, strike, T, vol[idx]))
+            num_contracts = np.trunc(wheel_capital[idx] / (strike * 100))
+            ok = num_contracts > 0
+            idx, strike, price, num_contracts = idx[ok], strike[ok], price[ok], num_contracts[ok]
+            premium = num_contracts * 100 * price
+            self.cash[idx] += premium
+            self.wheel_put.set(idx, strike, day + days_to_expiry, num_contracts, price)
+            self.trade_counts[idx] += 1
+            self.traded_value[idx] += np.abs(premium)
+
+        # Sell a covered call 5% OTM on a bearish signal
+        idx = np.flatnonzero(signal & ~is_bullish & ~self.wheel_call.open & (self.equity_qty > 0))
+        if idx.size:
+            S = stock_price[idx]
+            strike = S * 1.05
+            price = black_scholes_call_price_array(S, strike, T, r, self._option_vol(S, strike, T, vol[idx]))
+            max_contracts = np.trunc(self.equity_qty[idx] / 100)
+            ok = max_contracts > 0
+            idx, strike, price, max_contracts = idx[ok], strike[ok], price[ok], max_contracts[ok]
+            premium = max_contracts * 100 * price
+            self.cash[idx] += premium
+            self.wheel_call.set(idx, strike, day + days_to_expiry, max_contracts, price)
+            self.trade_counts[idx] += 1
+            self.traded_value[idx] += np.abs(premium)
+
+    def _manage_wheel_positions(self, day, stock_price):
+        put = self.wheel_put
+        expired = put.open & (put.expiry - day <= 0)
+        if expired.any():
+            # Assigned: buy the stock at the strike
+            assigned = expired & (stock_price < put.strike)
+            cost = put.qty[assigned] * 100 * put.strike[assigned]
+            self.cash[assigned] -= cost
+            self.traded_value[assigned] += np.abs(cost)
+            self.equity_qty[assigned] += put.qty[assigned] * 100
+            self.trade_counts[expired] += 1
+            put.close(expired)
+
+        call = self.wheel_call
+        expired = call.open & (call.expiry - day <= 0)
+        if expired.any():
+            # Assigned: sell the stock at the strike
+            assigned = expired & (stock_price > call.strike)
+            self.equity_qty[assigned] -= call.qty[assigned] * 100
+            proceeds = call.qty[assigned] * 100 * call.strike[assigned]
+            self.cash[assigned] += proceeds
+            self.traded_value[assigned] += np.abs(proceeds)
+            self.trade_counts[expired] += 1
+            call.close(expired)
@@ -0,0 +1,178 @@
+import math
+from bisect import bisect_right
+
+import numpy as np
+
+from app.services.option_pricing import _unwrap, find_strike_for_delta_array, implied_volatility_array
+
+# Implied-volatility surface over (moneyness K/S, T in years).
+#
+# The grid is stored as total variance w = sigma^2 * T and interpolated
+# bilinearly: linearly in moneyness along each quoted tenor, then linearly in
+# w between the two tenors around T (so interpolated term structures keep
+# total variance non-decreasing when the quotes do). Outside the grid the
+# surface is flat: moneyness is clamped to the quoted range, T below the
+# first tenor takes the first tenor's vols and T beyond the last the last's.
+#
+# The per-cell slopes are computed once, so a lookup is two bracket searches
+# on the (short) axes plus a handful of multiply-adds, for one leg or a whole
+# array of them. Scalar lookups (the backtester's usual single open leg) run
+# the same arithmetic on Python floats, skipping NumPy's per-call overhead.
+
+# Moneyness axis that from_quotes resamples each expiry's smile onto
+DEFAULT_MONEYNESS = np.round(np.linspace(0.5, 1.5, 21), 2)
+
+# Fixed-point passes of strike_for_delta (strike -> vol at its moneyness ->
+# strike); a fixed count keeps both backtest engines on identical arithmetic
+STRIKE_ITERATIONS = 4
+
+def _axis(values, name):
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim != 1 or values.size == 0:
+        raise ValueError(f"{name} must be a non-empty list")
+    if not np.all(np.isfinite(values)) or np.any(values <= 0):
+        raise ValueError(f"{name} must be positive")
+    if np.any(np.diff(values) <= 0):
+        raise ValueError(f"{name} must be strictly increasing")
+    return values
+
+class VolatilitySurface:
+    def __init__(self, moneyness, tenors, vols, relative=False):
+        """
+        Args:
+            moneyness: increasing strike / spot knots
+            tenors: increasing times to expiry (years)
+            vols: (len(tenors), len(moneyness)) implied vols, annualized
+            relative: vols are multiples of a base vol passed at lookup
+                (e.g. the bar's realized vol) rather than absolute vols
+
+        Raises:
+            ValueError: malformed axes or vols
+        """
+        moneyness = _axis(moneyness, "moneyness")
+        tenors = _axis(tenors, "tenors")
+        vols = np.asarray(vols, dtype=np.float64)
+        if vols.shape != (tenors.size, moneyness.size):
+            raise ValueError("vols must have one row per tenor and one column per moneyness")
+        if not np.all(np.isfinite(vols)) or np.any(vols <= 0):
+            raise ValueError("vols must be positive")
+        self.moneyness = moneyness
+        self.tenors = tenors
+        self.vols = vols
+        self.relative = relative
+
+        # A single knot is padded with a copy so every lookup has a cell
+        if moneyness.size == 1:
+            moneyness = np.append(moneyness, moneyness[0] + 1.0)
+            vols = np.repeat(vols, 2, axis=1)
+        if tenors.size == 1:
+            tenors = np.append(tenors, tenors[0] + 1.0)
+            vols = np.repeat(vols, 2, axis=0)
+        self._m = moneyness
+        self._t = tenors
+        self._w = vols ** 2 * tenors[:, None]
+        self._dw_dm = np.diff(self._w, axis=1) / np.diff(moneyness)
+        self._dt = np.diff(tenors)
+        # Python-float copies for the scalar path
+        self._m_list, self._t_list = self._m.tolist(), self._t.tolist()
+        self._w_list, self._dw_dm_list, self._dt_list = self._w.tolist(), self._dw_dm.tolist(), self._dt.tolist()
+
+    @classmethod
+    def from_spec(cls, spec) -> 'VolatilitySurface':
+        """
+        Surface from a request's VolatilitySurfaceSpec.
+        """
+        return cls(spec.moneyness, spec.tenors, spec.vols, relative=spec.relative)
+
+    @classmethod
+    def from_quotes(cls, S, strikes, T, r, prices, is_call=True, moneyness=DEFAULT_MONEYNESS) -> 'VolatilitySurface':
+        """
+        Surface backed out of observed option prices: the implied vols are
+        solved in one vectorized pass, grouped by expiry and each expiry's
+        smile resampled onto `moneyness` (flat beyond its quoted strikes).
+        Quotes with no implied vol (e.g. below intrinsic) are dropped.
+
+        Args:
+            S (float): Spot price the quotes were taken at
+            strikes, T, prices, is_call (array-like): One entry per quote
+            r (float): Risk-free rate
+
+        Raises:
+            ValueError: no quote has an implied vol
+        """
+        strikes, T, prices = (np.atleast_1d(np.asarray(a, dtype=np.float64)) for a in (strikes, T, prices))
+        strikes, T, prices, is_call = np.broadcast_arrays(strikes, T, prices, is_call)
+        iv = implied_volatility_array(prices, S, strikes, T, r, is_call)
+        solved = ~np.isnan(iv)
+        if not solved.any():
+            raise ValueError("No quote has an implied volatility")
+        quote_moneyness, T, iv = strikes[solved] / S, T[solved], iv[solved]
+
+        moneyness = _axis(moneyness, "moneyness")
+        tenors = np.unique(T)
+        rows = []
+        for tenor in tenors:
+            at_tenor = T == tenor
+            order = np.argsort(quote_moneyness[at_tenor])
+            rows.append(np.interp(moneyness, quote_moneyness[at_tenor][order], iv[at_tenor][order]))
+        return cls(moneyness, tenors, np.array(rows))
+
+    def vol(self, moneyness, T, base_vol=None):
+        """
+        Implied vol at (moneyness, T); arrays broadcast against each other.
+
+        Args:
+            base_vol: vol a relative surface scales (ignored otherwise)
+
+        Returns:
+            float for scalar inputs, else np.ndarray
+        """
+        if np.ndim(moneyness) == 0 and np.ndim(T) == 0 and np.ndim(base_vol) == 0:
+            return self._scalar_vol(float(moneyness), float(T), base_vol)
+        m = np.clip(np.asarray(moneyness, dtype=np.float64), self._m[0], self._m[-1])
+        t = np.clip(np.asarray(T, dtype=np.float64), self._t[0], self._t[-1])
+        i = np.clip(np.searchsorted(self._m, m, side='right') - 1, 0, self._m.size - 2)
+        j = np.clip(np.searchsorted(self._t, t, side='right') - 1, 0, self._t.size - 2)
+
+        dm = m - self._m[i]
+        w_lo = self._w[j, i] + dm * self._dw_dm[j, i]
+        w_hi = self._w[j + 1, i] + dm * self._dw_dm[j + 1, i]
+        w = w_lo + (t - self._t[j]) / self._dt[j] * (w_hi - w_lo)
+        sigma = np.sqrt(w / t)
+        if self.relative:
+            sigma = sigma * base_vol
+        return _unwrap(sigma)
+
+    def _scalar_vol(self, m, t, base_vol):
+        # vol() on floats, operation for operation
+        ms, ts = self._m_list, self._t_list
+        m = min(max(m, ms[0]), ms[-1])
+        t = min(max(t, ts[0]), ts[-1])
+        i = min(max(bisect_right(ms, m) - 1, 0), len(ms) - 2)
+        j = min(max(bisect_right(ts, t) - 1, 0), len(ts) - 2)
+
+        dm = m - ms[i]
+        w_lo = self._w_list[j][i] + dm * self._dw_dm_list[j][i]
+        w_hi = self._w_list[j + 1][i] + dm * self._dw_dm_list[j + 1][i]
+        w = w_lo + (t - ts[j]) / self._dt_list[j] * (w_hi - w_lo)
+        sigma = math.sqrt(w / t)
+        if self.relative:
+            sigma = sigma * base_vol
+        return sigma
+
+    def strike_for_delta(self, S, T, r, target_delta, base_vol=None):
+        """
+        Strike whose call delta is `target_delta` when priced at the
+        surface's vol for that strike: start from the at-the-money vol and
+        re-solve at the vol of each new strike's moneyness. Price the
+        option at vol(strike / S, T) to stay on the surface.
+
+        Returns:
+            float for scalar inputs, else np.ndarray
+        """
+        sigma = self.vol(np.ones_like(np.asarray(S, dtype=np.float64)), T, base_vol)
+        strike = find_strike_for_delta_array(S, T, r, sigma, target_delta)
+        for _ in range(STRIKE_ITERATIONS):
+            sigma = self.vol(strike / S, T, base_vol)
+            strike = find_strike_for_delta_array(S, T, r, sigma, target_delta)
+        return _unwrap(strike)
@@ -0,0 +1,174 @@
+import asyncio
+import math
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from app.models import BacktestRequest, WalkForwardRequest, WalkForwardResult, WalkForwardSnapshot, WalkForwardWindow
+from app.services.backtest import LeapStrategyBacktester
+from app.services.batch import get_process_pool, pool_workers
+from app.services.market_data import MappedFrameProvider, MarketDataProvider
+from app.services.optimizer import CHUNKS_PER_WORKER, OBJECTIVES, evaluate_candidates, generate_candidates, prepare_data
+from app.services.performance import series_metrics
+
+# Walk-forward optimization: start_date..end_date is cut into train windows
+# each followed by a test window. The candidates are scored on every train
+# window, the best one on each is backtested on its test window, and the
+# test windows -- which tile the period after the first train window -- are
+# stitched into one out-of-sample equity curve. Each test window after the
+# first starts on the previous window's last bar, so the return across the
+# boundary is earned by the newly chosen parameters instead of being lost.
+#
+# The bars are loaded once and snapshotted to memory-mapped .npy columns;
+# the workers receive only the snapshot's path, so every window of every
+# task slices the same pages instead of unpickling its own copy. All
+# (train window, candidate chunk) tasks go to the process pool together,
+# and so do the test windows.
+
+def walk_forward_windows(request: WalkForwardRequest):
+    """
+    (train_start, test_start, test_end) Timestamps of each window; the test
+    windows advance by test_months and the last one is cut at end_date.
+
+    Raises:
+        ValueError: the period is no longer than one train window
+    """
+    start, end = pd.Timestamp(request.base.start_date), pd.Timestamp(request.base.end_date)
+    train, test = pd.DateOffset(months=request.train_months), pd.DateOffset(months=request.test_months)
+    windows = []
+    test_start = start + train
+    while test_start < end:
+        test_end = min(test_start + test, end)
+        windows.append((start if request.anchored else test_start - train, test_start, test_end))
+        test_start = test_end
+    if not windows:
+        raise ValueError("start_date..end_date must be longer than train_months to leave a test window")
+    return windows
+
+def _window_request(base: BacktestRequest, start, end, updates=None) -> BacktestRequest:
+    return BacktestRequest.model_validate({
+        **base.model_dump(), **(updates or {}),
+        'start_date': start.strftime("%Y-%m-%d"), 'end_date': end.strftime("%Y-%m-%d"),
+    })
+
+def run_test_window(params: BacktestRequest, market_data: MarketDataProvider):
+    """
+    Worker entry point: backtest one test window and return what stitching
+    needs -- (dates, total values, benchmark values, metrics, traded value,
+    value traded on the opening bar).
+    """
+    run = LeapStrategyBacktester(params, market_data).simulate()
+    rows = run.history.rows
+    entries = run.trades.entries
+    opening = sum(
+        abs(value) for date, _, asset, _, _, value, _ in entries if date == entries[0][0] and asset != "CASH"
+    ) if entries else 0.0
+    return run.history.dates, rows['total_value'].copy(), rows['benchmark_value'].copy(), run.metrics, run.trades.traded_value, opening
+
+def _test_starts(windows, bar_dates):
+    """
+    First bar of each test window: test_start for the first, and the last
+    bar before test_start -- the previous window's last bar -- for the rest.
+    """
+    starts = [windows[0][1]]
+    for _, test_start, _ in windows[1:]:
+        before = bar_dates[bar_dates < test_start]
+        starts.append(before[-1] if len(before) else test_start)
+    return starts
+
+def _stitch(tests, initial_capital):
+    """
+    Chain the test windows' value series by their returns. Every window
+    after the first opens on the previous one's last bar; that shared bar is
+    dropped and the window is scaled so it opens at the value the previous
+    one ended at, i.e. the portfolio switches to the new parameters at that
+    bar's close.
+    """
+    first_dates, first_total, first_benchmark = tests[0][:3]
+    dates, totals, benchmarks = [first_dates], [first_total], [first_benchmark]
+    for window_dates, total, benchmark, *_ in tests[1:]:
+        totals.append(total[1:] * (totals[-1][-1] / total[0]))
+        benchmarks.append(benchmark[1:] * (benchmarks[-1][-1] / benchmark[0]))
+        dates.append(window_dates[1:])
+    return np.concatenate(dates), np.concatenate(totals), np.concatenate(benchmarks)
+
+async def run_walk_forward(request: WalkForwardRequest, market_data: MarketDataProvider = None) -> WalkForwardResult:
+    if request.objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective '{request.objective}' (expected one of {', '.join(OBJECTIVES)})")
+    windows = walk_forward_windows(request)
+    candidates = generate_candidates(request)
+    base, provider = await asyncio.to_thread(prepare_data, request, market_data)
+    higher_is_better = OBJECTIVES[request.objective]
+
+    loop = asyncio.get_running_loop()
+    pool = get_process_pool()
+    with tempfile.TemporaryDirectory(prefix='walk_forward_') as snapshot_dir:
+        mapped = await asyncio.to_thread(MappedFrameProvider.create, snapshot_dir, provider.frames)
+
+        # Train: every window's candidates, chunked across the whole pool
+        chunk_size = max(1, math.ceil(len(windows) * len(candidates) / (pool_workers() * CHUNKS_PER_WORKER)))
+        tasks = []
+        for train_start, test_start, _ in windows:
+            train_base = _window_request(base, train_start, test_start)
+            tasks.extend(
+                (train_base, candidates[i:i + chunk_size]) for i in range(0, len(candidates), chunk_size)
+            )
+        chunk_results = await asyncio.gather(*(
+            loop.run_in_executor(pool, evaluate_candidates, train_base, chunk, mapped) for train_base, chunk in tasks
+        ))
+        per_window = len(chunk_results) // len(windows)
+
+        best = []
+        for w, (train_start, test_start, _) in enumerate(windows):
+            metrics = [m for chunk in chunk_results[w * per_window:(w + 1) * per_window] for m in chunk]
+            scored = [(params, m) for params, m in zip(candidates, metrics) if m is not None]
+            if not scored:
+                raise ValueError(f"No candidate could be backtested on the train window {train_start:%Y-%m-%d}..{test_start:%Y-%m-%d}")
+            pick = max if higher_is_better else min
+            params, m = pick(scored, key=lambda item: item[1][request.objective])
+            best.append((params, m, len(scored), len(candidates) - len(scored)))
+
+        # Test: the chosen parameters on each following window
+        starts = _test_starts(windows, provider.frames[base.equity_symbol.upper()].index)
+        tests = await asyncio.gather(*(
+            loop.run_in_executor(pool, run_test_window, _window_request(base, start, test_end, params), mapped)
+            for start, (_, _, test_end), (params, _, _, _) in zip(starts, windows, best)
+        ))
+
+    dates, total, benchmark = _stitch(tests, base.initial_capital)
+    oos_params = _window_request(base, windows[0][1], windows[-1][2])
+    # The opening trades of later windows only re-establish a position the
+    # stitched portfolio already holds, so they aren't counted as turnover
+    traded_value = tests[0][4] + sum(test[4] - test[5] for test in tests[1:])
+    rebalances = sum(int(test[3]['rebalance_count']) for test in tests)
+    metrics = series_metrics(oos_params, total, base.initial_capital, traded_value, rebalances)
+    if any(math.isnan(value) for value in metrics.values()):
+        raise ValueError("The stitched out-of-sample portfolio value went negative")
+
+    date_strs = np.datetime_as_string(dates, unit='D').tolist()
+    return WalkForwardResult(
+        objective=request.objective,
+        method=request.method,
+        **{name: int(value) if name == 'rebalance_count' else value for name, value in metrics.items()},
+        windows=[
+            WalkForwardWindow(
+                train_start=train_start.strftime("%Y-%m-%d"),
+                train_end=test_start.strftime("%Y-%m-%d"),
+                test_start=test_start.strftime("%Y-%m-%d"),
+                test_end=test_end.strftime("%Y-%m-%d"),
+                parameters=params,
+                evaluated=evaluated,
+                failed=failed,
+                in_sample=in_sample[request.objective],
+                out_of_sample=test[3][request.objective],
+                total_return=test[3]['total_return'],
+                max_drawdown=test[3]['max_drawdown'],
+            )
+            for (train_start, test_start, test_end), (params, in_sample, evaluated, failed), test in zip(windows, best, tests)
+        ],
+        history=[
+            WalkForwardSnapshot(date=d, total_value=round(t, 2), benchmark_value=round(b, 2))
+            for d, t, b in zip(date_strs, total.tolist(), benchmark.tolist())
+        ],
+    )
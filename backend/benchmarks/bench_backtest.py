@@ -0,0 +1,82 @@
+"""
+End-to-end benchmark of LeapStrategyBacktester on a synthetic 20-year daily
+series (simulation mode, so no network access is needed).
+
+Reports wall time of the event loop (simulate), of building the API model
+(to_result) and of JSON serialization, plus allocation per bar measured with
+tracemalloc in a separate pass.
+
+Run from the backend directory:
+    uv run python -m benchmarks.bench_backtest [years]
+"""
+import sys
+import time
+import tracemalloc
+from datetime import date
+
+from app.models import BacktestRequest
+from app.services.backtest import LeapStrategyBacktester
+from app.services.indicators import get_indicator_store
+from app.services.ledger import BacktestRun
+
+def make_request(years, use_wheel_strategy=False):
+    return BacktestRequest(
+        equity_symbol="QQQ",
+        start_date="2000-01-03",
+        end_date=date(2000 + years, 1, 3).isoformat(),
+        initial_capital=100000,
+        equity_allocation=60,
+        leap_allocation=30,
+        use_wheel_strategy=use_wheel_strategy,
+        wheel_allocation=50000 if use_wheel_strategy else 0.0,
+        use_simulation=True,
+        simulation_scenario="neutral",
+        simulation_seed=0,
+    )
+
+def timed(fn, repeat=3):
+    best, value = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, value
+
+def peak_memory(fn):
+    tracemalloc.start()
+    try:
+        value = fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak, value
+
+def main(years=20):
+    for wheel in (False, True):
+        request = make_request(years, use_wheel_strategy=wheel)
+        store = get_indicator_store()
+        indicator_seconds = store.compute_seconds
+        sim_time, run = timed(lambda: LeapStrategyBacktester(request).simulate())
+        indicator_time = (store.compute_seconds - indicator_seconds) / 3
+        result_time, result = timed(lambda: BacktestRun(run.params, run.history, run.trades, run.metrics).to_result())
+        json_time, payload = timed(result.model_dump_json)
+        total_time, _ = timed(lambda: LeapStrategyBacktester(request).run().model_dump_json())
+
+        sim_peak, run = peak_memory(lambda: LeapStrategyBacktester(request).simulate())
+        result_peak, _ = peak_memory(run.to_result)
+
+        bars = len(run.history)
+        label = "with wheel" if wheel else "LEAP only"
+        print(f"{years}y {label} ({bars} bars, {len(run.trades)} trades)")
+        print(f"  simulate:        {sim_time:7.3f} s  {sim_time / bars * 1e6:6.1f} us/bar")
+        print(f"    indicators:    {indicator_time:7.3f} s")
+        print(f"  to_result:       {result_time:7.3f} s")
+        print(f"  JSON:            {json_time:7.3f} s  {len(payload) / bars:6.0f} bytes/bar")
+        print(f"  end to end:      {total_time:7.3f} s")
+        print(f"  history buffer:  {run.history.nbytes / bars:7.0f} bytes/bar")
+        print(f"  peak (simulate): {sim_peak / bars:7.0f} bytes/bar")
+        print(f"  peak (models):   {result_peak / bars:7.0f} bytes/bar")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
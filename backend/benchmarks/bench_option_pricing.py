@@ -0,0 +1,65 @@
+"""
+Micro-benchmark: per-element scipy.stats pricing vs the vectorized kernels.
+
+Run from the backend directory:
+    uv run python -m benchmarks.bench_option_pricing [n]
+"""
+import sys
+import time
+
+import numpy as np
+from scipy.stats import norm
+
+from app.services.option_pricing import (
+    black_scholes_call_price_array,
+    calculate_delta_array,
+    find_strike_for_delta_array,
+)
+
+# Size of the sample priced one element at a time; the per-element cost is
+# extrapolated to n because a 1e6-element Python loop takes minutes.
+LOOP_SAMPLE = 10_000
+
+def legacy_call_price(S, K, T, r, sigma):
+    # The pre-vectorization scalar implementation, kept here as the baseline.
+    if T <= 0:
+        return max(0, S - K)
+    d1 = (np.log(S / K) + (r + 0.5 * sigma ** 2) * T) / (sigma * np.sqrt(T))
+    d2 = d1 - sigma * np.sqrt(T)
+    return S * norm.cdf(d1) - K * np.exp(-r * T) * norm.cdf(d2)
+
+def make_inputs(n, seed=42):
+    rng = np.random.default_rng(seed)
+    S = rng.uniform(50, 150, n)
+    K = S * rng.uniform(0.7, 1.3, n)
+    T = rng.uniform(-0.05, 2.0, n)  # includes some expired contracts
+    sigma = rng.uniform(0.0, 0.8, n)  # includes some zero-vol contracts
+    return S, K, T, 0.04, sigma
+
+def best_of(fn, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main(n=1_000_000):
+    S, K, T, r, sigma = make_inputs(n)
+    m = min(n, LOOP_SAMPLE)
+    sample = [(float(S[i]), float(K[i]), float(T[i]), r, max(float(sigma[i]), 1e-6)) for i in range(m)]
+
+    loop_time = best_of(lambda: [legacy_call_price(*args) for args in sample], repeat=1) * n / m
+    call_time = best_of(lambda: black_scholes_call_price_array(S, K, T, r, sigma))
+    delta_time = best_of(lambda: calculate_delta_array(S, K, T, r, sigma))
+    strike_time = best_of(lambda: find_strike_for_delta_array(S, T, r, sigma, 0.7))
+
+    print(f"n = {n:,}")
+    print(f"legacy scalar call price (extrapolated): {loop_time:10.3f} s  ({loop_time / n * 1e6:.2f} us/option)")
+    print(f"vectorized call price:                   {call_time:10.3f} s  ({call_time / n * 1e9:.1f} ns/option)")
+    print(f"vectorized delta:                        {delta_time:10.3f} s")
+    print(f"vectorized strike for delta:             {strike_time:10.3f} s")
+    print(f"speedup (call price):                    {loop_time / call_time:10.0f}x")
+
+if __name__ == "__main__":
+    main(int(float(sys.argv[1])) if len(sys.argv) > 1 else 1_000_000)
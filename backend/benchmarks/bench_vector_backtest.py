@@ -0,0 +1,88 @@
+"""
+Parity check and benchmark of the path-vectorized engine against
+LeapStrategyBacktester on simulated GBM paths.
+
+Every path is first replayed through the scalar engine; the vectorized
+engine must reproduce its value series, trade count and summary metrics.
+The script exits non-zero on a mismatch. It then times both engines per
+path.
+
+Run from the backend directory:
+    uv run python -m benchmarks.bench_vector_backtest [n_paths] [years]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.services.backtest import LeapStrategyBacktester
+from app.services.market_data import FrameProvider
+from app.services.simulator import MarketSimulator
+from app.services.vector_backtest import VectorizedLeapBacktester
+from benchmarks.bench_backtest import make_request
+
+PARITY_PATHS = 16
+RTOL = 1e-9
+
+def scalar_runs(request, dates, prices):
+    """
+    Yield each path's scalar BacktestRun, or the backtester itself when the
+    metrics step raises ValueError (negative terminal value) so its state
+    can still be compared.
+    """
+    params = request.model_copy(update={'use_simulation': False})
+    for row in prices:
+        frame = pd.DataFrame({'Close': row}, index=dates)
+        backtester = LeapStrategyBacktester(params, FrameProvider({params.equity_symbol: frame}))
+        try:
+            yield backtester.simulate()
+        except ValueError:
+            yield backtester
+
+def check_parity(request, dates, prices):
+    vector = VectorizedLeapBacktester(request, dates, prices).simulate()
+    mismatches = 0
+    for i, run in enumerate(scalar_runs(request, dates, prices)):
+        expected = run.history.rows['total_value']
+        ok = np.allclose(vector.total_value[i], expected, rtol=RTOL, atol=0)
+        ok &= np.isclose(vector.drawdown[i], run.history.rows['drawdown'].max(), rtol=RTOL, atol=1e-12)
+        ok &= vector.trade_counts[i] == len(run.trades)
+        if isinstance(run, LeapStrategyBacktester):
+            ok &= all(np.isnan(values[i]) for values in vector.metrics.values())
+        else:
+            ok &= all(vector.metrics[name][i] == value for name, value in run.metrics.items())
+        if not ok:
+            mismatches += 1
+            print(f"  path {i}: MISMATCH (trades {vector.trade_counts[i]} vs {len(run.trades)}, "
+                  f"max rel diff {np.max(np.abs(vector.total_value[i] / expected - 1)):.2e})")
+    return mismatches
+
+def main(n_paths=1000, years=5):
+    failures = 0
+    for wheel in (False, True):
+        request = make_request(years, use_wheel_strategy=wheel)
+        label = "with wheel" if wheel else "LEAP only"
+        rng = np.random.default_rng(0)
+        dates, prices, _ = MarketSimulator.generate_paths(request.start_date, request.end_date, "high_vol", n_paths, rng)
+
+        mismatches = check_parity(request, dates, prices[:PARITY_PATHS])
+        failures += mismatches
+        print(f"{years}y {label}: parity {PARITY_PATHS - mismatches}/{PARITY_PATHS} paths")
+
+        start = time.perf_counter()
+        for _ in scalar_runs(request, dates, prices[:PARITY_PATHS]):
+            pass
+        scalar_per_path = (time.perf_counter() - start) / PARITY_PATHS
+
+        start = time.perf_counter()
+        VectorizedLeapBacktester(request, dates, prices).simulate()
+        vector_per_path = (time.perf_counter() - start) / n_paths
+
+        print(f"  scalar:     {scalar_per_path * 1e3:8.3f} ms/path")
+        print(f"  vectorized: {vector_per_path * 1e3:8.3f} ms/path ({n_paths} paths)  {scalar_per_path / vector_per_path:6.0f}x")
+    return failures
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    sys.exit(1 if main(*args) else 0)
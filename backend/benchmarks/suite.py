@@ -0,0 +1,270 @@
+"""
+Benchmark suite: option pricing, the market simulator, the backtester and
+the /api/backtest/run endpoint, written to JSON and compared against a
+stored baseline.
+
+Every case is timed `repeat` times and reports the best and median wall
+time. With a baseline, a case whose best time exceeds the baseline's by
+more than the tolerance is flagged and the script exits non-zero. Timings
+are only comparable on the same machine, so baselines live under
+benchmarks/results/ and are not committed.
+
+Run from the backend directory:
+    uv run python -m benchmarks.suite                    # run, compare to the baseline if present
+    uv run python -m benchmarks.suite --save-baseline    # run and store as the new baseline
+    uv run python -m benchmarks.suite --filter backtest  # only cases whose name contains "backtest"
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from app.services.backtest import LeapStrategyBacktester
+from app.services.option_pricing import (
+    black_scholes_call_price,
+    black_scholes_call_price_array,
+    black_scholes_greeks,
+    black_scholes_greeks_array,
+    calculate_delta,
+    calculate_delta_array,
+    find_strike_for_delta,
+    find_strike_for_delta_array,
+)
+from app.services.simulator import MODEL_PARAMS, MarketSimulator
+from benchmarks.bench_backtest import make_request
+from benchmarks.bench_option_pricing import make_inputs
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+DEFAULT_OUTPUT = os.path.join(RESULTS_DIR, "latest.json")
+DEFAULT_BASELINE = os.path.join(RESULTS_DIR, "baseline.json")
+
+# Best-of-N times still move by 10-20% between runs on a busy machine
+DEFAULT_TOLERANCE = 0.25
+
+SCALAR_CALLS = 2_000
+VECTOR_SIZE = 100_000
+SIMULATOR_YEARS = (1, 5, 20)
+SIMULATOR_PATHS = 1_000
+SIMULATOR_PATH_YEARS = 5
+BACKTEST_YEARS = (1, 5, 20)
+API_YEARS = 5
+
+class Case:
+    """
+    One timed benchmark. `fn` is called once per repeat; `setup` (if any)
+    runs before each call, untimed. `units` is how many operations one call
+    performs, for the per-unit figure in the report.
+    """
+    def __init__(self, name, fn, repeat=5, setup=None, units=1, unit="call"):
+        self.name = name
+        self.fn = fn
+        self.repeat = repeat
+        self.setup = setup
+        self.units = units
+        self.unit = unit
+
+    def run(self) -> dict:
+        timings = []
+        for _ in range(self.repeat):
+            if self.setup is not None:
+                self.setup()
+            start = time.perf_counter()
+            self.fn()
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        return {
+            'best_seconds': best,
+            'median_seconds': statistics.median(timings),
+            'repeat': self.repeat,
+            'units': self.units,
+            'unit': self.unit,
+            'best_per_unit_seconds': best / self.units,
+        }
+
+def pricing_cases():
+    S, K, T, r, sigma = make_inputs(VECTOR_SIZE)
+    sigma = np.maximum(sigma, 1e-6)
+    sample = [(float(S[i]), float(K[i]), float(T[i]), r, float(sigma[i])) for i in range(SCALAR_CALLS)]
+    strike_sample = [(s, t, r, v) for s, _, t, _, v in sample]
+
+    def loop(fn, args):
+        return lambda: [fn(*a) for a in args]
+
+    return [
+        Case("pricing.scalar.call_price", loop(black_scholes_call_price, sample), units=SCALAR_CALLS, unit="option"),
+        Case("pricing.scalar.delta", loop(calculate_delta, sample), units=SCALAR_CALLS, unit="option"),
+        Case("pricing.scalar.greeks", loop(black_scholes_greeks, sample), units=SCALAR_CALLS, unit="option"),
+        Case("pricing.scalar.strike_for_delta", lambda: [find_strike_for_delta(*a, 0.7) for a in strike_sample],
+             units=SCALAR_CALLS, unit="option"),
+        Case("pricing.vector.call_price", lambda: black_scholes_call_price_array(S, K, T, r, sigma),
+             units=VECTOR_SIZE, unit="option"),
+        Case("pricing.vector.delta", lambda: calculate_delta_array(S, K, T, r, sigma), units=VECTOR_SIZE, unit="option"),
+        Case("pricing.vector.greeks", lambda: black_scholes_greeks_array(S, K, T, r, sigma),
+             units=VECTOR_SIZE, unit="option"),
+        Case("pricing.vector.strike_for_delta", lambda: find_strike_for_delta_array(S, T, r, sigma, 0.7),
+             units=VECTOR_SIZE, unit="option"),
+    ]
+
+def simulator_cases():
+    cases = []
+    for years in SIMULATOR_YEARS:
+        request = make_request(years)
+        days = len(MarketSimulator.scenario_dates(request.start_date, request.end_date))
+        cases.append(Case(
+            f"simulator.generate_scenario.{years}y",
+            lambda request=request: MarketSimulator.generate_scenario(
+                request.equity_symbol, request.start_date, request.end_date, "neutral", seed=0
+            ),
+            units=days, unit="bar",
+        ))
+    request = make_request(SIMULATOR_PATH_YEARS)
+    days = len(MarketSimulator.scenario_dates(request.start_date, request.end_date))
+    for model in MODEL_PARAMS:
+        cases.append(Case(
+            f"simulator.paths.{model}.{SIMULATOR_PATH_YEARS}y",
+            lambda request=request, model=model: MarketSimulator.generate_paths(
+                request.start_date, request.end_date, "neutral", SIMULATOR_PATHS, np.random.default_rng(0), model
+            ),
+            units=days * SIMULATOR_PATHS, unit="path-bar",
+        ))
+    # Resampling 20 years of (simulated) history
+    _, history, _ = MarketSimulator.generate_paths("1995-01-02", "2015-01-02", "neutral", 1, np.random.default_rng(0))
+    cases.append(Case(
+        f"simulator.paths.bootstrap.{SIMULATOR_PATH_YEARS}y",
+        lambda: MarketSimulator.bootstrap(history[0], SIMULATOR_PATHS, days, np.random.default_rng(0)),
+        units=days * SIMULATOR_PATHS, unit="path-bar",
+    ))
+    return cases
+
+def backtest_cases():
+    cases = []
+    for years in BACKTEST_YEARS:
+        for wheel in (False, True):
+            request = make_request(years, use_wheel_strategy=wheel)
+            days = len(MarketSimulator.scenario_dates(request.start_date, request.end_date))
+            label = "wheel" if wheel else "leap"
+            cases.append(Case(
+                f"backtest.run.{years}y.{label}",
+                lambda request=request: LeapStrategyBacktester(request).run(),
+                repeat=3 if years >= 20 else 5, units=days, unit="bar",
+            ))
+    return cases
+
+def api_cases():
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    # Unseeded: a seeded request would be served from the result cache
+    payload = make_request(API_YEARS).model_copy(update={'simulation_seed': None}).model_dump(mode="json")
+    client = TestClient(app)
+
+    def post():
+        response = client.post("/api/backtest/run", json=payload)
+        if response.status_code != 200:
+            raise RuntimeError(f"/api/backtest/run returned {response.status_code}: {response.text[:200]}")
+
+    return [Case(f"api.backtest_run.{API_YEARS}y", post, unit="request")], client
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(__file__),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+def run_suite(name_filter=None) -> dict:
+    api, client = api_cases()
+    cases = pricing_cases() + simulator_cases() + backtest_cases() + api
+    if name_filter:
+        cases = [case for case in cases if name_filter in case.name]
+
+    results = {}
+    # The context runs the app's lifespan, so worker pools are shut down after
+    with client:
+        for case in cases:
+            results[case.name] = stats = case.run()
+            print(f"{case.name:40s} {stats['best_seconds'] * 1e3:10.3f} ms  "
+                  f"({stats['best_per_unit_seconds'] * 1e6:9.3f} us/{case.unit})")
+    return {'environment': environment(), 'cases': results}
+
+def compare(current: dict, baseline: dict, tolerance=DEFAULT_TOLERANCE) -> list:
+    """
+    Print each case's best time relative to the baseline and return the
+    names of cases slower than baseline * (1 + tolerance). Cases missing
+    from either side are reported but never count as regressions.
+    """
+    regressions = []
+    base_cases = baseline.get('cases', {})
+    print(f"\nAgainst baseline from {baseline.get('environment', {}).get('timestamp', '?')} "
+          f"(commit {baseline.get('environment', {}).get('commit') or '?'}), tolerance {tolerance:.0%}:")
+    for name, stats in current['cases'].items():
+        base = base_cases.get(name)
+        if base is None:
+            print(f"  {name:40s} new")
+            continue
+        ratio = stats['best_seconds'] / base['best_seconds']
+        flag = ""
+        if ratio > 1 + tolerance:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        elif ratio < 1 / (1 + tolerance):
+            flag = "  faster"
+        print(f"  {name:40s} {ratio:6.2f}x{flag}")
+    for name in sorted(base_cases.keys() - current['cases'].keys()):
+        print(f"  {name:40s} not run")
+    return regressions
+
+def write_json(path, data):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="where to write this run's results")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="results file to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="also store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slowdown before a case counts as a regression (0.25 = 25%%)")
+    parser.add_argument("--filter", dest="name_filter", help="only run cases whose name contains this")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.name_filter)
+    write_json(args.output, results)
+    print(f"\nWrote {args.output}")
+
+    regressions = []
+    if args.save_baseline:
+        write_json(args.baseline, results)
+        print(f"Stored baseline {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+    else:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
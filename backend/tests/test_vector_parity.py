@@ -0,0 +1,64 @@
+"""
+VectorizedLeapBacktester must reproduce LeapStrategyBacktester path for
+path: value series, trade count, drawdown and summary metrics.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.models import BacktestRequest
+from app.services.backtest import LeapStrategyBacktester
+from app.services.market_data import PATH_VOL, FrameProvider
+from app.services.simulator import MarketSimulator
+from app.services.vector_backtest import VectorizedLeapBacktester
+
+N_PATHS = 6
+RTOL = 1e-9
+
+def make_request(use_wheel_strategy, model):
+    return BacktestRequest(
+        equity_symbol="QQQ",
+        start_date="2000-01-03",
+        end_date="2003-01-03",
+        initial_capital=100000,
+        equity_allocation=60,
+        leap_allocation=30,
+        use_wheel_strategy=use_wheel_strategy,
+        wheel_allocation=50000 if use_wheel_strategy else 0.0,
+        simulation_model=model,
+    )
+
+def scalar_run(params, dates, closes, vols):
+    """
+    The scalar engine's run on one path, or the backtester itself when the
+    portfolio went negative and the metrics step raised.
+    """
+    frame = pd.DataFrame({'Close': closes}, index=dates)
+    if vols is not None:
+        frame[PATH_VOL] = vols
+    backtester = LeapStrategyBacktester(params, FrameProvider({params.equity_symbol: frame}))
+    try:
+        return backtester.simulate()
+    except ValueError:
+        return backtester
+
+@pytest.mark.parametrize('model', ['gbm', 'heston'])
+@pytest.mark.parametrize('use_wheel_strategy', [False, True])
+def test_vectorized_matches_scalar(use_wheel_strategy, model):
+    params = make_request(use_wheel_strategy, model)
+    paths = MarketSimulator.generate_paths(
+        params.start_date, params.end_date, "high_vol", N_PATHS, np.random.default_rng(0), model=model,
+    )
+    vector = VectorizedLeapBacktester(params, paths.dates, paths.prices, vols=paths.vols).simulate()
+
+    for i in range(N_PATHS):
+        run = scalar_run(params, paths.dates, paths.prices[i], None if paths.vols is None else paths.vols[i])
+        rows = run.history.rows
+        np.testing.assert_allclose(vector.total_value[i], rows['total_value'], rtol=RTOL, atol=0, err_msg=f"path {i}")
+        np.testing.assert_allclose(vector.drawdown[i], rows['drawdown'].max(), rtol=RTOL, atol=1e-12, err_msg=f"path {i}")
+        assert vector.trade_counts[i] == len(run.trades), f"path {i}"
+        if isinstance(run, LeapStrategyBacktester):
+            assert all(np.isnan(values[i]) for values in vector.metrics.values()), f"path {i}"
+        else:
+            for name, value in run.metrics.items():
+                np.testing.assert_allclose(vector.metrics[name][i], value, rtol=RTOL, err_msg=f"path {i} {name}")
@@ -7,6 +7,7 @@ import StrategyLibrary from './components/StrategyLibrary';
 function App() {
   const [results, setResults] = useState(null);
   const [isLoading, setIsLoading] = useState(false);
+  const [progress, setProgress] = useState(null);
   const [error, setError] = useState(null);
   const [activeTab, setActiveTab] = useState('dashboard'); // dashboard, library
   const [loadedStrategy, setLoadedStrategy] = useState(null);
@@ -14,14 +15,31 @@ function App() {
   const handleRunBacktest = async (params) => {
     setIsLoading(true);
     setError(null);
+    setProgress(0);
     try {
-      const response = await axios.post('http://localhost:8000/api/backtest/run', params);
-      setResults(response.data);
+      // Submit as a background job and poll until it finishes
+      const { data: job } = await axios.post('http://localhost:8000/api/backtest/jobs', params);
+      let status = job;
+      while (status.status === 'queued' || status.status === 'running') {
+        await new Promise((resolve) => setTimeout(resolve, 500));
+        // The history only feeds the charts, so ask for a downsampled one
+        const response = await axios.get(`http://localhost:8000/api/backtest/jobs/${job.job_id}`, {
+          params: { max_points: 2000 },
+        });
+        status = response.data;
+        setProgress(status.progress);
+      }
+      if (status.status === 'failed') {
+        setError(status.error || 'An error occurred while running the backtest.');
+      } else {
+        setResults(status.result);
+      }
     } catch (err) {
       console.error(err);
       setError(err.response?.data?.detail || 'An error occurred while running the backtest.');
     } finally {
       setIsLoading(false);
+      setProgress(null);
     }
   };
 
@@ -71,7 +89,7 @@ function App() {
           {activeTab === 'library' ? (
             <StrategyLibrary onLoadStrategy={handleLoadStrategy} />
           ) : !results ? (
-            <Dashboard onSubmit={handleRunBacktest} isLoading={isLoading} initialData={loadedStrategy} />
+            <Dashboard onSubmit={handleRunBacktest} isLoading={isLoading} progress={progress} initialData={loadedStrategy} />
           ) : (
             <Results results={results} onBack={handleReset} />
           )}
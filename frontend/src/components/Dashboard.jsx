@@ -3,7 +3,7 @@ import { Switch } from '@headlessui/react';
 import axios from 'axios';
 import clsx from 'clsx';
 
-const Dashboard = ({ onSubmit, isLoading, initialData }) => {
+const Dashboard = ({ onSubmit, isLoading, progress, initialData }) => {
   const [formData, setFormData] = useState(initialData || {
     equity_symbol: 'QQQ',
     start_date: '2020-01-01',
@@ -209,7 +209,9 @@ const Dashboard = ({ onSubmit, isLoading, initialData }) => {
           disabled={isLoading}
           className="inline-flex justify-center py-3 px-6 border border-transparent shadow-sm text-base font-medium rounded-md text-white bg-indigo-600 hover:bg-indigo-700 focus:outline-none focus:ring-2 focus:ring-offset-2 focus:ring-indigo-500 disabled:opacity-50 disabled:cursor-not-allowed"
         >
-          {isLoading ? 'Running Backtest...' : 'Run Strategy Backtest'}
+          {isLoading
+            ? `Running Backtest...${progress ? ` ${Math.round(progress * 100)}%` : ''}`
+            : 'Run Strategy Backtest'}
         </button>
       </div>
     </form>
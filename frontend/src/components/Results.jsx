@@ -82,6 +82,30 @@ const Results = ({ results, onBack }) => {
             {results.sharpe_ratio}
           </p>
         </div>
+        <div className="bg-white p-4 rounded-lg shadow border border-gray-200">
+          <p className="text-sm text-gray-500">Sortino Ratio</p>
+          <p className="text-2xl font-bold text-gray-900">
+            {results.sortino_ratio}
+          </p>
+        </div>
+        <div className="bg-white p-4 rounded-lg shadow border border-gray-200">
+          <p className="text-sm text-gray-500">Calmar Ratio</p>
+          <p className="text-2xl font-bold text-gray-900">
+            {results.calmar_ratio}
+          </p>
+        </div>
+        <div className="bg-white p-4 rounded-lg shadow border border-gray-200">
+          <p className="text-sm text-gray-500">Volatility</p>
+          <p className="text-2xl font-bold text-gray-900">
+            {results.volatility}%
+          </p>
+        </div>
+        <div className="bg-white p-4 rounded-lg shadow border border-gray-200">
+          <p className="text-sm text-gray-500">Turnover</p>
+          <p className="text-2xl font-bold text-gray-900">
+            {results.turnover}x
+          </p>
+        </div>
       </div>
 
       {/* Financial Chart (Interactive) */}